@@ -1,11 +1,19 @@
 # -*- coding: utf-8 -*-
+import click
 from flask import Flask
 from flask_jwt_extended import JWTManager
 from flask_sqlalchemy import SQLAlchemy
+from werkzeug.middleware.proxy_fix import ProxyFix
 from app.config import config
 from app.models import db
-from app.services.auth_service import jwt
+from app.models.migrations import upgrade_database
+from app.services.auth_service import AuthService, jwt
+from app.services.converter_service import ConverterService
+from app.services.storage_service import StorageService
+from app.services.user_service import UserService
+from app.services.user_variable_service import UserVariableService
 from app.routes import main_bp
+from app.utils.accel import AccelRedirectEmulator
 
 def create_app(config_name='default'):
     app = Flask(__name__)
@@ -14,15 +22,53 @@ def create_app(config_name='default'):
     # 初始化扩展
     db.init_app(app)
     jwt.init_app(app)
+    AuthService.init_app(app)
+    ConverterService.init_app(app)
+    StorageService.init_app(app)
+    UserService.init_app(app)
+    UserVariableService.init_app(app)
     
     # 注册蓝图
     app.register_blueprint(main_bp)
     
+    # 本地模拟 nginx 处理 X-Accel-Redirect
+    if app.config.get('FILE_ACCEL_EMULATE') and app.config.get('FILE_DELIVERY_MODE') == 'x-accel-redirect':
+        app.wsgi_app = AccelRedirectEmulator(
+            app.wsgi_app,
+            app.config.get('FILE_ACCEL_REDIRECT_PREFIX', '/protected-uploads/'),
+            app.config.get('UPLOAD_FOLDER', 'uploads')
+        )
+    
+    # 在可信反向代理之后时，从 X-Forwarded-* 头取客户端IP和协议(登录限流按IP计数)
+    proxy_count = app.config.get('TRUSTED_PROXY_COUNT', 0)
+    if proxy_count:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxy_count, x_proto=proxy_count)
+    
+    # 数据库迁移命令: flask --app run upgrade-db
+    @app.cli.command('upgrade-db')
+    def upgrade_db_command():
+        """执行未执行的数据库迁移"""
+        db.create_all()
+        applied = upgrade_database(db.engine, explicit=True)
+        print(f"已执行迁移: {applied}" if applied else "数据库已是最新版本")
+    
+    # 文件存储布局迁移命令: flask --app run migrate-storage [--dry-run]
+    @app.cli.command('migrate-storage')
+    @click.option('--dry-run', is_flag=True, help='只统计需要迁移的文件')
+    def migrate_storage_command(dry_run):
+        """把用户目录中的文件和旧布局的blob迁移到当前的目录分层布局"""
+        result = StorageService.from_config(app.config).migrate_storage_layout(dry_run=dry_run)
+        print(f"{'需要迁移' if dry_run else '迁移完成'}: {result}")
+    
     # 初始化数据库和创建默认用户
     def init_db():
         with app.app_context():
             db.create_all()
             
+            # 为已存在的表补齐索引等结构变更
+            if app.config.get('AUTO_MIGRATE', True):
+                upgrade_database(db.engine)
+            
             # 导入AuthService并创建默认用户
             from app.services.auth_service import AuthService
             
@@ -1,3 +1,3 @@
-from .auth import jwt, authenticate_user, create_user, get_current_user, logout_user, blacklisted_tokens
+from .auth import jwt, authenticate_user, create_user, get_current_user, logout_user, check_if_token_revoked
 
-__all__ = ['jwt', 'authenticate_user', 'create_user', 'get_current_user', 'logout_user', 'blacklisted_tokens']
\ No newline at end of file
+__all__ = ['jwt', 'authenticate_user', 'create_user', 'get_current_user', 'logout_user', 'check_if_token_revoked']
\ No newline at end of file
@@ -1,15 +1,14 @@
 import bcrypt
 from flask_jwt_extended import JWTManager, create_access_token, get_jwt_identity, get_jwt
 from app.models import User
+from app.services.auth_service import AuthService
 
 jwt = JWTManager()
 
-# 黑名单存储（用于注销功能）
-blacklisted_tokens = set()
-
+# 与 AuthService 共用JWT黑名单
 @jwt.token_in_blocklist_loader
 def check_if_token_revoked(jwt_header, jwt_payload):
-    return jwt_payload['jti'] in blacklisted_tokens
+    return AuthService.is_token_blacklisted(jwt_payload['jti'])
 
 def authenticate_user(username, password):
     user = User.query.filter_by(username=username).first()
@@ -34,6 +33,5 @@ def get_current_user():
         return User.query.filter_by(username=current_user).first()
     return None
 
-def logout_user(jti):
-    blacklisted_tokens.add(jti)
-    return True
\ No newline at end of file
+def logout_user(jti, expires_at=None):
+    return AuthService.logout_user(jti, expires_at)
\ No newline at end of file
@@ -6,6 +6,45 @@ class Config:
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'your-secret-key-change-in-production'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
     
+    # 已认证请求的用户记录缓存；资料修改、改密码和删除用户时失效，其他工作进程最多延迟 TTL 秒
+    USER_CACHE_MAX_ENTRIES = 10000
+    USER_CACHE_TTL = 30
+    
+    # 密码哈希(bcrypt)成本因子；修改后已有用户在下次登录成功时按新成本重新计算哈希
+    BCRYPT_LOG_ROUNDS = 12
+    # bcrypt 在专用线程池中执行：同时计算的线程数、最多排队数和等待超时(秒)，
+    # 超过排队上限或等待超时的登录、注册、改密码请求返回429并带 Retry-After 头
+    PASSWORD_HASH_WORKERS = 2
+    PASSWORD_HASH_MAX_PENDING = 16
+    PASSWORD_HASH_TIMEOUT = 5
+    PASSWORD_HASH_RETRY_AFTER = 1
+    
+    # 注销的JWT黑名单存储：database 数据库表(默认，各工作进程共享)；redis 需配置
+    # TOKEN_BLOCKLIST_REDIS_URL 并安装 redis 包；memory 只对当前进程生效
+    TOKEN_BLOCKLIST_BACKEND = os.environ.get('TOKEN_BLOCKLIST_BACKEND') or 'database'
+    TOKEN_BLOCKLIST_REDIS_URL = os.environ.get('TOKEN_BLOCKLIST_REDIS_URL')
+    TOKEN_BLOCKLIST_REDIS_PREFIX = 'revoked-token:'
+    # 进程内布隆过滤器的重建间隔(秒)：其他工作进程注销的token最多延迟这么久生效；
+    # 0 表示不使用过滤器，每次请求都查询存储
+    TOKEN_BLOCKLIST_SYNC_SECONDS = 5
+    
+    # 登录限流(滑动窗口)：同一用户名 N 秒内失败次数上限(登录成功后清零)，同一IP N 秒内尝试次数上限。
+    # memory 计数只在当前进程内，多进程部署时实际上限为 工作进程数 x 上限，可改用 redis 共享计数；
+    # 应用在反向代理之后时需设置 TRUSTED_PROXY_COUNT，否则所有客户端共用代理的IP
+    LOGIN_THROTTLE_ENABLED = True
+    LOGIN_THROTTLE_BACKEND = os.environ.get('LOGIN_THROTTLE_BACKEND') or 'memory'
+    LOGIN_THROTTLE_REDIS_URL = os.environ.get('LOGIN_THROTTLE_REDIS_URL')
+    LOGIN_THROTTLE_USERNAME_LIMIT = 5
+    LOGIN_THROTTLE_USERNAME_WINDOW = 300
+    LOGIN_THROTTLE_IP_LIMIT = 30
+    LOGIN_THROTTLE_IP_WINDOW = 60
+    
+    # 应用前面的可信反向代理层数，大于0时按 X-Forwarded-For/X-Forwarded-Proto 取客户端IP和协议
+    # (werkzeug ProxyFix)。直接对外提供服务时必须为0，否则客户端可以伪造IP。nginx 需配置：
+    #   proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
+    #   proxy_set_header X-Forwarded-Proto $scheme;
+    TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT') or 0)
+    
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///app.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
@@ -17,6 +56,70 @@ class Config:
         'pool_timeout': 30
     }
     
+    # 启动时自动执行数据库迁移(多进程部署建议关闭，改为部署前执行 flask --app run upgrade-db)
+    AUTO_MIGRATE = os.environ.get('AUTO_MIGRATE', 'True').lower() == 'true'
+    
+    # curl转换结果缓存配置
+    CONVERSION_CACHE_MAX_ENTRIES = 1024
+    CONVERSION_CACHE_MAX_BYTES = 64 * 1024 * 1024
+    CONVERSION_CACHE_TTL = 3600
+    REQUEST_IR_CACHE_MAX_ENTRIES = 1024
+    
+    # 首页最近转换记录缓冲区配置
+    HISTORY_FEED_SIZE = 20
+    HISTORY_FEED_PREVIEW_CHARS = 500
+    HISTORY_FEED_REFRESH_SECONDS = 60
+    
+    # 批量转换配置
+    CONVERSION_BATCH_MAX_SIZE = 500
+    
+    # 转换记录后台写入(write-behind)配置，开启后转换请求不再等待数据库提交
+    CONVERSION_WRITE_BEHIND = os.environ.get('CONVERSION_WRITE_BEHIND', 'False').lower() == 'true'
+    CONVERSION_FLUSH_INTERVAL_MS = 500
+    CONVERSION_FLUSH_BATCH_SIZE = 200
+    CONVERSION_QUEUE_MAX_SIZE = 10000
+    
+    # 用户变量缓存(按用户缓存全部变量，用数据库中的版本号校验，修改后立即失效)和批量修改上限
+    VARIABLE_CACHE_MAX_ENTRIES = 10000
+    VARIABLE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+    VARIABLE_BULK_MAX_SIZE = 500
+    
+    # 下载次数先在内存中累加，每隔 N 秒批量写入数据库；0 表示每次下载直接写入
+    DOWNLOAD_COUNT_FLUSH_SECONDS = 5
+    
+    # 文件存储配置
+    UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or 'uploads'
+    MAX_FILE_SIZE = 10 * 1024 * 1024
+    UPLOAD_SESSION_TTL = 24 * 3600
+    # 每个用户的存储配额(按文件大小累计，去重共享的内容也分别计入)，None 表示不限制
+    STORAGE_QUOTA_BYTES = 100 * MAX_FILE_SIZE
+    STORAGE_MAX_FILES = None
+    # 文件按内容哈希存放在 uploads/blobs/ 下，目录按哈希前缀分层，避免单个目录文件过多；
+    # 默认两级、每级2个十六进制字符(blobs/ab/cd/<hash>)。修改后执行 flask --app run migrate-storage
+    STORAGE_FANOUT_LEVELS = 2
+    STORAGE_FANOUT_WIDTH = 2
+    
+    # 文件存储后端：local 本地磁盘(多节点需共享磁盘)；s3 S3兼容对象存储；memory 仅用于测试
+    # 无论使用哪种后端，上传中的数据都先暂存在 UPLOAD_FOLDER/.staging 下
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND') or 'local'
+    S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL')
+    S3_BUCKET = os.environ.get('S3_BUCKET')
+    S3_ACCESS_KEY_ID = os.environ.get('S3_ACCESS_KEY_ID')
+    S3_SECRET_ACCESS_KEY = os.environ.get('S3_SECRET_ACCESS_KEY')
+    S3_REGION = os.environ.get('S3_REGION') or 'us-east-1'
+    S3_PREFIX = os.environ.get('S3_PREFIX') or ''
+    
+    # 文件下载交付方式：
+    #   direct            由应用进程发送文件(默认)
+    #   x-accel-redirect  返回 X-Accel-Redirect 头，由 nginx 发送，需配置：
+    #                       location /protected-uploads/ { internal; alias /path/to/uploads/; }
+    #                     nginx 代理到应用时同时设置 TRUSTED_PROXY_COUNT=1 (见上)
+    #   x-sendfile        返回 X-Sendfile 头(Apache mod_xsendfile、lighttpd)
+    FILE_DELIVERY_MODE = os.environ.get('FILE_DELIVERY_MODE') or 'direct'
+    FILE_ACCEL_REDIRECT_PREFIX = '/protected-uploads/'
+    # 本地开发时在应用内模拟 nginx 处理 X-Accel-Redirect
+    FILE_ACCEL_EMULATE = False
+    
     DEBUG = os.environ.get('FLASK_DEBUG', 'True').lower() == 'true'
 
 class DevelopmentConfig(Config):
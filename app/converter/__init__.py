@@ -1,3 +1,14 @@
-from .converter import convert_curl_to_python
+from .converter import (convert_curl, convert_curl_load, convert_curl_session, convert_curl_to_python,
+                        generate_load, generate_python_code, generate_session, generate_targets)
+from .generators import available_targets, generate_code, register_generator
+from .ir import RequestIR, build_request_ir, parse_request
+from .parser import ParsedRequest, parse_curl_command
+from .session import SESSION_CLIENTS, group_by_origin
+from .tokenizer import tokenize
 
-__all__ = ['convert_curl_to_python']
\ No newline at end of file
+__all__ = ['convert_curl', 'convert_curl_load', 'convert_curl_session', 'convert_curl_to_python',
+           'generate_load', 'generate_python_code', 'generate_session', 'generate_targets',
+           'SESSION_CLIENTS', 'group_by_origin',
+           'available_targets', 'generate_code', 'register_generator',
+           'RequestIR', 'build_request_ir', 'parse_request',
+           'ParsedRequest', 'parse_curl_command', 'tokenize']
@@ -1,121 +1,122 @@
-import re
-import urllib.parse
-import json
+from typing import Dict, Iterable, List, Optional
 
-def convert_curl_to_python(curl_command):
+from .generators import generate_code
+from .ir import RequestIR, build_request_ir, parse_request
+from .load import generate_load_script
+from .parser import ParsedRequest
+from .session import generate_session_code
+from .variables import expand_request
+
+
+def generate_python_code(parsed: ParsedRequest, variables: Optional[Dict[str, str]] = None) -> str:
+    """
+    根据解析结果生成 Python requests 代码
+
+    Args:
+        parsed: ParsedRequest 对象
+        variables: 用户变量，提供时生成的代码通过变量引用 {{name}}/$name 占位符
+
+    Returns:
+        Python 代码
+    """
+    return generate_code(build_request_ir(parsed), 'requests', variables)
+
+
+def generate_targets(ir: RequestIR, targets: Iterable[str] = ('requests',),
+                     variables: Optional[Dict[str, str]] = None, reference: bool = False) -> Dict[str, str]:
+    """
+    由同一个请求表示生成多个目标的代码
+
+    Args:
+        ir: 请求表示
+        targets: 目标名称列表
+        variables: 用户变量，替换 {{name}}、${name}、$name 占位符
+        reference: 为 True 时生成的代码引用变量(变量赋值 + f-string)，否则直接代入变量值
+
+    Returns:
+        目标名称 -> 代码
+
+    Raises:
+        ValueError: 不支持的目标，或目标无法表示该请求
+    """
+    if variables and not reference:
+        ir = expand_request(ir, variables)
+        variables = None
+    return {target: generate_code(ir, target, variables) for target in targets}
+
+
+def convert_curl(curl_command: str, targets: Iterable[str] = ('requests',),
+                 variables: Optional[Dict[str, str]] = None, reference: bool = False) -> Dict[str, str]:
+    """
+    将 curl 命令转换为一个或多个目标的代码(命令只解析一次)
+
+    Returns:
+        目标名称 -> 代码
+    """
+    return generate_targets(parse_request(curl_command), targets, variables, reference)
+
+
+def generate_session(irs: List[RequestIR], client: str = 'requests', variables: Optional[Dict[str, str]] = None,
+                     reference: bool = False, pool_size: int = 10, retries: int = 3) -> str:
+    """
+    为一组请求生成按源复用连接的代码
+
+    Args:
+        irs: 请求表示列表
+        client: requests 或 httpx
+        variables: 用户变量，替换 {{name}}、${name}、$name 占位符
+        reference: 为 True 时生成的代码引用变量(变量赋值 + f-string)，否则直接代入变量值
+        pool_size: 每个源的最大连接数
+        retries: 失败重试次数
+
+    Raises:
+        ValueError: 不支持的客户端
+    """
+    if variables and not reference:
+        irs = [expand_request(ir, variables) for ir in irs]
+        variables = None
+    return generate_session_code(irs, client, variables, pool_size, retries)
+
+
+def convert_curl_session(curl_commands: List[str], client: str = 'requests', **options) -> str:
+    """将多条 curl 命令转换为按源复用连接的代码(参数见 generate_session)"""
+    return generate_session([parse_request(command) for command in curl_commands], client, **options)
+
+
+def generate_load(irs: List[RequestIR], variables: Optional[Dict[str, str]] = None, reference: bool = False,
+                  concurrency: int = 10, rate_limit: Optional[float] = None, iterations: int = 1) -> str:
+    """
+    为一组请求生成异步并发压测脚本(asyncio + httpx.AsyncClient)
+
+    Args:
+        irs: 请求表示列表
+        variables: 用户变量，替换 {{name}}、${name}、$name 占位符
+        reference: 为 True 时生成的代码引用变量(变量赋值 + f-string)，否则直接代入变量值
+        concurrency: 最大并发请求数
+        rate_limit: 每秒最多发出的请求数，None 表示不限
+        iterations: 每个请求发送的次数
+
+    Raises:
+        ValueError: 请求包含文件上传
+    """
+    if variables and not reference:
+        irs = [expand_request(ir, variables) for ir in irs]
+        variables = None
+    return generate_load_script(irs, variables, concurrency, rate_limit, iterations)
+
+
+def convert_curl_load(curl_commands: List[str], **options) -> str:
+    """将多条 curl 命令转换为异步并发压测脚本(参数见 generate_load)"""
+    return generate_load([parse_request(command) for command in curl_commands], **options)
+
+
+def convert_curl_to_python(curl_command, variables: Optional[Dict[str, str]] = None, reference: bool = False):
     """
     将 curl 命令转换为 Python requests 代码
+
+    Args:
+        curl_command: curl 命令
+        variables: 用户变量，替换命令中的 {{name}}、${name}、$name 占位符
+        reference: 为 True 时生成的代码引用变量(变量赋值 + f-string)，否则直接代入变量值
     """
-    # 移除开头的 'curl' 和空白字符
-    curl_command = curl_command.strip()
-    if not curl_command.startswith('curl'):
-        raise ValueError("不是有效的 curl 命令")
-    
-    # 初始化解析结果
-    parsed = {
-        'url': '',
-        'method': 'GET',
-        'headers': {},
-        'data': None,
-        'params': {},
-        'auth': None,
-        'verify_ssl': True
-    }
-    
-    # 提取 URL
-    url_match = re.search(r'curl\s+["\']?([^"\'\s]+)', curl_command)
-    if not url_match:
-        raise ValueError("无法解析 URL")
-    parsed['url'] = url_match.group(1)
-    
-    # 解析各种选项
-    options = re.findall(r'(-[A-Za-z]|--[a-zA-Z-]+)\s+([^\s-]+|"[^"]*"|\'[^\']*\')', curl_command)
-    
-    for option, value in options:
-        value = value.strip('"\'')
-        
-        if option in ['-X', '--request']:
-            parsed['method'] = value.upper()
-        elif option in ['-H', '--header']:
-            if ':' in value:
-                key, val = value.split(':', 1)
-                parsed['headers'][key.strip()] = val.strip()
-        elif option in ['-d', '--data', '--data-raw']:
-            parsed['data'] = value
-            parsed['method'] = 'POST'  # 如果有数据，默认为 POST
-        elif option in ['-u', '--user']:
-            parsed['auth'] = value
-        elif option in ['-k', '--insecure']:
-            parsed['verify_ssl'] = False
-        elif option in ['-G', '--get']:
-            parsed['method'] = 'GET'
-    
-    # 生成 Python 代码
-    lines = [
-        "import requests",
-        "",
-        f"url = '{parsed['url']}'"
-    ]
-    
-    # 处理查询参数
-    if '?' in parsed['url']:
-        base_url, query_string = parsed['url'].split('?', 1)
-        lines[2] = f"url = '{base_url}'"
-        params = {}
-        for param in query_string.split('&'):
-            if '=' in param:
-                key, val = param.split('=', 1)
-                params[key] = urllib.parse.unquote(val)
-        if params:
-            lines.append(f"params = {params}")
-    
-    # 处理请求头
-    if parsed['headers']:
-        lines.append(f"headers = {parsed['headers']}")
-    
-    # 处理数据
-    if parsed['data']:
-        try:
-            # 尝试解析 JSON
-            data_dict = json.loads(parsed['data'])
-            lines.append(f"data = {data_dict}")
-        except:
-            # 如果不是 JSON，作为字符串处理
-            lines.append(f"data = '{parsed['data']}'")
-    
-    # 处理认证
-    if parsed['auth']:
-        if ':' in parsed['auth']:
-            username, password = parsed['auth'].split(':', 1)
-            lines.append(f"auth = ('{username}', '{password}')")
-    
-    # 处理 SSL 验证
-    if not parsed['verify_ssl']:
-        lines.append("verify = False")
-    
-    lines.append("")
-    
-    # 生成请求调用
-    request_line = f"response = requests.{parsed['method'].lower()}("
-    request_args = []
-    
-    request_args.append("url")
-    if 'params' in locals():
-        request_args.append("params=params")
-    if 'headers' in locals():
-        request_args.append("headers=headers")
-    if 'data' in locals():
-        request_args.append("data=data")
-    if 'auth' in locals():
-        request_args.append("auth=auth")
-    if not parsed['verify_ssl']:
-        request_args.append("verify=verify")
-    
-    request_line += ", ".join(request_args) + ")"
-    lines.append(request_line)
-    
-    lines.append("")
-    lines.append("print(f'Status Code: {response.status_code}')")
-    lines.append("print(f'Response: {response.text}')")
-    
-    return "\n".join(lines)
\ No newline at end of file
+    return convert_curl(curl_command, ('requests',), variables, reference)['requests']
@@ -0,0 +1,407 @@
+from typing import Callable, Dict, List, Optional
+
+from .ir import RequestIR
+from .variables import VariableReferences, render_value
+
+# 代码生成器注册表：目标名称 -> 生成函数(ir, literal) -> 代码行列表
+# 代码行以 import 语句开头、空行结束 import 部分；literal 把字符串渲染为 Python 表达式
+GENERATORS: Dict[str, Callable[[RequestIR, Callable[[str], str]], List[str]]] = {}
+
+# requests/httpx/aiohttp 提供快捷函数的请求方法
+_SHORTCUT_METHODS = {'GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'HEAD', 'OPTIONS'}
+# httpx 中不接受请求体参数的快捷函数
+_HTTPX_BODYLESS_METHODS = {'GET', 'HEAD', 'OPTIONS', 'DELETE'}
+
+
+def register_generator(name: str):
+    """注册代码生成器(装饰器)"""
+    def decorator(func):
+        GENERATORS[name] = func
+        return func
+    return decorator
+
+
+def available_targets() -> List[str]:
+    """已注册的目标名称"""
+    return list(GENERATORS)
+
+
+def generate_code(ir: RequestIR, target: str = 'requests', variables: Optional[Dict[str, str]] = None) -> str:
+    """
+    为请求表示生成指定目标的代码
+
+    Args:
+        ir: 请求表示
+        target: 目标名称(见 available_targets())
+        variables: 用户变量，提供时生成的代码通过变量引用 {{name}}/$name 占位符
+
+    Returns:
+        代码
+
+    Raises:
+        ValueError: 不支持的目标，或目标无法表示该请求
+    """
+    generator = GENERATORS.get(target)
+    if generator is None:
+        raise ValueError(f"不支持的代码生成目标: {target}")
+
+    literal = VariableReferences(variables) if variables else repr
+    return "\n".join(_with_assignments(generator(ir, literal), literal))
+
+
+def _with_assignments(lines: List[str], literal) -> List[str]:
+    """引用到的用户变量在 import 之后赋值"""
+    if isinstance(literal, VariableReferences) and literal.used:
+        position = lines.index('') + 1
+        lines[position:position] = ["# 用户变量"] + literal.assignments() + [""]
+    return lines
+
+
+def _comment_text(text: str) -> str:
+    """
+    写入 # 注释的文本：换行等不可打印字符按 repr 转义
+
+    否则命令中带换行的 URL 或请求方法会在生成的代码中变成可执行的语句。
+    """
+    return ''.join(char if char.isprintable() else repr(char)[1:-1] for char in text)
+
+
+def _format_mapping(name: str, items) -> List[str]:
+    """将键值对格式化为多行字典字面量(键和值都是 Python 表达式)"""
+    lines = [f"{name} = {{"]
+    for key, value in items:
+        lines.append(f"    {key}: {value},")
+    lines.append("}")
+    return lines
+
+
+def _pairs_mapping(name: str, pairs, literal) -> List[str]:
+    return _format_mapping(name, ((literal(key), literal(value)) for key, value in pairs))
+
+
+def _params_lines(ir: RequestIR, literal) -> List[str]:
+    if ir.has_unique_params:
+        return _pairs_mapping('params', ir.params, literal)
+    # 存在重复参数名时保留为列表
+    return [f"params = {render_value(list(ir.params), literal)}"]
+
+
+def _body_lines(ir: RequestIR, literal) -> List[str]:
+    if ir.json_text is not None:
+        return [f"json_data = {render_value(ir.json_payload(), literal)}"]
+    if ir.data is not None:
+        return [f"data = {literal(ir.data)}"]
+    return []
+
+
+def _call(target: str, method: str, args: List[str], shortcut: bool = True) -> str:
+    if shortcut and method in _SHORTCUT_METHODS:
+        return f"{target}.{method.lower()}(" + ", ".join(args) + ")"
+    return f"{target}.request({method!r}, " + ", ".join(args) + ")"
+
+
+_PRINT_RESPONSE = [
+    "print(f'Status Code: {response.status_code}')",
+    "print(f'Response: {response.text}')"
+]
+
+
+def _requests_parts(ir: RequestIR, literal, shared_headers=(), session: bool = False):
+    """
+    requests 调用的变量定义和请求参数
+
+    Args:
+        shared_headers: 已设置在会话上的请求头，不再重复传入
+        session: 是否在会话上发送(代理和证书校验设置在会话上)
+    """
+    lines = [f"url = {literal(ir.url)}"]
+    request_args = ["url"]
+
+    if ir.params:
+        lines.extend(_params_lines(ir, literal))
+        request_args.append("params=params")
+
+    headers = [pair for pair in ir.headers if pair not in shared_headers]
+    if headers:
+        lines.extend(_pairs_mapping('headers', headers, literal))
+        request_args.append("headers=headers")
+
+    if ir.cookies:
+        lines.extend(_pairs_mapping('cookies', ir.cookies, literal))
+        request_args.append("cookies=cookies")
+
+    if ir.json_text is not None or ir.data is not None:
+        lines.extend(_body_lines(ir, literal))
+        request_args.append("json=json_data" if ir.json_text is not None else "data=data")
+
+    if ir.form:
+        entries = []
+        for name, value in ir.form:
+            if value.startswith('@'):
+                entries.append((literal(name), f"open({literal(value[1:])}, 'rb')"))
+            else:
+                entries.append((literal(name), f"(None, {literal(value)})"))
+        lines.extend(_format_mapping('files', entries))
+        request_args.append("files=files")
+
+    if ir.auth:
+        lines.append(f"auth = {render_value(ir.auth, literal)}")
+        request_args.append("auth=auth")
+
+    if ir.proxy and not session:
+        proxy = literal(ir.proxy)
+        lines.append(f"proxies = {{'http': {proxy}, 'https': {proxy}}}")
+        request_args.append("proxies=proxies")
+
+    if not ir.verify_ssl and not session:
+        lines.append("verify = False")
+        request_args.append("verify=verify")
+
+    if ir.timeout is not None:
+        request_args.append(f"timeout={ir.timeout!r}")
+    return lines, request_args
+
+
+@register_generator('requests')
+def generate_requests(ir: RequestIR, literal) -> List[str]:
+    """Python requests"""
+    definitions, request_args = _requests_parts(ir, literal)
+    return [
+        "import requests",
+        "",
+        *definitions,
+        "",
+        "response = " + _call('requests', ir.method, request_args),
+        "",
+        *_PRINT_RESPONSE
+    ]
+
+
+def _httpx_parts(ir: RequestIR, literal, shared_headers=()):
+    """
+    httpx 同步和异步客户端共用的变量定义、请求参数和客户端参数
+
+    Args:
+        shared_headers: 已设置在客户端上的请求头，不再重复传入
+    """
+    lines = [f"url = {literal(ir.url)}"]
+    request_args = ["url"]
+    client_args = []
+
+    if ir.params:
+        lines.extend(_params_lines(ir, literal))
+        request_args.append("params=params")
+
+    headers = [pair for pair in ir.headers if pair not in shared_headers]
+    if headers:
+        lines.extend(_pairs_mapping('headers', headers, literal))
+        request_args.append("headers=headers")
+
+    # httpx 推荐在客户端上设置 cookie
+    if ir.cookies:
+        lines.extend(_pairs_mapping('cookies', ir.cookies, literal))
+        client_args.append("cookies=cookies")
+
+    if ir.json_text is not None or ir.data is not None:
+        lines.extend(_body_lines(ir, literal))
+        request_args.append("json=json_data" if ir.json_text is not None else "content=data")
+
+    if ir.form:
+        fields = [(name, value) for name, value in ir.form if not value.startswith('@')]
+        uploads = [(name, value[1:]) for name, value in ir.form if value.startswith('@')]
+        if fields:
+            lines.extend(_pairs_mapping('form_data', fields, literal))
+            request_args.append("data=form_data")
+        if uploads:
+            lines.extend(_format_mapping('files', ((literal(name), f"open({literal(path)}, 'rb')")
+                                                   for name, path in uploads)))
+            request_args.append("files=files")
+
+    if ir.auth:
+        lines.append(f"auth = {render_value(ir.auth, literal)}")
+        request_args.append("auth=auth")
+
+    if ir.proxy:
+        client_args.append(f"proxy={literal(ir.proxy)}")
+    if not ir.verify_ssl:
+        client_args.append("verify=False")
+    if ir.timeout is not None:
+        client_args.append(f"timeout={ir.timeout!r}")
+    return lines, request_args, client_args
+
+
+def _httpx_call(target: str, ir: RequestIR, request_args: List[str]) -> str:
+    has_body = ir.json_text is not None or ir.data is not None or bool(ir.form)
+    return _call(target, ir.method, request_args, not (has_body and ir.method in _HTTPX_BODYLESS_METHODS))
+
+
+@register_generator('httpx')
+def generate_httpx(ir: RequestIR, literal) -> List[str]:
+    """Python httpx 同步客户端"""
+    definitions, request_args, client_args = _httpx_parts(ir, literal)
+    return [
+        "import httpx",
+        "",
+        *definitions,
+        "",
+        f"with httpx.Client({', '.join(client_args)}) as client:",
+        f"    response = {_httpx_call('client', ir, request_args)}",
+        "",
+        *_PRINT_RESPONSE
+    ]
+
+
+@register_generator('httpx-async')
+def generate_httpx_async(ir: RequestIR, literal) -> List[str]:
+    """Python httpx 异步客户端"""
+    definitions, request_args, client_args = _httpx_parts(ir, literal)
+    return [
+        "import asyncio",
+        "import httpx",
+        "",
+        *definitions,
+        "",
+        "",
+        "async def main():",
+        f"    async with httpx.AsyncClient({', '.join(client_args)}) as client:",
+        f"        response = await {_httpx_call('client', ir, request_args)}",
+        *("    " + line for line in _PRINT_RESPONSE),
+        "",
+        "",
+        "asyncio.run(main())"
+    ]
+
+
+@register_generator('aiohttp')
+def generate_aiohttp(ir: RequestIR, literal) -> List[str]:
+    """Python aiohttp"""
+    lines = [
+        "import asyncio",
+        "import aiohttp",
+        "",
+        f"url = {literal(ir.url)}"
+    ]
+    request_args = ["url"]
+    session_args = []
+
+    if ir.params:
+        lines.extend(_params_lines(ir, literal))
+        request_args.append("params=params")
+
+    if ir.headers:
+        lines.extend(_pairs_mapping('headers', ir.headers, literal))
+        request_args.append("headers=headers")
+
+    if ir.cookies:
+        lines.extend(_pairs_mapping('cookies', ir.cookies, literal))
+        session_args.append("cookies=cookies")
+
+    if ir.json_text is not None or ir.data is not None:
+        lines.extend(_body_lines(ir, literal))
+        request_args.append("json=json_data" if ir.json_text is not None else "data=data")
+
+    if ir.form:
+        lines.append("form_data = aiohttp.FormData()")
+        for name, value in ir.form:
+            if value.startswith('@'):
+                lines.append(f"form_data.add_field({literal(name)}, open({literal(value[1:])}, 'rb'))")
+            else:
+                lines.append(f"form_data.add_field({literal(name)}, {literal(value)})")
+        request_args.append("data=form_data")
+
+    if ir.auth:
+        lines.append(f"auth = aiohttp.BasicAuth({literal(ir.auth[0])}, {literal(ir.auth[1])})")
+        request_args.append("auth=auth")
+
+    if ir.proxy:
+        request_args.append(f"proxy={literal(ir.proxy)}")
+    if not ir.verify_ssl:
+        request_args.append("ssl=False")
+    if ir.timeout is not None:
+        session_args.append(f"timeout=aiohttp.ClientTimeout(total={ir.timeout!r})")
+
+    lines.extend([
+        "",
+        "",
+        "async def main():",
+        f"    async with aiohttp.ClientSession({', '.join(session_args)}) as session:",
+        f"        async with {_call('session', ir.method, request_args)} as response:",
+        "            text = await response.text()",
+        "            print(f'Status Code: {response.status}')",
+        "            print(f'Response: {text}')",
+        "",
+        "",
+        "asyncio.run(main())"
+    ])
+    return lines
+
+
+@register_generator('http.client')
+def generate_http_client(ir: RequestIR, literal) -> List[str]:
+    """Python 标准库 http.client(无第三方依赖)"""
+    if ir.form:
+        raise ValueError("http.client 目标不支持 multipart 表单(-F)")
+
+    imports = ["import http.client"]
+    if ir.auth:
+        imports.append("import base64")
+    if ir.json_text is not None:
+        imports.append("import json")
+    if not ir.verify_ssl:
+        imports.append("import ssl")
+    imports.append("from urllib.parse import urlencode, urlsplit" if ir.params else "from urllib.parse import urlsplit")
+
+    lines = imports + ["", f"url = {literal(ir.url)}"]
+    if ir.params:
+        lines.extend(_params_lines(ir, literal))
+    if ir.headers:
+        lines.extend(_pairs_mapping('headers', ir.headers, literal))
+    else:
+        lines.append("headers = {}")
+    if ir.cookies:
+        lines.extend(_pairs_mapping('cookies', ir.cookies, literal))
+        lines.append("headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in cookies.items())")
+    if ir.auth:
+        lines.append(f"auth = {render_value(ir.auth, literal)}")
+        lines.append("headers['Authorization'] = 'Basic ' + base64.b64encode(':'.join(auth).encode('utf-8')).decode('ascii')")
+
+    lines.extend(_body_lines(ir, literal))
+    if ir.json_text is not None:
+        lines.append("body = json.dumps(json_data).encode('utf-8')")
+    elif ir.data is not None:
+        lines.append("body = data.encode('utf-8')")
+    else:
+        lines.append("body = None")
+
+    lines.extend([
+        "",
+        "parts = urlsplit(url)",
+        "path = parts.path or '/'"
+    ])
+    if ir.params:
+        lines.append("path += '?' + urlencode(params)")
+
+    options = []
+    if ir.timeout is not None:
+        options.append(f"timeout={ir.timeout!r}")
+    lines.append("connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection")
+    if not ir.verify_ssl:
+        lines.append("ssl_options = {'context': ssl._create_unverified_context()} if parts.scheme == 'https' else {}")
+        options.append("**ssl_options")
+    if ir.proxy:
+        # 通过代理的 CONNECT 隧道访问目标地址
+        lines.append(f"proxy = urlsplit({literal(ir.proxy)})")
+        lines.append(f"connection = connection_class({', '.join(['proxy.netloc'] + options)})")
+        lines.append("connection.set_tunnel(parts.netloc)")
+    else:
+        lines.append(f"connection = connection_class({', '.join(['parts.netloc'] + options)})")
+
+    lines.extend([
+        f"connection.request({ir.method!r}, path, body=body, headers=headers)",
+        "response = connection.getresponse()",
+        "",
+        "print(f'Status Code: {response.status}')",
+        "print(f'Response: {response.read().decode()}')",
+        "connection.close()"
+    ])
+    return lines
@@ -0,0 +1,166 @@
+import json
+from typing import Any, Callable, Optional, Tuple
+
+from .parser import ParsedRequest, parse_curl_command
+
+
+class RequestIR:
+    """
+    与目标语言无关的请求表示(中间表示)
+
+    由解析结果构建后不可修改，字段都是字符串或元组，可以安全地缓存并交给多个代码生成器使用。
+    """
+
+    __slots__ = ('method', 'url', 'params', 'headers', 'cookies', 'data', 'json_text',
+                 'form', 'auth', 'proxy', 'verify_ssl', 'timeout')
+
+    def __init__(self, method: str, url: str, params: Tuple[Tuple[str, str], ...] = (),
+                 headers: Tuple[Tuple[str, str], ...] = (), cookies: Tuple[Tuple[str, str], ...] = (),
+                 data: Optional[str] = None, json_text: Optional[str] = None,
+                 form: Tuple[Tuple[str, str], ...] = (), auth: Optional[Tuple[str, str]] = None,
+                 proxy: Optional[str] = None, verify_ssl: bool = True, timeout: Optional[float] = None):
+        """
+        初始化请求表示
+
+        Args:
+            method: 请求方法
+            url: 不含查询串的 URL
+            params: 查询参数(可能有重复的参数名)
+            headers: 请求头
+            cookies: cookie
+            data: 非 JSON 的请求体
+            json_text: JSON 请求体(原文)
+            form: multipart 表单字段，值以 @ 开头表示上传文件
+            auth: 基本认证(用户名, 密码)
+            proxy: 代理地址
+            verify_ssl: 是否校验证书
+            timeout: 超时时间(秒)
+        """
+        for name, value in (('method', method), ('url', url), ('params', tuple(params)),
+                            ('headers', tuple(headers)), ('cookies', tuple(cookies)), ('data', data),
+                            ('json_text', json_text), ('form', tuple(form)),
+                            ('auth', tuple(auth) if auth else None), ('proxy', proxy),
+                            ('verify_ssl', verify_ssl), ('timeout', timeout)):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RequestIR 不可修改")
+
+    def __delattr__(self, name):
+        raise AttributeError("RequestIR 不可修改")
+
+    def _key(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other):
+        return isinstance(other, RequestIR) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return f'<RequestIR {self.method} {self.url}>'
+
+    def json_payload(self) -> Any:
+        """解析后的 JSON 请求体(每次返回新对象，调用方可以修改)"""
+        return json.loads(self.json_text) if self.json_text is not None else None
+
+    @property
+    def has_unique_params(self) -> bool:
+        """查询参数名是否没有重复(可以表示为字典)"""
+        names = [name for name, _ in self.params]
+        return len(set(names)) == len(names)
+
+    def map_strings(self, func: Callable[[str], str]) -> 'RequestIR':
+        """
+        对所有字符串字段(包括 JSON 请求体中的键和值)应用 func，返回新的请求表示
+
+        JSON 请求体按解析后的结构处理，替换后的内容中有引号等字符也不会破坏 JSON。
+        """
+        def pairs(items):
+            return tuple((func(key), func(value)) for key, value in items)
+
+        json_text = self.json_text
+        if json_text is not None:
+            json_text = json.dumps(_map_json(json.loads(json_text), func), ensure_ascii=False)
+        return RequestIR(
+            method=self.method,
+            url=func(self.url),
+            params=pairs(self.params),
+            headers=pairs(self.headers),
+            cookies=pairs(self.cookies),
+            data=func(self.data) if self.data is not None else None,
+            json_text=json_text,
+            form=pairs(self.form),
+            auth=tuple(func(part) for part in self.auth) if self.auth else None,
+            proxy=func(self.proxy) if self.proxy else self.proxy,
+            verify_ssl=self.verify_ssl,
+            timeout=self.timeout
+        )
+
+    def approximate_size(self) -> int:
+        """请求表示的大致字节数(用于缓存容量统计)"""
+        size = len(self.url) + len(self.data or '') + len(self.json_text or '')
+        for pairs in (self.params, self.headers, self.cookies, self.form):
+            size += sum(len(key) + len(value) for key, value in pairs)
+        return size
+
+
+def _map_json(value, func):
+    if isinstance(value, str):
+        return func(value)
+    if isinstance(value, dict):
+        return {func(key): _map_json(item, func) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_map_json(item, func) for item in value]
+    return value
+
+
+def _json_text(parsed: ParsedRequest) -> Optional[str]:
+    """请求体为 JSON 对象或数组时返回原文，否则返回 None"""
+    content_type = next((v for k, v in parsed.headers.items() if k.lower() == 'content-type'), '')
+    if not parsed.json_body and 'json' not in content_type.lower():
+        return None
+    try:
+        payload = json.loads(parsed.data)
+    except ValueError:
+        return None
+    return parsed.data if isinstance(payload, (dict, list)) else None
+
+
+def build_request_ir(parsed: ParsedRequest) -> RequestIR:
+    """
+    由解析结果构建请求表示
+
+    Args:
+        parsed: ParsedRequest 对象
+
+    Returns:
+        RequestIR 对象
+    """
+    base_url, params = parsed.split_url()
+    data = json_text = None
+    # -G 模式下请求体已并入查询参数
+    if parsed.data is not None and not parsed.use_get:
+        json_text = _json_text(parsed)
+        if json_text is None:
+            data = parsed.data
+    return RequestIR(
+        method=parsed.resolve_method(),
+        url=base_url,
+        params=params,
+        headers=parsed.headers.items(),
+        cookies=parsed.cookies.items(),
+        data=data,
+        json_text=json_text,
+        form=parsed.form,
+        auth=parsed.auth,
+        proxy=parsed.proxy,
+        verify_ssl=parsed.verify_ssl,
+        timeout=parsed.timeout
+    )
+
+
+def parse_request(curl_command: str) -> RequestIR:
+    """解析 curl 命令并构建请求表示"""
+    return build_request_ir(parse_curl_command(curl_command))
@@ -0,0 +1,155 @@
+from typing import Dict, List, Optional, Sequence
+
+from .generators import _comment_text, _httpx_parts, _with_assignments
+from .ir import RequestIR
+from .variables import VariableReferences
+
+# 延迟直方图的分桶上限(毫秒)
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+# 压测脚本的发送、统计和输出部分(与请求无关)
+_RUNNER = '''
+
+async def send(client, options, latencies, statuses):
+    start = time.perf_counter()
+    try:
+        response = await client.request(**options)
+        statuses[response.status_code] += 1
+    except httpx.HTTPError as e:
+        statuses[type(e).__name__] += 1
+    latencies.append(time.perf_counter() - start)
+
+
+def report(latencies, statuses, elapsed):
+    latencies.sort()
+    count = len(latencies)
+    print(f'Requests: {count}  Elapsed: {elapsed:.2f}s  Throughput: {count / elapsed:.1f} req/s')
+    for percentile in (50, 90, 95, 99):
+        latency = latencies[min(count - 1, count * percentile // 100)]
+        print(f'p{percentile}: {latency * 1000:.1f} ms')
+
+    print('Latency histogram (ms):')
+    buckets = Counter(bisect.bisect_left(BUCKETS_MS, latency * 1000) for latency in latencies)
+    lower = 0
+    for index, upper in enumerate(BUCKETS_MS + [None]):
+        label = f'{lower}-{upper}' if upper is not None else f'>{lower}'
+        bar = '#' * round(40 * buckets[index] / count)
+        print(f'{label:>12} {buckets[index]:>8} {bar}')
+        lower = upper
+    print(f'Status: {dict(statuses)}')
+
+
+async def main():
+    limits = httpx.Limits(max_connections=CONCURRENCY, max_keepalive_connections=CONCURRENCY)
+    clients = [httpx.AsyncClient(limits=limits, **options) for options in CLIENT_OPTIONS]
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    interval = 1 / RATE_LIMIT if RATE_LIMIT else 0
+    latencies = []
+    statuses = Counter()
+    tasks = set()
+
+    async def run(client, options):
+        try:
+            await send(client, options, latencies, statuses)
+        finally:
+            semaphore.release()
+
+    started = time.perf_counter()
+    for number in range(ITERATIONS * len(REQUESTS)):
+        client_index, options = REQUESTS[number % len(REQUESTS)]
+        if interval:
+            # 按固定间隔发出请求，不超过 RATE_LIMIT
+            await asyncio.sleep(max(0.0, started + number * interval - time.perf_counter()))
+        await semaphore.acquire()
+        task = asyncio.create_task(run(clients[client_index], options))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    for client in clients:
+        await client.aclose()
+    report(latencies, statuses, elapsed)
+
+
+asyncio.run(main())'''.split('\n')
+
+
+def generate_load_script(irs: Sequence[RequestIR], variables: Optional[Dict[str, str]] = None,
+                         concurrency: int = 10, rate_limit: Optional[float] = None,
+                         iterations: int = 1) -> str:
+    """
+    为一组请求生成异步并发压测脚本(asyncio + httpx.AsyncClient)
+
+    脚本按顺序循环发送所有请求 iterations 轮，信号量限制同时进行的请求数，
+    按固定间隔限制每秒发出的请求数，结束后输出吞吐量、延迟分位数、延迟直方图和状态码统计。
+    代理和证书校验相同的请求共用一个客户端(连接池)。
+
+    Args:
+        irs: 请求表示列表
+        variables: 用户变量，提供时生成的代码通过变量引用 {{name}}/$name 占位符
+        concurrency: 最大并发请求数
+        rate_limit: 每秒最多发出的请求数，None 表示不限
+        iterations: 每个请求发送的次数
+
+    Returns:
+        Python 代码
+
+    Raises:
+        ValueError: 请求包含文件上传(文件对象不能重复发送)
+    """
+    literal = VariableReferences(variables) if variables else repr
+    lines = [
+        "import asyncio",
+        "import bisect",
+        "import time",
+        "from collections import Counter",
+        "import httpx",
+        "",
+        f"CONCURRENCY = {concurrency!r}",
+        f"RATE_LIMIT = {rate_limit!r}",
+        f"ITERATIONS = {iterations!r}",
+        f"BUCKETS_MS = {LATENCY_BUCKETS_MS!r}",
+        "",
+        "REQUESTS = []"
+    ]
+
+    client_options: List[tuple] = []
+    for index, ir in enumerate(irs):
+        if any(value.startswith('@') for _, value in ir.form):
+            raise ValueError(f"第 {index + 1} 条命令包含文件上传，压测脚本不支持")
+
+        definitions, request_args, _ = _httpx_parts(ir, literal)
+        options = [f"'method': {ir.method!r}"]
+        for argument in request_args:
+            name, _, value = argument.partition('=')
+            options.append(f"{name!r}: {value or name}")
+        # httpx 不再支持单个请求的 cookie，改为 Cookie 请求头
+        if ir.cookies:
+            if not ir.headers:
+                definitions.append("headers = {}")
+                options.append("'headers': headers")
+            definitions.append("headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in cookies.items())")
+        if ir.timeout is not None:
+            options.append(f"'timeout': {ir.timeout!r}")
+
+        key = (ir.verify_ssl, ir.proxy)
+        if key not in client_options:
+            client_options.append(key)
+
+        lines.extend(["", f"# 请求 {index + 1}: {_comment_text(ir.method)} {_comment_text(ir.url)}",
+                      *definitions])
+        lines.append(f"REQUESTS.append(({client_options.index(key)}, {{{', '.join(options)}}}))")
+
+    # 客户端级别的设置：证书校验和代理
+    rendered = []
+    for verify_ssl, proxy in client_options:
+        items = []
+        if not verify_ssl:
+            items.append("'verify': False")
+        if proxy:
+            items.append(f"'proxy': {literal(proxy)}")
+        rendered.append('{' + ', '.join(items) + '}')
+    lines.extend(["", f"CLIENT_OPTIONS = [{', '.join(rendered)}]"])
+    lines.extend(_RUNNER)
+    return "\n".join(_with_assignments(lines, literal))
@@ -0,0 +1,266 @@
+import urllib.parse
+from typing import Optional, Dict, Any, List, Tuple
+
+from .tokenizer import tokenize
+
+
+class ParsedRequest:
+    """curl 命令解析结果，供代码生成器使用"""
+
+    def __init__(self):
+        self.url = ''
+        self.method = None
+        self.headers = {}
+        self.cookies = {}
+        self.data_parts = []
+        self.form = []
+        self.json_body = False
+        self.auth = None
+        self.verify_ssl = True
+        self.use_get = False
+        self.head = False
+        self.timeout = None
+        self.proxy = None
+
+    @property
+    def data(self) -> Optional[str]:
+        """合并后的请求体(多个 -d 以 & 连接，与 curl 一致)"""
+        if not self.data_parts:
+            return None
+        return '&'.join(self.data_parts)
+
+    def resolve_method(self) -> str:
+        """按 curl 的优先级推断最终请求方法"""
+        if self.method:
+            return self.method
+        if self.head:
+            return 'HEAD'
+        if self.use_get:
+            return 'GET'
+        if self.data_parts or self.form:
+            return 'POST'
+        return 'GET'
+
+    def split_url(self) -> Tuple[str, List[Tuple[str, str]]]:
+        """
+        拆分 URL 与查询参数
+
+        Returns:
+            (不含查询串的 URL, 查询参数列表)，-G 模式下请求体也并入查询参数
+        """
+        base_url, _, query_string = self.url.partition('?')
+        params = urllib.parse.parse_qsl(query_string, keep_blank_values=True)
+        if self.use_get and self.data_parts:
+            params.extend(urllib.parse.parse_qsl(self.data, keep_blank_values=True))
+        return base_url, params
+
+
+# 选项处理函数：(parsed, value) -> None
+
+def _set_method(parsed: ParsedRequest, value: str):
+    parsed.method = value.upper()
+
+
+def _add_header(parsed: ParsedRequest, value: str):
+    if ':' not in value:
+        return
+    key, val = value.split(':', 1)
+    key, val = key.strip(), val.strip()
+    if key.lower() == 'cookie':
+        _add_cookie(parsed, val)
+    else:
+        parsed.headers[key] = val
+
+
+def _add_data(parsed: ParsedRequest, value: str):
+    parsed.data_parts.append(value)
+
+
+def _add_data_urlencode(parsed: ParsedRequest, value: str):
+    name, sep, content = value.partition('=')
+    if not sep:
+        parsed.data_parts.append(urllib.parse.quote_plus(value))
+    elif not name:
+        parsed.data_parts.append(urllib.parse.quote_plus(content))
+    else:
+        parsed.data_parts.append(f"{name}={urllib.parse.quote_plus(content)}")
+
+
+def _add_json(parsed: ParsedRequest, value: str):
+    parsed.data_parts.append(value)
+    parsed.json_body = True
+    parsed.headers.setdefault('Content-Type', 'application/json')
+    parsed.headers.setdefault('Accept', 'application/json')
+
+
+def _add_form(parsed: ParsedRequest, value: str):
+    name, sep, content = value.partition('=')
+    if sep:
+        parsed.form.append((name, content))
+
+
+def _add_cookie(parsed: ParsedRequest, value: str):
+    for item in value.split(';'):
+        key, sep, val = item.strip().partition('=')
+        if sep and key:
+            parsed.cookies[key] = val
+
+
+def _set_auth(parsed: ParsedRequest, value: str):
+    username, _, password = value.partition(':')
+    parsed.auth = (username, password)
+
+
+def _set_header_value(name: str):
+    def handler(parsed: ParsedRequest, value: str):
+        parsed.headers[name] = value
+    return handler
+
+
+def _set_flag(attr: str, flag_value: Any):
+    def handler(parsed: ParsedRequest, value: str):
+        setattr(parsed, attr, flag_value)
+    return handler
+
+
+def _set_url(parsed: ParsedRequest, value: str):
+    parsed.url = value
+
+
+def _set_timeout(parsed: ParsedRequest, value: str):
+    try:
+        parsed.timeout = float(value)
+    except ValueError:
+        raise ValueError(f"无效的超时时间: {value}")
+
+
+def _set_proxy(parsed: ParsedRequest, value: str):
+    parsed.proxy = value
+
+
+def _ignore(parsed: ParsedRequest, value: str):
+    pass
+
+
+# 选项表：选项名 -> (处理函数, 是否需要参数值)
+OPTION_TABLE: Dict[str, Tuple[Any, bool]] = {}
+
+
+def _register(names: List[str], handler, takes_value: bool):
+    for name in names:
+        OPTION_TABLE[name] = (handler, takes_value)
+
+
+_register(['-X', '--request'], _set_method, True)
+_register(['-H', '--header'], _add_header, True)
+_register(['-d', '--data', '--data-raw', '--data-ascii', '--data-binary'], _add_data, True)
+_register(['--data-urlencode'], _add_data_urlencode, True)
+_register(['--json'], _add_json, True)
+_register(['-F', '--form', '--form-string'], _add_form, True)
+_register(['-b', '--cookie'], _add_cookie, True)
+_register(['-u', '--user'], _set_auth, True)
+_register(['-A', '--user-agent'], _set_header_value('User-Agent'), True)
+_register(['-e', '--referer'], _set_header_value('Referer'), True)
+_register(['--url'], _set_url, True)
+_register(['-m', '--max-time'], _set_timeout, True)
+_register(['-x', '--proxy'], _set_proxy, True)
+_register(['-k', '--insecure'], _set_flag('verify_ssl', False), False)
+_register(['-G', '--get'], _set_flag('use_get', True), False)
+_register(['-I', '--head'], _set_flag('head', True), False)
+
+# 对生成代码无影响、但需要正确跳过参数值的选项
+_register(['-o', '--output', '-w', '--write-out', '-c', '--cookie-jar', '-E', '--cert',
+           '--cacert', '--key', '--connect-timeout', '--retry', '--retry-delay',
+           '--retry-max-time', '-r', '--range', '-T', '--upload-file', '--resolve',
+           '--limit-rate', '-K', '--config', '-D', '--dump-header', '--max-redirs',
+           '--interface', '--oauth2-bearer'], _ignore, True)
+_register(['-s', '--silent', '-S', '--show-error', '-v', '--verbose', '-i', '--include',
+           '--compressed', '-L', '--location', '-f', '--fail', '-N', '--no-buffer', '-O', '--remote-name',
+           '-#', '--progress-bar', '-g', '--globoff', '-0', '--http1.0', '--http1.1',
+           '--http2', '--http2-prior-knowledge', '--tr-encoding', '--no-keepalive',
+           '--path-as-is', '-q', '--disable'], _ignore, False)
+
+
+def parse_curl_command(curl_command: str) -> ParsedRequest:
+    """
+    解析 curl 命令
+
+    先用 tokenizer 一次性切分参数，再逐个参数查选项表分发，
+    整体耗时与命令长度成线性关系。
+
+    Args:
+        curl_command: curl 命令
+
+    Returns:
+        ParsedRequest 对象
+
+    Raises:
+        ValueError: 命令无效或无法解析 URL
+    """
+    tokens = tokenize(curl_command.strip())
+    if not tokens or tokens[0] != 'curl':
+        raise ValueError("不是有效的 curl 命令")
+
+    parsed = ParsedRequest()
+    index = 1
+    count = len(tokens)
+    options_ended = False
+
+    while index < count:
+        token = tokens[index]
+        index += 1
+
+        if options_ended or not token.startswith('-') or token == '-':
+            if not parsed.url:
+                parsed.url = token
+            continue
+
+        if token == '--':
+            options_ended = True
+            continue
+
+        if token.startswith('--'):
+            name, sep, inline_value = token.partition('=')
+            entry = OPTION_TABLE.get(name)
+            if entry is None:
+                # 未知长选项按无参数开关处理
+                continue
+            handler, takes_value = entry
+            if takes_value:
+                if sep:
+                    value = inline_value
+                elif index < count:
+                    value = tokens[index]
+                    index += 1
+                else:
+                    raise ValueError(f"选项 {name} 缺少参数")
+                handler(parsed, value)
+            else:
+                handler(parsed, '')
+            continue
+
+        # 短选项，支持 -sSL 组合和 -XPOST 紧跟参数值
+        pos = 1
+        while pos < len(token):
+            name = '-' + token[pos]
+            pos += 1
+            entry = OPTION_TABLE.get(name)
+            if entry is None:
+                continue
+            handler, takes_value = entry
+            if not takes_value:
+                handler(parsed, '')
+                continue
+            if pos < len(token):
+                value = token[pos:]
+            elif index < count:
+                value = tokens[index]
+                index += 1
+            else:
+                raise ValueError(f"选项 {name} 缺少参数")
+            handler(parsed, value)
+            break
+
+    if not parsed.url:
+        raise ValueError("无法解析 URL")
+    return parsed
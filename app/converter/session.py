@@ -0,0 +1,157 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+from .generators import (_PRINT_RESPONSE, _call, _comment_text, _httpx_call, _httpx_parts, _requests_parts,
+                         _with_assignments)
+from .ir import RequestIR
+from .variables import VariableReferences
+
+# 支持复用连接的客户端
+SESSION_CLIENTS = ('requests', 'httpx')
+
+
+def request_origin(ir: RequestIR) -> str:
+    """请求的源(协议 + 主机 + 端口)，URL 以变量开头时为变量占位符"""
+    parts = urlsplit(ir.url)
+    if parts.netloc:
+        return f"{parts.scheme.lower()}://{parts.netloc.lower()}"
+    return ir.url.split('/', 1)[0]
+
+
+def group_by_origin(irs: Sequence[RequestIR]) -> List[Tuple[str, List[int]]]:
+    """
+    按源分组请求
+
+    代理和证书校验设置在会话上，这两项不同的同源请求分到不同的组。
+
+    Returns:
+        [(源, 请求下标列表)]，按首次出现的顺序
+    """
+    groups: Dict[tuple, List[int]] = {}
+    for index, ir in enumerate(irs):
+        groups.setdefault((request_origin(ir), ir.verify_ssl, ir.proxy), []).append(index)
+    return [(key[0], indexes) for key, indexes in groups.items()]
+
+
+def _shared_headers(irs: Sequence[RequestIR]) -> Tuple[Tuple[str, str], ...]:
+    """组内所有请求都带有的请求头(只有一个请求时不提取)"""
+    if len(irs) < 2:
+        return ()
+    common = set(irs[0].headers)
+    for ir in irs[1:]:
+        common &= set(ir.headers)
+    return tuple(pair for pair in irs[0].headers if pair in common)
+
+
+def _update_lines(name: str, pairs, literal) -> List[str]:
+    lines = [f"{name}.update({{"]
+    lines.extend(f"    {literal(key)}: {literal(value)}," for key, value in pairs)
+    lines.append("})")
+    return lines
+
+
+def generate_session_code(irs: Sequence[RequestIR], client: str = 'requests',
+                          variables: Optional[Dict[str, str]] = None,
+                          pool_size: int = 10, retries: int = 3) -> str:
+    """
+    为一组请求生成复用连接的代码
+
+    每个源创建一个 requests.Session(挂载带连接池和重试的 HTTPAdapter)或 httpx.Client，
+    同源请求共用同一个连接池；请求按原顺序发送，组内共同的请求头设置在会话上。
+
+    Args:
+        irs: 请求表示列表
+        client: requests 或 httpx
+        variables: 用户变量，提供时生成的代码通过变量引用 {{name}}/$name 占位符
+        pool_size: 每个源的最大连接数
+        retries: 失败重试次数(requests 只重试幂等请求；httpx 只重试连接错误)
+
+    Returns:
+        Python 代码
+
+    Raises:
+        ValueError: 不支持的客户端
+    """
+    if client not in SESSION_CLIENTS:
+        raise ValueError(f"不支持的会话客户端: {client}，可选: {', '.join(SESSION_CLIENTS)}")
+
+    literal = VariableReferences(variables) if variables else repr
+    if client == 'requests':
+        lines = [
+            "import requests",
+            "from requests.adapters import HTTPAdapter",
+            "from urllib3.util.retry import Retry",
+            "",
+            f"POOL_SIZE = {pool_size!r}",
+            f"RETRY = Retry(total={retries!r}, backoff_factor=0.5, status_forcelist=[502, 503, 504])",
+            "",
+            "",
+            "def create_session():",
+            "    session = requests.Session()",
+            "    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=RETRY)",
+            "    session.mount('http://', adapter)",
+            "    session.mount('https://', adapter)",
+            "    return session",
+            ""
+        ]
+        prefix = 'session'
+    else:
+        lines = [
+            "import httpx",
+            "",
+            f"POOL_SIZE = {pool_size!r}",
+            f"RETRIES = {retries!r}",
+            "LIMITS = httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE)",
+        ]
+        prefix = 'client'
+
+    groups = group_by_origin(irs)
+    owner = {}
+    shared = {}
+    for number, (origin, indexes) in enumerate(groups, 1):
+        name = f"{prefix}_{number}"
+        first = irs[indexes[0]]
+        shared[name] = _shared_headers([irs[index] for index in indexes])
+        for index in indexes:
+            owner[index] = name
+
+        lines.extend(["", f"# {_comment_text(origin)}"])
+        if client == 'requests':
+            lines.append(f"{name} = create_session()")
+            if not first.verify_ssl:
+                lines.append(f"{name}.verify = False")
+            if first.proxy:
+                proxy = literal(first.proxy)
+                lines.append(f"{name}.proxies = {{'http': {proxy}, 'https': {proxy}}}")
+        else:
+            transport_args = ["limits=LIMITS", "retries=RETRIES"]
+            if not first.verify_ssl:
+                transport_args.append("verify=False")
+            if first.proxy:
+                transport_args.append(f"proxy={literal(first.proxy)}")
+            lines.append(f"{name} = httpx.Client(transport=httpx.HTTPTransport({', '.join(transport_args)}))")
+        if shared[name]:
+            lines.extend(_update_lines(f"{name}.headers", shared[name], literal))
+
+    for index, ir in enumerate(irs):
+        name = owner[index]
+        lines.extend(["", f"# 请求 {index + 1}: {_comment_text(ir.method)} {_comment_text(ir.url)}"])
+        if client == 'requests':
+            definitions, request_args = _requests_parts(ir, literal, shared[name], session=True)
+            lines.extend(definitions)
+            call = _call(name, ir.method, request_args)
+        else:
+            definitions, request_args, _ = _httpx_parts(ir, literal, shared[name])
+            lines.extend(definitions)
+            # httpx 的 cookie 设置在客户端上
+            if ir.cookies:
+                lines.append(f"{name}.cookies.update(cookies)")
+            if ir.timeout is not None:
+                request_args.append(f"timeout={ir.timeout!r}")
+            call = _httpx_call(name, ir, request_args)
+        lines.append(f"response = {call}")
+        lines.extend(_PRINT_RESPONSE)
+
+    lines.append("")
+    lines.extend(f"{prefix}_{number}.close()" for number in range(1, len(groups) + 1))
+    return "\n".join(_with_assignments(lines, literal))
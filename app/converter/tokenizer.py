@@ -0,0 +1,155 @@
+import re
+
+# 各状态下可以整段跳过的普通字符
+_PLAIN_RUN = re.compile(r'[^\s\'"\\$]+')
+_DOUBLE_QUOTED_RUN = re.compile(r'[^"\\]+')
+_ANSI_C_RUN = re.compile(r"[^'\\]+")
+# 参数分隔符：与 _PLAIN_RUN 使用同一个空白定义(包括粘贴进来的不换行空格等)
+_WHITESPACE = re.compile(r'\s+')
+
+# 双引号内反斜杠只对这些字符生效(与 POSIX shell 一致)
+_DOUBLE_QUOTE_ESCAPABLE = {'"', '\\', '$', '`'}
+
+# $'...' 中支持的转义序列
+_ANSI_C_ESCAPES = {
+    'a': '\a', 'b': '\b', 'e': '\x1b', 'E': '\x1b', 'f': '\f', 'n': '\n',
+    'r': '\r', 't': '\t', 'v': '\v', '\\': '\\', "'": "'", '"': '"', '?': '?'
+}
+_ANSI_C_HEX = re.compile(r'x([0-9A-Fa-f]{1,2})|u([0-9A-Fa-f]{1,4})|U([0-9A-Fa-f]{1,8})|([0-7]{1,3})')
+
+
+def tokenize(command: str) -> list:
+    """
+    按 shell 规则将命令行一次性切分为参数列表
+
+    支持单引号、双引号、反斜杠转义、$'...' 以及行尾反斜杠续行，
+    每个字符只被扫描一次，耗时与命令长度成线性关系。
+
+    Args:
+        command: 命令行字符串
+
+    Returns:
+        参数列表
+
+    Raises:
+        ValueError: 引号未闭合或转义序列无效
+    """
+    tokens = []
+    parts = []
+    in_token = False
+    pos = 0
+    length = len(command)
+
+    while pos < length:
+        char = command[pos]
+
+        space = _WHITESPACE.match(command, pos)
+        if space:
+            if in_token:
+                tokens.append(''.join(parts))
+                parts = []
+                in_token = False
+            pos = space.end()
+            continue
+
+        if char == '\\':
+            nxt = command[pos + 1] if pos + 1 < length else ''
+            if nxt == '\n':
+                # 续行：反斜杠和换行一起丢弃
+                pos += 2
+            elif nxt == '\r' and command[pos + 2:pos + 3] == '\n':
+                pos += 3
+            else:
+                parts.append(nxt)
+                in_token = True
+                pos += 2
+            continue
+
+        in_token = True
+
+        if char == "'":
+            end = command.find("'", pos + 1)
+            if end == -1:
+                raise ValueError("单引号未闭合")
+            parts.append(command[pos + 1:end])
+            pos = end + 1
+        elif char == '"':
+            pos = _read_double_quoted(command, pos + 1, parts)
+        elif char == '$' and command[pos + 1:pos + 2] == "'":
+            pos = _read_ansi_c_quoted(command, pos + 2, parts)
+        elif char == '$':
+            parts.append(char)
+            pos += 1
+        else:
+            run = _PLAIN_RUN.match(command, pos)
+            parts.append(run.group())
+            pos = run.end()
+
+    if in_token:
+        tokens.append(''.join(parts))
+    return tokens
+
+
+def _read_double_quoted(command: str, pos: int, parts: list) -> int:
+    """读取双引号内容，返回闭合引号之后的位置"""
+    length = len(command)
+    while pos < length:
+        run = _DOUBLE_QUOTED_RUN.match(command, pos)
+        if run:
+            parts.append(run.group())
+            pos = run.end()
+            continue
+
+        char = command[pos]
+        if char == '"':
+            return pos + 1
+
+        # 反斜杠
+        nxt = command[pos + 1:pos + 2]
+        if nxt == '\n':
+            pos += 2
+        elif nxt in _DOUBLE_QUOTE_ESCAPABLE and nxt:
+            parts.append(nxt)
+            pos += 2
+        else:
+            parts.append('\\')
+            pos += 1
+    raise ValueError("双引号未闭合")
+
+
+def _read_ansi_c_quoted(command: str, pos: int, parts: list) -> int:
+    """读取 $'...' 内容，返回闭合引号之后的位置"""
+    length = len(command)
+    while pos < length:
+        run = _ANSI_C_RUN.match(command, pos)
+        if run:
+            parts.append(run.group())
+            pos = run.end()
+            continue
+
+        char = command[pos]
+        if char == "'":
+            return pos + 1
+
+        # 反斜杠转义
+        nxt = command[pos + 1:pos + 2]
+        if nxt in _ANSI_C_ESCAPES:
+            parts.append(_ANSI_C_ESCAPES[nxt])
+            pos += 2
+            continue
+
+        numeric = _ANSI_C_HEX.match(command, pos + 1)
+        if numeric:
+            hex_value, short_unicode, long_unicode, octal = numeric.groups()
+            if octal:
+                parts.append(chr(int(octal, 8)))
+            else:
+                code_point = int(hex_value or short_unicode or long_unicode, 16)
+                if code_point > 0x10FFFF:
+                    raise ValueError(f"无效的 Unicode 转义: \\{numeric.group()}")
+                parts.append(chr(code_point))
+            pos = numeric.end()
+        else:
+            parts.append('\\' + nxt)
+            pos += 2
+    raise ValueError("$'...' 引号未闭合")
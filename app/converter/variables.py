@@ -0,0 +1,139 @@
+import keyword
+import re
+from typing import Callable, Dict, List, Optional, Set
+
+from .ir import RequestIR
+
+# 变量占位符：{{name}}、${name} 和 $name，一个正则一次扫描完成所有替换
+PLACEHOLDER_PATTERN = re.compile(
+    r'\{\{\s*([A-Za-z_][A-Za-z0-9_]*)\s*\}\}|\$\{([A-Za-z_][A-Za-z0-9_]*)\}|\$([A-Za-z_][A-Za-z0-9_]*)'
+)
+
+# 生成代码中已使用的名称，同名变量改名以免覆盖
+_RESERVED_NAMES = {
+    'requests', 'httpx', 'aiohttp', 'asyncio', 'http', 'json', 'base64', 'ssl', 'urlencode', 'urlsplit',
+    'url', 'params', 'headers', 'cookies', 'data', 'json_data', 'files', 'form_data', 'auth', 'proxies',
+    'proxy', 'verify', 'client', 'session', 'main', 'text', 'body', 'parts', 'path', 'connection',
+    'connection_class', 'ssl_options', 'response', 'open', 'print',
+    'HTTPAdapter', 'Retry', 'POOL_SIZE', 'RETRY', 'RETRIES', 'LIMITS', 'create_session',
+    'bisect', 'time', 'Counter', 'CONCURRENCY', 'RATE_LIMIT', 'ITERATIONS', 'BUCKETS_MS', 'REQUESTS',
+    'CLIENT_OPTIONS', 'send', 'report'
+}
+
+
+def _placeholder_name(match) -> str:
+    return match.group(1) or match.group(2) or match.group(3)
+
+
+def find_placeholders(text: str) -> Set[str]:
+    """查找文本中引用的变量名"""
+    return {_placeholder_name(match) for match in PLACEHOLDER_PATTERN.finditer(text)}
+
+
+def find_missing(text: str, variables: Dict[str, str]) -> List[str]:
+    """
+    查找未定义的变量
+
+    只统计 {{name}} 和 ${name}；$name 也可能是命令中原有的 shell 变量或密码中的 $ 字符，不视为缺失。
+    """
+    missing = []
+    for match in PLACEHOLDER_PATTERN.finditer(text):
+        name = match.group(1) or match.group(2)
+        if name and name not in variables and name not in missing:
+            missing.append(name)
+    return missing
+
+
+def expand(text: str, variables: Dict[str, str]) -> str:
+    """替换文本中的变量，未定义的占位符保持原样"""
+    if '{{' not in text and '$' not in text:
+        return text
+    return PLACEHOLDER_PATTERN.sub(lambda match: variables.get(_placeholder_name(match), match.group(0)), text)
+
+
+def expand_request(ir: RequestIR, variables: Dict[str, str]) -> RequestIR:
+    """
+    在请求表示的各字段中替换变量，返回新的请求表示
+
+    在解析之后替换，变量值中的空格、引号等不会影响 curl 命令的切分。
+    """
+    return ir.map_strings(lambda text: expand(text, variables))
+
+
+def python_identifier(name: str) -> str:
+    """变量在生成代码中的名称(与关键字或生成代码中的名称冲突时加前缀)"""
+    if keyword.iskeyword(name) or name in _RESERVED_NAMES:
+        return f'var_{name}'
+    return name
+
+
+class VariableReferences:
+    """
+    生成引用变量的代码
+
+    作为代码生成器的字面量函数使用：不含变量的字符串按 repr 输出，
+    只包含一个变量的字符串输出变量名，其他含变量的字符串输出 f-string；
+    assignments() 返回引用到的变量的赋值语句。
+    """
+
+    def __init__(self, variables: Dict[str, str]):
+        self.variables = variables
+        self.used: Dict[str, str] = {}
+
+    def __call__(self, text: str) -> str:
+        if '{{' not in text and '$' not in text:
+            return repr(text)
+
+        parts = []
+        position = 0
+        referenced = False
+        for match in PLACEHOLDER_PATTERN.finditer(text):
+            name = _placeholder_name(match)
+            if name not in self.variables:
+                continue
+            parts.append(('text', text[position:match.start()]))
+            parts.append(('name', self._reference(name)))
+            position = match.end()
+            referenced = True
+        if not referenced:
+            return repr(text)
+        parts.append(('text', text[position:]))
+
+        parts = [part for part in parts if part != ('text', '')]
+        if len(parts) == 1:
+            return parts[0][1]
+        template = ''.join(value.replace('{', '{{').replace('}', '}}') if kind == 'text' else '{' + value + '}'
+                           for kind, value in parts)
+        return 'f' + repr(template)
+
+    def assignments(self) -> List[str]:
+        """引用到的变量的赋值语句"""
+        return [f"{identifier} = {self.variables[name]!r}" for name, identifier in self.used.items()]
+
+    def _reference(self, name: str) -> str:
+        identifier = self.used.get(name)
+        if identifier is None:
+            identifier = python_identifier(name)
+            while identifier in self.used.values() or (identifier != name and identifier in self.variables):
+                identifier = f'var_{identifier}'
+            self.used[name] = identifier
+        return identifier
+
+
+def render_value(value, literal: Optional[Callable[[str], str]] = None) -> str:
+    """
+    把 JSON 数据等嵌套结构渲染为 Python 表达式，字符串使用 literal 渲染
+
+    literal 为 repr 时结果与 repr(value) 相同。
+    """
+    literal = literal or repr
+    if isinstance(value, str):
+        return literal(value)
+    if isinstance(value, dict):
+        return '{' + ', '.join(f"{render_value(k, literal)}: {render_value(v, literal)}" for k, v in value.items()) + '}'
+    if isinstance(value, list):
+        return '[' + ', '.join(render_value(item, literal) for item in value) + ']'
+    if isinstance(value, tuple):
+        items = [render_value(item, literal) for item in value]
+        return '(' + ', '.join(items) + (',)' if len(items) == 1 else ')')
+    return repr(value)
@@ -1,3 +1,3 @@
-from .models import User, ConversionResult, StoredFile, db, UserVariables
+from .models import User, ConversionResult, StoredFile, FileBlob, UserStorageUsage, RevokedToken, db, UserVariables, UserVariableVersion
 
-__all__ = ['User', 'ConversionResult', 'StoredFile', 'UserVariables', 'db']
\ No newline at end of file
+__all__ = ['User', 'ConversionResult', 'StoredFile', 'FileBlob', 'UserStorageUsage', 'RevokedToken', 'UserVariables', 'UserVariableVersion', 'db']
\ No newline at end of file
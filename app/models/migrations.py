@@ -0,0 +1,155 @@
+import logging
+from datetime import datetime
+from typing import List
+from sqlalchemy import inspect, text
+from .models import db, ConversionResult, StoredFile, FileBlob, UserStorageUsage, RevokedToken, UserVariables, UserVariableVersion
+
+logger = logging.getLogger(__name__)
+
+
+class MigrationAborted(Exception):
+    """迁移会删除数据，需要通过 flask --app run upgrade-db 显式执行"""
+
+
+# 已执行迁移的版本记录表
+schema_migrations = db.Table(
+    'schema_migrations',
+    db.Column('version', db.Integer, primary_key=True),
+    db.Column('description', db.String(200), nullable=False),
+    db.Column('applied_at', db.DateTime, nullable=False)
+)
+
+
+def _create_indexes(connection, model):
+    """创建模型上定义的所有索引(已存在则跳过)"""
+    for index in model.__table__.indexes:
+        index.create(bind=connection, checkfirst=True)
+
+
+def _add_column(connection, model, column_name: str):
+    """为已存在的表添加模型中新增的列(已存在则跳过)"""
+    table = model.__table__
+    existing = {column['name'] for column in inspect(connection).get_columns(table.name)}
+    if column_name in existing:
+        return
+    column = table.columns[column_name]
+    column_type = column.type.compile(dialect=connection.dialect)
+    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+
+def _migration_001_hot_path_indexes(connection, explicit: bool):
+    # 建唯一索引前需清理重复变量(保留每组中最新的一条)，删除数据只在显式执行迁移时进行
+    duplicates = connection.execute(text(
+        'SELECT user_id, variable_name, COUNT(*) - 1 FROM user_variables '
+        'GROUP BY user_id, variable_name HAVING COUNT(*) > 1'
+    )).all()
+    if duplicates and not explicit:
+        raise MigrationAborted(f"{len(duplicates)} 组用户变量存在重复，执行 flask --app run upgrade-db 清理后创建唯一索引")
+    for user_id, variable_name, removed in duplicates:
+        logger.warning(f"删除用户 {user_id} 的重复变量 {variable_name}: {removed} 条")
+    if duplicates:
+        connection.execute(text(
+            'DELETE FROM user_variables WHERE id NOT IN '
+            '(SELECT MAX(id) FROM user_variables GROUP BY user_id, variable_name)'
+        ))
+    for model in (ConversionResult, StoredFile, UserVariables):
+        _create_indexes(connection, model)
+
+
+def _migration_002_stored_file_content_hash(connection, explicit: bool):
+    _add_column(connection, StoredFile, 'content_hash')
+
+
+def _migration_003_file_blobs(connection, explicit: bool):
+    FileBlob.__table__.create(bind=connection, checkfirst=True)
+
+
+def _migration_004_user_storage_usage(connection, explicit: bool):
+    UserStorageUsage.__table__.create(bind=connection, checkfirst=True)
+    # 按已有文件回填用量
+    connection.execute(text(
+        'INSERT INTO user_storage_usage (user_id, file_count, total_size, updated_at) '
+        'SELECT user_id, COUNT(*), COALESCE(SUM(file_size), 0), CURRENT_TIMESTAMP FROM stored_file '
+        'WHERE user_id NOT IN (SELECT user_id FROM user_storage_usage) GROUP BY user_id'
+    ))
+
+
+def _migration_005_revoked_tokens(connection, explicit: bool):
+    RevokedToken.__table__.create(bind=connection, checkfirst=True)
+    _create_indexes(connection, RevokedToken)
+
+
+def _migration_006_user_variable_versions(connection, explicit: bool):
+    UserVariableVersion.__table__.create(bind=connection, checkfirst=True)
+
+
+def _migration_007_user_storage_usage_totals(connection, explicit: bool):
+    _add_column(connection, UserStorageUsage, 'total_downloads')
+    _add_column(connection, UserStorageUsage, 'type_counts')
+    # 按已有文件回填下载次数和类型分布
+    connection.execute(text(
+        'UPDATE user_storage_usage SET total_downloads = (SELECT COALESCE(SUM(download_count), 0) '
+        'FROM stored_file WHERE stored_file.user_id = user_storage_usage.user_id)'
+    ))
+    type_counts = {}
+    for user_id, file_type, count in connection.execute(text(
+        'SELECT user_id, file_type, COUNT(*) FROM stored_file GROUP BY user_id, file_type'
+    )):
+        counts = type_counts.setdefault(user_id, {})
+        major_type = file_type.split('/')[0]
+        counts[major_type] = counts.get(major_type, 0) + count
+    table = UserStorageUsage.__table__
+    for (user_id,) in connection.execute(db.select(table.c.user_id)).all():
+        connection.execute(table.update().where(table.c.user_id == user_id)
+                           .values(type_counts=type_counts.get(user_id, {})))
+
+
+# 迁移列表：(版本号, 描述, 迁移函数)，版本号只增不改
+MIGRATIONS = [
+    (1, '为转换记录、文件和用户变量的查询路径添加索引', _migration_001_hot_path_indexes),
+    (2, '文件记录增加内容哈希列', _migration_002_stored_file_content_hash),
+    (3, '增加按内容去重的文件数据表', _migration_003_file_blobs),
+    (4, '增加用户存储用量汇总表', _migration_004_user_storage_usage),
+    (5, '增加已注销token表', _migration_005_revoked_tokens),
+    (6, '增加用户变量版本号表', _migration_006_user_variable_versions),
+    (7, '用户存储用量汇总增加下载次数和类型分布', _migration_007_user_storage_usage_totals),
+]
+
+
+def get_applied_versions(connection) -> List[int]:
+    """获取已执行的迁移版本号"""
+    schema_migrations.create(bind=connection, checkfirst=True)
+    return [row[0] for row in connection.execute(db.select(schema_migrations.c.version))]
+
+
+def upgrade_database(engine, explicit: bool = False) -> List[int]:
+    """
+    执行所有未执行的迁移
+
+    每个迁移在独立事务中执行，并在同一事务中记录版本号。会删除数据的迁移在自动执行(启动时)
+    中止并记录日志，其余迁移照常执行，需通过 upgrade-db 命令显式执行。
+
+    Args:
+        engine: 数据库引擎
+        explicit: 是否为显式执行(upgrade-db 命令)，允许迁移删除数据
+
+    Returns:
+        本次执行的迁移版本号列表
+    """
+    applied = []
+    for version, description, migrate in MIGRATIONS:
+        try:
+            with engine.begin() as connection:
+                if version in get_applied_versions(connection):
+                    continue
+                migrate(connection, explicit)
+                connection.execute(schema_migrations.insert().values(
+                    version=version,
+                    description=description,
+                    applied_at=datetime.utcnow()
+                ))
+        except MigrationAborted as e:
+            logger.error(f"迁移 {version} ({description}) 未执行: {e}")
+            continue
+        applied.append(version)
+    return applied
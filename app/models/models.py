@@ -44,6 +44,15 @@ class ConversionResult(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     user = db.relationship('User', backref=db.backref('conversions', lazy=True))
+    
+    __table_args__ = (
+        # 用户转换记录(按时间倒序)
+        db.Index('ix_conversion_result_user_created', 'user_id', 'created_at'),
+        # 全局最近转换记录
+        db.Index('ix_conversion_result_created', 'created_at'),
+        # 转换统计(按状态计数)
+        db.Index('ix_conversion_result_status', 'status'),
+    )
 
     def __repr__(self):
         return f'<ConversionResult {self.id}>'
@@ -57,11 +66,17 @@ class StoredFile(db.Model):
     file_path = db.Column(db.String(500), nullable=False)
     file_size = db.Column(db.Integer, nullable=False)
     file_type = db.Column(db.String(100), nullable=False)
+    content_hash = db.Column(db.String(64), nullable=True)  # SHA-256
     description = db.Column(db.Text, nullable=True)
     upload_time = db.Column(db.DateTime, default=datetime.utcnow)
     download_count = db.Column(db.Integer, default=0)
     
     user = db.relationship('User', backref=db.backref('stored_files', lazy=True))
+    
+    __table_args__ = (
+        # 用户文件列表(按上传时间倒序分页)
+        db.Index('ix_stored_file_user_upload', 'user_id', 'upload_time', 'id'),
+    )
 
     def __repr__(self):
         return f'<StoredFile {self.original_filename}>'
@@ -77,6 +92,41 @@ class StoredFile(db.Model):
             'download_count': self.download_count
         }
     
+class FileBlob(db.Model):
+    """按内容哈希去重的文件数据，多个StoredFile可以引用同一个blob"""
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), unique=True, nullable=False)  # SHA-256
+    storage_key = db.Column(db.String(500), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<FileBlob {self.content_hash}>'
+
+
+class UserStorageUsage(db.Model):
+    """用户存储用量汇总，上传和删除文件时在同一事务中更新，下载次数随计数写入时更新"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    file_count = db.Column(db.Integer, nullable=False, default=0)
+    total_size = db.Column(db.BigInteger, nullable=False, default=0)
+    total_downloads = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')
+    type_counts = db.Column(db.JSON, nullable=False, default=dict, server_default='{}')  # 主类型 -> 文件数
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<UserStorageUsage {self.user_id}>'
+
+
+class RevokedToken(db.Model):
+    """已注销的JWT，token过期后记录可以删除"""
+    jti = db.Column(db.String(64), primary_key=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<RevokedToken {self.jti}>'
+    
 
 class UserVariables(db.Model):
     """用户变量模型"""
@@ -88,6 +138,11 @@ class UserVariables(db.Model):
     
     user = db.relationship('User', backref=db.backref('variables', lazy=True))
     
+    __table_args__ = (
+        # 同一用户的变量名唯一，同时用于按变量名查询
+        db.Index('uq_user_variables_user_name', 'user_id', 'variable_name', unique=True),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -96,3 +151,12 @@ class UserVariables(db.Model):
             'variable_value': self.variable_value,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
+
+
+class UserVariableVersion(db.Model):
+    """用户变量的版本号，变量每次修改时在同一事务中加1，用于校验缓存和生成ETag"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<UserVariableVersion {self.user_id}:{self.version}>'
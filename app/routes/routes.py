@@ -1,14 +1,31 @@
 # -*- coding: utf-8 -*-
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for, send_file
+import json
+import os
+import unicodedata
+from urllib.parse import quote
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for, send_file, current_app, Response
 from flask_jwt_extended import jwt_required, get_jwt
+from werkzeug.exceptions import HTTPException
 from app.services.auth_service import AuthService
+from app.services.login_throttle import LoginThrottled
 from app.services.user_service import UserService
 from app.services.converter_service import ConverterService
 from app.services.storage_service import StorageService
 from app.services.user_variable_service import UserVariableService
+from app.utils.password_hasher import PasswordHasherBusy
 
 main_bp = Blueprint('main', __name__)
 
+def _get_storage_service():
+    """按应用配置创建存储服务"""
+    return StorageService.from_config(current_app.config)
+
+def _retry_later_response(e, key: str = 'msg'):
+    """登录限流或密码哈希线程池繁忙时返回429，Retry-After 提示客户端稍后重试"""
+    response = jsonify({key: str(e)})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 429
+
 @main_bp.route('/', methods=['GET', 'POST'])
 def index():
     if request.method == 'POST':
@@ -26,7 +43,7 @@ def index():
             result = ConverterService.convert_curl_command(curl_command, user_id)
     
     # 获取最近的转换结果
-    results = ConverterService.get_conversion_history(limit=20)
+    results = ConverterService.get_recent_conversions(limit=20)
     return render_template('index.html', results=results)
 
 @main_bp.route('/login', methods=['GET', 'POST'])
@@ -41,7 +58,10 @@ def login():
         return jsonify({"msg": "缺少用户名或密码"}), 400
     
     
-    auth_result = AuthService.authenticate_user(username, password)
+    try:
+        auth_result = AuthService.authenticate_user(username, password, client_ip=request.remote_addr)
+    except (LoginThrottled, PasswordHasherBusy) as e:
+        return _retry_later_response(e)
     if auth_result:
         return jsonify(auth_result)
     
@@ -58,7 +78,10 @@ def register():
     if not username or not password:
         return jsonify({"msg": "缺少用户名或密码"}), 400
     
-    register_result = AuthService.register_user(username, password)
+    try:
+        register_result = AuthService.register_user(username, password)
+    except PasswordHasherBusy as e:
+        return _retry_later_response(e)
     if register_result:
         return jsonify({"msg": "注册成功"}), 201
     
@@ -67,8 +90,8 @@ def register():
 @main_bp.route('/logout', methods=['POST'])
 @jwt_required()
 def logout():
-    jti = get_jwt()['jti']
-    AuthService.logout_user(jti)
+    claims = get_jwt()
+    AuthService.logout_user(claims['jti'], claims.get('exp'))
     return jsonify({"msg": "注销成功"})
 
 @main_bp.route('/protected')
@@ -94,7 +117,15 @@ def admin():
     users = UserService.get_all_users()
     return jsonify({
         "msg": "管理员面板",
-        "users": [user.username for user in users]
+        "users": [user.username for user in users],
+        "conversion_cache": ConverterService.get_cache_stats(),
+        "request_ir_cache": ConverterService.get_request_ir_cache_stats(),
+        "conversion_writer": ConverterService.get_writer_stats(),
+        "download_counter": StorageService.get_download_counter_stats(),
+        "password_hasher": UserService.get_password_hasher_stats(),
+        "token_blocklist": AuthService.get_blocklist_stats(),
+        "login_throttle": AuthService.get_login_throttle_stats(),
+        "variable_cache": UserVariableService.get_cache_stats()
     })
 
 @main_bp.route('/api/curl-convert', methods=['POST'])
@@ -104,15 +135,28 @@ def curl_convert():
     if not curl_command:
         return jsonify({"error": "缺少 curl 命令"}), 400
     
+    # 用户变量替换方式：expand 代入变量值，reference 生成引用变量的代码
+    variable_mode = request.json.get('variable_mode') or request.args.get('variable_mode')
+    # 代码生成目标：requests(默认)、httpx、httpx-async、aiohttp、http.client，可同时指定多个
+    targets = _read_targets(request.json)
+    
     user_id = AuthService.get_current_user_id()
-    result = ConverterService.convert_curl_command(curl_command, user_id)
+    try:
+        result = ConverterService.convert_curl_command(curl_command, user_id, variable_mode, targets)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
     if result['success']:
-        return jsonify({
+        response = {
             "curl": result['curl'],
             "python": result['python'],
             "status": result['status']
-        })
+        }
+        if 'outputs' in result:
+            response['outputs'] = result['outputs']
+        if 'missing_variables' in result:
+            response['missing_variables'] = result['missing_variables']
+        return jsonify(response)
     else:
         return jsonify({
             "curl": result['curl'],
@@ -120,6 +164,216 @@ def curl_convert():
             "status": result['status']
         }), 400
 
+def _read_targets(data):
+    """读取代码生成目标(JSON 的 targets 数组或 target 字段，或查询参数 target，可重复)"""
+    if isinstance(data, dict):
+        targets = data.get('targets') or data.get('target')
+        if targets:
+            return targets
+    return request.args.getlist('target') or None
+
+def _set_attachment_filename(response, filename):
+    """设置下载文件名，非ASCII文件名按 RFC 2231 编码(与 send_file 一致)"""
+    try:
+        filename.encode('ascii')
+        response.headers.set('Content-Disposition', 'attachment', filename=filename)
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        quoted = quote(filename, safe="!#$&+^`|~")
+        response.headers.set('Content-Disposition', 'attachment', filename=simple,
+                             **{'filename*': f"UTF-8''{quoted}"})
+
+def _bool_arg(name, default=False):
+    """读取布尔型查询参数"""
+    value = request.args.get(name)
+    if value is None:
+        return default
+    return value.lower() not in ('0', 'false', 'no', 'off')
+
+# 每页数量上限
+MAX_PER_PAGE = 100
+
+def _per_page_arg(default):
+    """读取每页数量参数，限制在 1..MAX_PER_PAGE"""
+    return max(1, min(request.args.get('per_page', default, type=int), MAX_PER_PAGE))
+
+@main_bp.route('/api/conversions', methods=['GET'])
+@jwt_required()
+def get_user_conversions():
+    per_page = _per_page_arg(20)
+    cursor = request.args.get('cursor') or None
+    include_total = _bool_arg('include_total', False)
+    
+    try:
+        user_id = AuthService.get_current_user_id()
+        result = ConverterService.get_user_conversions_page(user_id, per_page, cursor, include_total)
+        
+        return jsonify({
+            "conversions": [{
+                "id": c.id,
+                "curl": c.curl_command,
+                "python": c.python_code,
+                "status": c.status,
+                "created_at": c.created_at.isoformat() if c.created_at else None
+            } for c in result['conversions']],
+            "pagination": {
+                "total": result['total'],
+                "per_page": result['per_page'],
+                "next_cursor": result['next_cursor']
+            }
+        })
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"message": f"获取转换记录失败: {str(e)}"}), 500
+
+def _read_batch_commands():
+    """
+    从请求中读取批量curl命令
+    
+    支持JSON({"curl_commands": [...]} 或顶层数组)和NDJSON(每行一个字符串或
+    {"curl_command": ...}对象)两种格式。
+    """
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        items = []
+        for line in request.stream:
+            line = line.strip()
+            if line:
+                items.append(json.loads(line))
+    else:
+        data = request.get_json(silent=True)
+        items = data.get('curl_commands') if isinstance(data, dict) else data
+        if not isinstance(items, list):
+            raise ValueError("请求体应包含 curl_commands 数组")
+    
+    return [item.get('curl_command') if isinstance(item, dict) else item for item in items]
+
+@main_bp.route('/api/curl-convert/batch', methods=['POST'])
+@jwt_required()
+def curl_convert_batch():
+    try:
+        curl_commands = _read_batch_commands()
+    except ValueError as e:
+        return jsonify({"error": f"请求格式错误: {str(e)}"}), 400
+    
+    if not curl_commands:
+        return jsonify({"error": "缺少 curl 命令"}), 400
+    
+    max_size = current_app.config.get('CONVERSION_BATCH_MAX_SIZE', 500)
+    if len(curl_commands) > max_size:
+        return jsonify({"error": f"单次最多转换 {max_size} 条命令"}), 400
+    
+    variable_mode = request.args.get('variable_mode')
+    if variable_mode is None and request.is_json and isinstance(request.get_json(silent=True), dict):
+        variable_mode = request.get_json().get('variable_mode')
+    targets = _read_targets(request.get_json(silent=True) if request.is_json else None)
+    
+    user_id = AuthService.get_current_user_id()
+    try:
+        results = ConverterService.convert_curl_commands(curl_commands, user_id, variable_mode, targets)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    succeeded = sum(1 for result in results if result['success'])
+    
+    return jsonify({
+        "results": [{
+            "index": result['index'],
+            "curl": result['curl'],
+            "python": result['python'],
+            "status": result['status'],
+            "message": result['message'],
+            **({"outputs": result['outputs']} if 'outputs' in result else {}),
+            **({"missing_variables": result['missing_variables']} if 'missing_variables' in result else {})
+        } for result in results],
+        "total": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded
+    })
+
+def _read_script_request():
+    """
+    读取生成脚本的请求：curl命令列表和选项(JSON 字段，或查询参数)
+    
+    Raises:
+        ValueError: 请求格式错误、缺少命令或命令过多
+    """
+    try:
+        curl_commands = _read_batch_commands()
+    except ValueError as e:
+        raise ValueError(f"请求格式错误: {str(e)}")
+    
+    if not curl_commands:
+        raise ValueError("缺少 curl 命令")
+    
+    max_size = current_app.config.get('CONVERSION_BATCH_MAX_SIZE', 500)
+    if len(curl_commands) > max_size:
+        raise ValueError(f"单次最多转换 {max_size} 条命令")
+    
+    data = request.get_json(silent=True) if request.is_json else None
+    options = dict(request.args.items())
+    if isinstance(data, dict):
+        options.update({key: value for key, value in data.items() if key != 'curl_commands'})
+    return curl_commands, options
+
+def _number_option(options, name, default, convert=int):
+    """读取数值选项(查询参数为字符串时转换类型，JSON 中的值由服务层校验)"""
+    value = options.get(name, default)
+    if not isinstance(value, str):
+        return value
+    try:
+        return convert(value)
+    except ValueError:
+        raise ValueError(f"{name} 应为数字")
+
+def _script_response(result, **extra):
+    """生成脚本接口的响应"""
+    response = {
+        "python": result['python'],
+        "status": result['status'],
+        **extra
+    }
+    if 'missing_variables' in result:
+        response['missing_variables'] = result['missing_variables']
+    return jsonify(response)
+
+# 把多条curl命令转换为按源复用连接(requests.Session / httpx.Client)的脚本
+@main_bp.route('/api/curl-convert/session', methods=['POST'])
+@jwt_required()
+def curl_convert_session():
+    user_id = AuthService.get_current_user_id()
+    try:
+        curl_commands, options = _read_script_request()
+        result = ConverterService.convert_curl_session(
+            curl_commands, user_id,
+            variable_mode=options.get('variable_mode'),
+            client=options.get('client'),
+            pool_size=_number_option(options, 'pool_size', 10),
+            retries=_number_option(options, 'retries', 3)
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return _script_response(result, origins=result['origins'])
+
+# 把多条curl命令转换为异步并发压测脚本(asyncio + httpx.AsyncClient)
+@main_bp.route('/api/curl-convert/load', methods=['POST'])
+@jwt_required()
+def curl_convert_load():
+    user_id = AuthService.get_current_user_id()
+    try:
+        curl_commands, options = _read_script_request()
+        result = ConverterService.convert_curl_load(
+            curl_commands, user_id,
+            variable_mode=options.get('variable_mode'),
+            concurrency=_number_option(options, 'concurrency', 10),
+            rate_limit=_number_option(options, 'rate_limit', None, float),
+            iterations=_number_option(options, 'iterations', 1)
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return _script_response(result, total_requests=result['total_requests'])
+
 # 用户信息管理路由
 @main_bp.route('/profile', methods=['GET'])
 def profile():
@@ -176,6 +430,8 @@ def change_password():
     try:
         UserService.change_password(current_user, data['current_password'], data['new_password'])
         return jsonify({"message": "密码修改成功"})
+    except PasswordHasherBusy as e:
+        return _retry_later_response(e, key='message')
     except ValueError as e:
         return jsonify({"message": str(e)}), 400
     except Exception as e:
@@ -195,6 +451,10 @@ def upload_file():
     if not current_user:
         return jsonify({"message": "用户不存在"}), 404
     
+    storage_service = _get_storage_service()
+    # 请求体超过文件大小上限(留出表单字段的余量)时在解析阶段直接返回413
+    request.max_content_length = storage_service.max_file_size + 64 * 1024
+    
     if 'file' not in request.files:
         return jsonify({"message": "没有选择文件"}), 400
     
@@ -202,7 +462,6 @@ def upload_file():
     description = request.form.get('description', '')
     
     try:
-        storage_service = StorageService()
         result = storage_service.upload_file(file, current_user, description)
         
         return jsonify({
@@ -214,6 +473,110 @@ def upload_file():
     except Exception as e:
         return jsonify({"message": f"文件上传失败: {str(e)}"}), 500
 
+# 分片上传API：创建会话
+@main_bp.route('/api/files/uploads', methods=['POST'])
+@jwt_required()
+def initiate_upload_session():
+    current_user = AuthService.get_current_user()
+    
+    if not current_user:
+        return jsonify({"message": "用户不存在"}), 404
+    
+    data = request.get_json() or {}
+    
+    try:
+        storage_service = _get_storage_service()
+        session = storage_service.initiate_upload_session(
+            current_user,
+            data.get('filename', ''),
+            content_type=data.get('content_type'),
+            description=data.get('description', '')
+        )
+        return jsonify(session), 201
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"message": f"创建上传会话失败: {str(e)}"}), 500
+
+# 分片上传API：查询会话状态
+@main_bp.route('/api/files/uploads/<upload_id>', methods=['GET'])
+@jwt_required()
+def get_upload_session(upload_id):
+    current_user = AuthService.get_current_user()
+    
+    if not current_user:
+        return jsonify({"message": "用户不存在"}), 404
+    
+    try:
+        storage_service = _get_storage_service()
+        return jsonify(storage_service.get_upload_session(upload_id, current_user))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"message": f"获取上传会话失败: {str(e)}"}), 500
+
+# 分片上传API：上传分片(请求体为分片原始数据)
+@main_bp.route('/api/files/uploads/<upload_id>/parts/<int:index>', methods=['PUT'])
+@jwt_required()
+def upload_part(upload_id, index):
+    current_user = AuthService.get_current_user()
+    
+    if not current_user:
+        return jsonify({"message": "用户不存在"}), 404
+    
+    storage_service = _get_storage_service()
+    request.max_content_length = storage_service.max_file_size
+    
+    try:
+        part = storage_service.upload_part(upload_id, current_user, index, request.stream)
+        return jsonify(part)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except HTTPException as e:
+        # 分片超过大小限制时的 413
+        return e
+    except Exception as e:
+        return jsonify({"message": f"分片上传失败: {str(e)}"}), 500
+
+# 分片上传API：完成上传
+@main_bp.route('/api/files/uploads/<upload_id>/complete', methods=['POST'])
+@jwt_required()
+def complete_upload_session(upload_id):
+    current_user = AuthService.get_current_user()
+    
+    if not current_user:
+        return jsonify({"message": "用户不存在"}), 404
+    
+    try:
+        storage_service = _get_storage_service()
+        result = storage_service.complete_upload_session(upload_id, current_user)
+        return jsonify({
+            "message": "文件上传成功",
+            "file": result
+        })
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"message": f"文件上传失败: {str(e)}"}), 500
+
+# 分片上传API：取消上传
+@main_bp.route('/api/files/uploads/<upload_id>', methods=['DELETE'])
+@jwt_required()
+def abort_upload_session(upload_id):
+    current_user = AuthService.get_current_user()
+    
+    if not current_user:
+        return jsonify({"message": "用户不存在"}), 404
+    
+    try:
+        storage_service = _get_storage_service()
+        storage_service.abort_upload_session(upload_id, current_user)
+        return jsonify({"message": "上传已取消"})
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"message": f"取消上传失败: {str(e)}"}), 500
+
 # 获取用户文件列表API
 @main_bp.route('/api/files', methods=['GET'])
 @jwt_required()
@@ -223,22 +586,29 @@ def get_user_files():
     if not current_user:
         return jsonify({"message": "用户不存在"}), 404
     
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = _per_page_arg(10)
+    # 传入 cursor 参数(第一页为空字符串)时使用游标分页
+    cursor = request.args.get('cursor')
+    include_total = _bool_arg('include_total', True)
     
     try:
-        storage_service = StorageService()
-        result = storage_service.get_user_files(current_user, page, per_page)
+        storage_service = _get_storage_service()
+        result = storage_service.get_user_files(current_user, page, per_page,
+                                                cursor=cursor, include_total=include_total)
         
         return jsonify({
-            "files": [file.to_dict() for file in result['files']],
+            "files": storage_service.files_to_dicts(result['files']),
             "pagination": {
                 "total": result['total'],
                 "page": result['page'],
                 "per_page": result['per_page'],
-                "total_pages": result['total_pages']
+                "total_pages": result['total_pages'],
+                "next_cursor": result['next_cursor']
             }
         })
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
     except Exception as e:
         return jsonify({"message": f"获取文件列表失败: {str(e)}"}), 500
 
@@ -252,24 +622,57 @@ def download_file(file_id):
         return jsonify({"message": "用户不存在"}), 404
     
     try:
-        storage_service = StorageService()
-        file_path = storage_service.download_file(file_id, current_user)
+        storage_service = _get_storage_service()
+        stored_file = storage_service.get_downloadable_file(file_id, current_user)
         
-        if not file_path:
+        if not stored_file:
             return jsonify({"message": "文件不存在或无权限"}), 404
         
-        # 增加下载次数
-        storage_service.increment_download_count(file_id)
+        delivery_headers = storage_service.get_delivery_headers(stored_file)
+        if delivery_headers:
+            # 由前端代理发送文件内容(Range由代理处理)，应用只处理条件请求
+            response = Response(mimetype=stored_file.file_type, headers=delivery_headers)
+            _set_attachment_filename(response, stored_file.original_filename)
+            response.set_etag(stored_file.content_hash or f"{stored_file.id}-{stored_file.file_size}")
+            response.last_modified = stored_file.upload_time
+            response.make_conditional(request)
+        elif storage_service.get_local_path(stored_file) is None:
+            # 对象存储中的文件由应用流式转发，同样支持 Range 和条件请求；
+            # 先由Werkzeug确定状态码(200/206/304/416)，再只从对象存储读取需要的字节范围
+            response = Response(mimetype=stored_file.file_type, direct_passthrough=True)
+            _set_attachment_filename(response, stored_file.original_filename)
+            response.content_length = stored_file.file_size
+            response.set_etag(stored_file.content_hash or f"{stored_file.id}-{stored_file.file_size}")
+            response.last_modified = stored_file.upload_time
+            response.make_conditional(request, accept_ranges=True, complete_length=stored_file.file_size)
+            if response.status_code == 206:
+                start, stop = request.range.range_for_length(stored_file.file_size)
+                response.response = storage_service.stream_file(stored_file, start, stop)
+            elif response.status_code == 200:
+                response.response = storage_service.stream_file(stored_file)
+        else:
+            # 支持 Range、If-None-Match、If-Modified-Since，返回 206/304/416；
+            # 有内容哈希时使用强ETag，早期上传的文件由Werkzeug按修改时间和大小生成
+            # 相对路径需转换为绝对路径，否则send_file会相对于应用包目录解析
+            response = send_file(
+                os.path.abspath(storage_service.get_local_path(stored_file)),
+                as_attachment=True,
+                download_name=stored_file.original_filename,
+                mimetype=stored_file.file_type,
+                conditional=True,
+                etag=stored_file.content_hash or True,
+                last_modified=stored_file.upload_time
+            )
+        response.cache_control.private = True
         
-        # 获取文件信息
-        stored_file = storage_service.get_file_by_id(file_id)
+        # 只在返回文件开头时计一次下载(304和续传的后续分段不计)
+        if response.status_code != 304 and (request.range is None or request.range.ranges[0][0] == 0):
+            storage_service.increment_download_count(file_id)
         
-        return send_file(
-            file_path,
-            as_attachment=True,
-            download_name=stored_file.original_filename,
-            mimetype=stored_file.file_type
-        )
+        return response
+    except HTTPException as e:
+        # 如 Range 超出文件范围时的 416
+        return e
     except Exception as e:
         return jsonify({"message": f"文件下载失败: {str(e)}"}), 500
 
@@ -283,7 +686,7 @@ def delete_file(file_id):
         return jsonify({"message": "用户不存在"}), 404
     
     try:
-        storage_service = StorageService()
+        storage_service = _get_storage_service()
         storage_service.delete_file(file_id, current_user)
         
         return jsonify({"message": "文件删除成功"})
@@ -305,7 +708,7 @@ def update_file_description(file_id):
     description = data.get('description', '')
     
     try:
-        storage_service = StorageService()
+        storage_service = _get_storage_service()
         storage_service.update_file_description(file_id, current_user, description)
         
         return jsonify({"message": "文件描述更新成功"})
@@ -324,7 +727,7 @@ def get_file_info(file_id):
         return jsonify({"message": "用户不存在"}), 404
     
     try:
-        storage_service = StorageService()
+        storage_service = _get_storage_service()
         file_info = storage_service.get_file_info(file_id, current_user)
         
         if not file_info:
@@ -344,7 +747,7 @@ def get_storage_stats():
         return jsonify({"message": "用户不存在"}), 404
     
     try:
-        storage_service = StorageService()
+        storage_service = _get_storage_service()
         stats = storage_service.get_storage_stats(current_user)
         
         return jsonify(stats)
@@ -368,10 +771,19 @@ def api_get_user_variables():
         return jsonify({"message": "用户不存在"}), 404
     
     try:
-        variables = UserVariableService.get_user_variables(current_user.id)
-        # 使用to_dict方法转换为字典列表以便JSON序列化
-        variables_list = [var.to_dict() for var in variables]
-        return jsonify(variables_list)
+        # 版本号未变化时返回304，不加载变量
+        version = UserVariableService.get_version(current_user.id)
+        etag = f"variables-{current_user.id}-{version}"
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            _, variables_list = UserVariableService.get_variables_snapshot(current_user.id, version)
+            response = jsonify(variables_list)
+        response.set_etag(etag)
+        # 浏览器每次都要重新验证(响应因用户而异)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
     except Exception as e:
         return jsonify({"message": f"获取用户变量失败: {str(e)}"}), 500
 
@@ -392,11 +804,7 @@ def api_create_user_variable():
         if not variable_name or not variable_value:
             return jsonify({"message": "变量名和变量值不能为空"}), 400
         
-        # 检查变量名是否已存在
-        existing_variable = UserVariableService.get_variable_by_name(current_user.id, variable_name)
-        if existing_variable:
-            return jsonify({"message": "变量名已存在"}), 400
-        
+        # 变量名已存在时由唯一索引拒绝，返回None
         variable = UserVariableService.create_variable(
             user_id=current_user.id,
             variable_name=variable_name,
@@ -415,7 +823,7 @@ def api_create_user_variable():
                 }
             }), 201
         else:
-            return jsonify({"message": "变量创建失败"}), 500
+            return jsonify({"message": "变量名已存在"}), 400
     except Exception as e:
         return jsonify({"message": f"创建变量失败: {str(e)}"}), 500
 
@@ -445,16 +853,8 @@ def api_update_user_variable(variable_id):
         if variable.user_id != current_user.id:
             return jsonify({"message": "无权限操作此变量"}), 403
         
-        # 如果要更新变量名，检查新名称是否已存在
-        if variable_name and variable_name != variable.variable_name:
-            existing_variable = UserVariableService.get_variable_by_name(current_user.id, variable_name)
-            if existing_variable:
-                return jsonify({"message": "变量名已存在"}), 400
-            # 更新变量名
-            variable.variable_name = variable_name
-        
-        # 更新变量值
-        updated_variable = UserVariableService.update_variable(variable_id, variable_value)
+        # 更新变量值和变量名(新名称已存在时由唯一索引拒绝)
+        updated_variable = UserVariableService.update_variable(variable_id, variable_value, variable_name)
         
         if updated_variable:
             return jsonify({
@@ -469,9 +869,44 @@ def api_update_user_variable(variable_id):
             })
         else:
             return jsonify({"message": "变量更新失败"}), 500
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
     except Exception as e:
         return jsonify({"message": f"更新变量失败: {str(e)}"}), 500
 
+@main_bp.route('/api/variables/bulk', methods=['POST'])
+@jwt_required()
+def api_bulk_update_user_variables():
+    """
+    批量修改用户变量(在一个事务中执行)
+    
+    请求体: {"upsert": [{"variable_name": "...", "variable_value": "..."}] 或 {"name": "value"},
+             "delete": ["name", ...]}
+    """
+    current_user = AuthService.get_current_user()
+    
+    if not current_user:
+        return jsonify({"message": "用户不存在"}), 404
+    
+    data = request.get_json(silent=True) or {}
+    upserts = data.get('upsert') or {}
+    deletes = data.get('delete') or []
+    
+    try:
+        if isinstance(upserts, list):
+            if not all(isinstance(item, dict) for item in upserts):
+                raise ValueError("upsert 必须是变量对象列表或变量名到变量值的映射")
+            upserts = {item.get('variable_name'): item.get('variable_value') for item in upserts}
+        if not isinstance(upserts, dict) or not isinstance(deletes, list):
+            raise ValueError("upsert 必须是变量对象列表或变量名到变量值的映射，delete 必须是变量名列表")
+        
+        result = UserVariableService.bulk_update(current_user.id, upserts, deletes)
+        return jsonify({"message": "变量批量修改成功", **result})
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"message": f"批量修改变量失败: {str(e)}"}), 500
+
 @main_bp.route('/api/variables/<int:variable_id>', methods=['DELETE'])
 @jwt_required()
 def api_delete_user_variable(variable_id):
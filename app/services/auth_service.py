@@ -1,33 +1,76 @@
+import time
+from flask import current_app, g
 from flask_jwt_extended import JWTManager, create_access_token, get_jwt_identity, get_jwt, decode_token
+from app.services.login_throttle import create_login_throttle
+from app.services.token_blocklist import MemoryBlocklistStore, TokenBlocklist, create_token_blocklist
 from app.services.user_service import UserService
 from typing import Optional, Dict, Any
 
 jwt = JWTManager()
 
-# 黑名单存储（用于注销功能）
-blacklisted_tokens = set()
+# 黑名单存储（用于注销功能），由 AuthService.init_app 按配置替换为共享存储
+token_blocklist = TokenBlocklist(MemoryBlocklistStore())
+
+# 登录限流，由 AuthService.init_app 按配置创建(未开启时为None)
+login_throttle = None
 
 @jwt.token_in_blocklist_loader
 def check_if_token_revoked(jwt_header, jwt_payload):
     """检查token是否被撤销"""
-    return jwt_payload['jti'] in blacklisted_tokens
+    return token_blocklist.is_revoked(jwt_payload['jti'])
 
 class AuthService:
     @staticmethod
-    def authenticate_user(username: str, password: str) -> Optional[Dict[str, Any]]:
+    def init_app(app, redis_client=None):
+        """
+        根据应用配置初始化JWT黑名单
+        
+        Args:
+            app: Flask应用
+            redis_client: 使用 redis 存储时的客户端(可选)
+        """
+        global token_blocklist, login_throttle
+        token_blocklist.stop()
+        token_blocklist = create_token_blocklist(app.config, redis_client=redis_client, app=app)
+        login_throttle = create_login_throttle(app.config, redis_client=redis_client)
+    
+    @staticmethod
+    def get_blocklist_stats() -> Dict[str, Any]:
+        """获取JWT黑名单统计信息"""
+        return token_blocklist.stats()
+    
+    @staticmethod
+    def get_login_throttle_stats() -> Optional[Dict[str, Any]]:
+        """获取登录限流统计信息"""
+        return login_throttle.stats() if login_throttle is not None else None
+    
+    @staticmethod
+    def authenticate_user(username: str, password: str, client_ip: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """
         用户认证
         
         Args:
             username: 用户名
             password: 密码
+            client_ip: 客户端IP(用于登录限流)
         
         Returns:
             认证结果字典(包含access_token和用户信息)或None
+        
+        Raises:
+            LoginThrottled: 登录尝试过于频繁
+            PasswordHasherBusy: 密码哈希线程池繁忙
         """
+        # 在查询数据库和校验密码之前限流
+        if login_throttle is not None:
+            login_throttle.before_attempt(username, client_ip)
+        
         user = UserService.get_user_by_username(username)
         if user and UserService.verify_password(user, password):
-            access_token = create_access_token(identity=username)
+            if login_throttle is not None:
+                login_throttle.record_success(username)
+            UserService.rehash_password_if_needed(user, password)
+            access_token = AuthService.create_token(user)
             return {
                 'access_token': access_token,
                 'user': {
@@ -38,6 +81,8 @@ class AuthService:
                     'full_name': user.full_name
                 }
             }
+        if login_throttle is not None:
+            login_throttle.record_failure(username)
         return None
     
     @staticmethod
@@ -53,6 +98,9 @@ class AuthService:
         
         Returns:
             注册结果或None(如果用户名已存在)
+        
+        Raises:
+            PasswordHasherBusy: 密码哈希线程池繁忙
         """
         if UserService.get_user_by_username(username):
             return None
@@ -62,7 +110,7 @@ class AuthService:
             from app.models import db
             db.session.commit()
             
-            access_token = create_access_token(identity=username)
+            access_token = AuthService.create_token(new_user)
             return {
                 'access_token': access_token,
                 'user': {
@@ -75,13 +123,37 @@ class AuthService:
             }
         return None
     
+    @staticmethod
+    def create_token(user) -> str:
+        """为用户签发access token，uid声明中携带用户ID"""
+        return create_access_token(identity=user.username, additional_claims={'uid': user.id})
+    
+    @staticmethod
+    def _load_user(username: str, user_id: Optional[int]) -> Optional[Any]:
+        """按token中的身份加载用户，携带uid时走用户缓存"""
+        if user_id is None:
+            # 早期签发的token没有uid声明
+            return UserService.get_user_by_username(username)
+        user = UserService.get_cached_user(user_id)
+        # 用户名不一致说明该ID对应的用户已被删除
+        return user if user is not None and user.username == username else None
+    
     @staticmethod
     def get_current_user() -> Optional[Any]:
-        """获取当前登录用户"""
+        """获取当前登录用户(同一请求内只加载一次)"""
         current_user = get_jwt_identity()
-        if current_user:
-            return UserService.get_user_by_username(current_user)
-        return None
+        if not current_user:
+            return None
+        
+        claims = get_jwt()
+        memo_key = claims.get('jti')
+        memo = g.get('_current_user')
+        if memo is not None and memo[0] == memo_key:
+            return memo[1]
+        
+        user = AuthService._load_user(current_user, claims.get('uid'))
+        g._current_user = (memo_key, user)
+        return user
     
     @staticmethod
     def get_current_user_id() -> Optional[int]:
@@ -90,23 +162,26 @@ class AuthService:
         return current_user.id if current_user else None
     
     @staticmethod
-    def logout_user(jti: str) -> bool:
+    def logout_user(jti: str, expires_at: Optional[float] = None) -> bool:
         """
         用户注销
         
         Args:
             jti: JWT ID
+            expires_at: token过期时间(Unix 时间戳)，不传时按最长有效期计算
         
         Returns:
             是否注销成功
         """
-        blacklisted_tokens.add(jti)
+        if expires_at is None:
+            expires_at = time.time() + current_app.config['JWT_ACCESS_TOKEN_EXPIRES'].total_seconds()
+        token_blocklist.revoke(jti, expires_at)
         return True
     
     @staticmethod
     def is_token_blacklisted(jti: str) -> bool:
         """检查token是否在黑名单中"""
-        return jti in blacklisted_tokens
+        return token_blocklist.is_revoked(jti)
     
     @staticmethod
     def verify_admin_permission(user) -> bool:
@@ -171,7 +246,6 @@ class AuthService:
                 token = token.split(' ')[1]
             
             decoded = decode_token(token)
-            username = decoded['sub']
-            return UserService.get_user_by_username(username)
+            return AuthService._load_user(decoded['sub'], decoded.get('uid'))
         except:
             return None
\ No newline at end of file
@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import deque
+from typing import List, Dict, Any, Optional
+from app.models import db, ConversionResult
+
+
+class RecentConversionFeed:
+    """
+    最近转换记录的内存环形缓冲区
+
+    保存转换记录时同步追加，首页读取时不访问数据库。首次读取时从数据库预热，
+    之后每隔 refresh_interval 秒重新加载一次，以便合并其他工作进程写入的记录。
+    curl 命令只保存截断后的预览；代码保存完整内容(复制时使用)和截断后的预览(显示用)。
+    """
+
+    def __init__(self, capacity: int = 20, preview_chars: int = 500, refresh_interval: Optional[float] = 60):
+        """
+        初始化缓冲区
+
+        Args:
+            capacity: 保留的记录数
+            preview_chars: 预览截断长度(字符)
+            refresh_interval: 从数据库重新加载的间隔(秒)，None 表示只在冷启动时加载
+        """
+        self.capacity = capacity
+        self.preview_chars = preview_chars
+        self.refresh_interval = refresh_interval
+        self._entries = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._loaded_at = None
+
+    def append_records(self, records: List[Dict[str, Any]]):
+        """追加转换记录(字段与 ConversionResult 一致)"""
+        entries = [self._make_entry(None, r.get('user_id'), r['curl_command'], r['python_code'],
+                                    r['status'], r['created_at'])
+                   for r in records]
+        with self._lock:
+            self._entries.extend(entries)
+
+    def get_recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """获取最近的转换记录(按时间倒序)"""
+        if self._needs_reload():
+            self.reload()
+        with self._lock:
+            entries = list(self._entries)
+        entries.reverse()
+        return [entry for _, _, _, entry in entries[:limit]]
+
+    def reload(self):
+        """从数据库重新加载最近的记录，curl 命令只查询预览长度的内容"""
+        curl_preview = db.func.substr(ConversionResult.curl_command, 1, self.preview_chars + 1)
+        rows = db.session.query(
+            ConversionResult.id, ConversionResult.user_id, curl_preview, ConversionResult.python_code,
+            ConversionResult.status, ConversionResult.created_at
+        ).order_by(ConversionResult.created_at.desc()).limit(self.capacity).all()
+
+        loaded = [self._make_entry(*row) for row in reversed(rows)]
+        newest = rows[0][5] if rows else None
+
+        with self._lock:
+            # 保留尚未写入数据库(如后台写入队列中)的较新记录
+            pending = [item for item in self._entries
+                       if newest is None or (item[0] is not None and item[0] > newest)]
+            self._entries.clear()
+            self._entries.extend(loaded + pending)
+            self._loaded_at = time.monotonic()
+
+    def remove(self, conversion_id: int, user_id: Optional[int], created_at):
+        """
+        删除转换记录后从缓冲区移除对应的记录
+
+        尚未写入数据库(没有ID)的记录按创建时间和用户匹配。
+        """
+        with self._lock:
+            kept = [item for item in self._entries
+                    if not (item[1] == conversion_id
+                            or (item[1] is None and item[0] == created_at and item[2] == user_id))]
+            self._entries.clear()
+            self._entries.extend(kept)
+
+    def clear(self):
+        """清空缓冲区，下次读取时重新从数据库加载"""
+        with self._lock:
+            self._entries.clear()
+            self._loaded_at = None
+
+    def _needs_reload(self) -> bool:
+        if self._loaded_at is None:
+            return True
+        return self.refresh_interval is not None and time.monotonic() - self._loaded_at >= self.refresh_interval
+
+    def _make_entry(self, conversion_id: Optional[int], user_id: Optional[int], curl: str, python: str,
+                    status: str, created_at):
+        """生成 (created_at, 记录ID, 用户ID, 记录字典) 四元组"""
+        curl_preview, curl_truncated = self._truncate(curl)
+        python_preview, python_truncated = self._truncate(python)
+        return created_at, conversion_id, user_id, {
+            'curl': curl_preview,
+            'python': python,
+            'python_preview': python_preview,
+            'status': status,
+            'created_at': created_at.isoformat() if created_at else None,
+            'truncated': curl_truncated or python_truncated
+        }
+
+    def _truncate(self, text: str):
+        if text is not None and len(text) > self.preview_chars:
+            return text[:self.preview_chars] + '…', True
+        return text, False
@@ -1,61 +1,473 @@
+import atexit
+import hashlib
+import json
 from app.models import db, ConversionResult
-from app.converter import convert_curl_to_python
-from typing import List, Dict, Any, Optional
+from app.converter import (SESSION_CLIENTS, available_targets, generate_load, generate_session, generate_targets,
+                           group_by_origin, parse_curl_command, parse_request)
+from app.converter.variables import find_missing, find_placeholders
+from app.services.conversion_feed import RecentConversionFeed
+from app.services.user_variable_service import UserVariableService
+from app.utils.batch_writer import BatchWriter
+from app.utils.cache import LRUCache
+from app.utils.pagination import keyset_page
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 
+# 转换结果缓存(以规范化后 curl 命令的哈希为键)
+conversion_cache = LRUCache()
+
+# 解析后的请求表示缓存(以规范化后 curl 命令的哈希为键)，各代码生成目标共用
+request_ir_cache = LRUCache(sizeof=lambda ir: ir.approximate_size())
+
+# 首页最近转换记录的内存环形缓冲区
+recent_feed = RecentConversionFeed()
+
+# 转换记录后台写入器(CONVERSION_WRITE_BEHIND 开启时创建)
+conversion_writer = None
+
+# 变量替换方式：expand 直接代入变量值；reference 生成引用变量的代码
+VARIABLE_MODES = ('expand', 'reference')
+
+# 默认的代码生成目标
+DEFAULT_TARGET = 'requests'
+
+# 会话代码的连接池大小和重试次数范围
+SESSION_MAX_POOL_SIZE = 100
+SESSION_MAX_RETRIES = 10
+
+# 压测脚本的并发数、速率(请求/秒)和轮数上限
+LOAD_MAX_CONCURRENCY = 1000
+LOAD_MAX_RATE_LIMIT = 100000
+LOAD_MAX_ITERATIONS = 100000
+
+def _is_integer(value) -> bool:
+    """是否为整数(JSON 中的 true/false 在 Python 中也是 int，不接受)"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
 class ConverterService:
     @staticmethod
-    def convert_curl_command(curl_command: str, user_id: Optional[int] = None) -> Dict[str, Any]:
+    def init_app(app):
+        """根据应用配置初始化转换缓存、最近记录缓冲区和后台写入器"""
+        global conversion_cache, request_ir_cache, conversion_writer, recent_feed
+        recent_feed = RecentConversionFeed(
+            capacity=app.config.get('HISTORY_FEED_SIZE', 20),
+            preview_chars=app.config.get('HISTORY_FEED_PREVIEW_CHARS', 500),
+            refresh_interval=app.config.get('HISTORY_FEED_REFRESH_SECONDS', 60)
+        )
+        if conversion_writer is not None:
+            conversion_writer.stop()
+            conversion_writer = None
+        if app.config.get('CONVERSION_WRITE_BEHIND', False):
+            conversion_writer = BatchWriter(
+                handler=lambda records: ConverterService._insert_records(app, records),
+                flush_interval=app.config.get('CONVERSION_FLUSH_INTERVAL_MS', 500) / 1000,
+                batch_size=app.config.get('CONVERSION_FLUSH_BATCH_SIZE', 200),
+                max_queue_size=app.config.get('CONVERSION_QUEUE_MAX_SIZE', 10000),
+                on_error=lambda e: app.logger.error(f"转换记录写入失败: {str(e)}")
+            )
+            atexit.register(conversion_writer.stop)
+        conversion_cache = LRUCache(
+            max_entries=app.config.get('CONVERSION_CACHE_MAX_ENTRIES', 1024),
+            max_bytes=app.config.get('CONVERSION_CACHE_MAX_BYTES', 64 * 1024 * 1024),
+            ttl=app.config.get('CONVERSION_CACHE_TTL', 3600)
+        )
+        request_ir_cache = LRUCache(
+            max_entries=app.config.get('REQUEST_IR_CACHE_MAX_ENTRIES', 1024),
+            max_bytes=app.config.get('CONVERSION_CACHE_MAX_BYTES', 64 * 1024 * 1024),
+            ttl=app.config.get('CONVERSION_CACHE_TTL', 3600),
+            sizeof=lambda ir: ir.approximate_size()
+        )
+    
+    @staticmethod
+    def _cache_key(curl_command: str, variable_mode: Optional[str] = None,
+                   variables: Optional[Dict[str, str]] = None, target: Optional[str] = None) -> str:
+        """计算curl命令的缓存键(包含生成目标；使用变量时包含替换方式和引用到的变量)"""
+        normalized = curl_command.strip().replace('\r\n', '\n')
+        if target:
+            normalized += '\0' + target
+        if variables:
+            normalized += '\0' + variable_mode + '\0' + json.dumps(sorted(variables.items()))
+        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def _parse(curl_command: str):
+        """解析curl命令为请求表示，命中缓存时跳过解析"""
+        key = ConverterService._cache_key(curl_command)
+        ir = request_ir_cache.get(key)
+        if ir is None:
+            ir = parse_request(curl_command)
+            request_ir_cache.set(key, ir)
+        return ir
+    
+    @staticmethod
+    def _convert(curl_command: str, variable_mode: Optional[str] = None,
+                 variables: Optional[Dict[str, str]] = None,
+                 targets: Tuple[str, ...] = (DEFAULT_TARGET,)) -> Dict[str, str]:
         """
-        转换curl命令为Python代码并保存结果
+        转换curl命令为各目标的代码，命令最多解析一次，命中缓存的目标跳过代码生成
+        
+        Returns:
+            目标名称 -> 代码
+        """
+        # 只保留命令中引用到的变量：不引用变量的命令与不使用变量时共用缓存
+        if variable_mode and variables:
+            names = find_placeholders(curl_command)
+            variables = {name: variables[name] for name in names if name in variables}
+        else:
+            variables = None
+        
+        outputs = {}
+        keys = {}
+        for target in targets:
+            keys[target] = ConverterService._cache_key(curl_command, variable_mode, variables, target)
+            code = conversion_cache.get(keys[target])
+            if code is not None:
+                outputs[target] = code
+        
+        pending = [target for target in targets if target not in outputs]
+        if pending:
+            generated = generate_targets(ConverterService._parse(curl_command), pending, variables,
+                                         reference=variable_mode == 'reference')
+            for target, code in generated.items():
+                conversion_cache.set(keys[target], code)
+            outputs.update(generated)
+        return {target: outputs[target] for target in targets}
+    
+    @staticmethod
+    def _resolve_targets(targets) -> Tuple[str, ...]:
+        """
+        校验代码生成目标
         
         Args:
-            curl_command: curl命令
-            user_id: 用户ID(可选)
+            targets: 目标名称或名称列表，为空时使用默认目标
         
         Returns:
-            转换结果字典
+            去重后的目标名称
+        
+        Raises:
+            ValueError: 不支持的目标
+        """
+        if not targets:
+            return (DEFAULT_TARGET,)
+        if isinstance(targets, str):
+            targets = [targets]
+        if not isinstance(targets, (list, tuple)):
+            raise ValueError("targets 应为目标名称或名称列表")
+        supported = available_targets()
+        for target in targets:
+            if target not in supported:
+                raise ValueError(f"不支持的代码生成目标: {target}，可选: {', '.join(supported)}")
+        return tuple(dict.fromkeys(targets))
+    
+    @staticmethod
+    def _load_variables(user_id: Optional[int], variable_mode: Optional[str]) -> Optional[Dict[str, str]]:
+        """
+        加载变量替换使用的用户变量(每次调用只加载一次)
+        
+        Raises:
+            ValueError: 不支持的替换方式
+        """
+        if not variable_mode:
+            return None
+        if variable_mode not in VARIABLE_MODES:
+            raise ValueError(f"不支持的变量替换方式: {variable_mode}")
+        return UserVariableService.get_variable_map(user_id) if user_id else {}
+    
+    @staticmethod
+    def get_cache_stats() -> Dict[str, Any]:
+        """获取转换缓存统计信息"""
+        return conversion_cache.stats()
+    
+    @staticmethod
+    def get_request_ir_cache_stats() -> Dict[str, Any]:
+        """获取请求表示缓存统计信息"""
+        return request_ir_cache.stats()
+    
+    @staticmethod
+    def get_writer_stats() -> Optional[Dict[str, Any]]:
+        """获取后台写入器统计信息(未开启后台写入时返回None)"""
+        return conversion_writer.stats() if conversion_writer is not None else None
+    
+    @staticmethod
+    def flush_pending_records():
+        """立即写入后台队列中的转换记录"""
+        if conversion_writer is not None:
+            conversion_writer.flush()
+    
+    @staticmethod
+    def _run_conversion(curl_command: str, user_id: Optional[int], variable_mode: Optional[str] = None,
+                        variables: Optional[Dict[str, str]] = None,
+                        targets: Tuple[str, ...] = (DEFAULT_TARGET,)) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        执行一次转换
+        
+        Returns:
+            (返回给调用方的转换结果, 待保存的转换记录)；python 字段为第一个目标的代码
         """
         try:
-            # 执行转换
-            python_code = convert_curl_to_python(curl_command)
-            
-            # 创建转换结果记录
-            result = ConversionResult(
-                user_id=user_id,
-                curl_command=curl_command,
-                python_code=python_code,
-                status='转换成功'
-            )
-            db.session.add(result)
-            db.session.commit()
-            
-            return {
-                'success': True,
-                'curl': curl_command,
-                'python': python_code,
-                'status': 'converted',
-                'message': '转换成功'
-            }
-            
+            outputs = ConverterService._convert(curl_command, variable_mode, variables, targets)
+            python_code = outputs[targets[0]]
         except Exception as e:
-            # 创建错误记录
-            error_result = ConversionResult(
-                user_id=user_id,
-                curl_command=curl_command,
-                python_code=f'转换错误: {str(e)}',
-                status='转换失败'
-            )
-            db.session.add(error_result)
-            db.session.commit()
-            
+            record = {
+                'user_id': user_id,
+                'curl_command': curl_command,
+                'python_code': f'转换错误: {str(e)}',
+                'status': '转换失败',
+                'created_at': datetime.utcnow()
+            }
             return {
                 'success': False,
                 'curl': curl_command,
                 'python': f'# 转换错误: {str(e)}',
                 'status': 'error',
                 'message': f'转换失败: {str(e)}'
-            }
+            }, record
+        
+        record = {
+            'user_id': user_id,
+            'curl_command': curl_command,
+            'python_code': python_code,
+            'status': '转换成功',
+            'created_at': datetime.utcnow()
+        }
+        result = {
+            'success': True,
+            'curl': curl_command,
+            'python': python_code,
+            'status': 'converted',
+            'message': '转换成功'
+        }
+        if len(targets) > 1:
+            result['outputs'] = outputs
+        if variable_mode:
+            result['missing_variables'] = find_missing(curl_command, variables or {})
+        return result, record
+    
+    @staticmethod
+    def _insert_records(app, records: List[Dict[str, Any]]):
+        """在后台线程中写入一批转换记录"""
+        with app.app_context():
+            try:
+                db.session.execute(db.insert(ConversionResult), records)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                raise e
+            finally:
+                db.session.remove()
+    
+    @staticmethod
+    def _save_records(records: List[Dict[str, Any]]):
+        """
+        批量保存转换记录(一条INSERT语句、一次提交)
+        
+        开启后台写入时只放入队列，由后台线程批量写入数据库。
+        """
+        if not records:
+            return
+        if conversion_writer is not None:
+            conversion_writer.put_many(records)
+            recent_feed.append_records(records)
+            return
+        try:
+            db.session.execute(db.insert(ConversionResult), records)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise e
+        recent_feed.append_records(records)
+    
+    @staticmethod
+    def convert_curl_command(curl_command: str, user_id: Optional[int] = None,
+                             variable_mode: Optional[str] = None, targets=None) -> Dict[str, Any]:
+        """
+        转换curl命令为Python代码并保存结果
+        
+        Args:
+            curl_command: curl命令
+            user_id: 用户ID(可选)
+            variable_mode: 用户变量替换方式(可选)：expand 把 {{name}}、${name}、$name 替换为变量值；
+                reference 生成为变量赋值并在代码中引用变量
+            targets: 代码生成目标名称或列表(可选，默认 requests)，命令只解析一次
+        
+        Returns:
+            转换结果字典(使用变量时包含未定义的变量 missing_variables；
+            多个目标时 outputs 包含各目标的代码)
+        
+        Raises:
+            ValueError: 不支持的替换方式或生成目标
+        """
+        targets = ConverterService._resolve_targets(targets)
+        variables = ConverterService._load_variables(user_id, variable_mode)
+        result, record = ConverterService._run_conversion(curl_command, user_id, variable_mode, variables, targets)
+        ConverterService._save_records([record])
+        return result
+    
+    @staticmethod
+    def convert_curl_commands(curl_commands: List[Optional[str]], user_id: Optional[int] = None,
+                              variable_mode: Optional[str] = None, targets=None) -> List[Dict[str, Any]]:
+        """
+        批量转换curl命令
+        
+        命令依次转换(解析和代码生成是持有GIL的纯Python计算，线程池无法并行，只增加调度开销)，
+        所有转换记录通过一次批量插入保存。
+        
+        Args:
+            curl_commands: curl命令列表(空值对应的结果为错误，不保存记录)
+            user_id: 用户ID(可选)
+            variable_mode: 用户变量替换方式(可选)，变量只加载一次，所有命令共用
+            targets: 代码生成目标名称或列表(可选，默认 requests)
+        
+        Returns:
+            与输入顺序一致的转换结果列表
+        
+        Raises:
+            ValueError: 不支持的替换方式或生成目标
+        """
+        targets = ConverterService._resolve_targets(targets)
+        variables = ConverterService._load_variables(user_id, variable_mode)
+        
+        def convert(item):
+            if not isinstance(item, str) or not item.strip():
+                return {
+                    'success': False,
+                    'curl': item if isinstance(item, str) else '',
+                    'python': '',
+                    'status': 'error',
+                    'message': '缺少 curl 命令'
+                }, None
+            return ConverterService._run_conversion(item, user_id, variable_mode, variables, targets)
+        
+        outcomes = [convert(item) for item in curl_commands]
+        
+        ConverterService._save_records([record for _, record in outcomes if record is not None])
+        
+        results = []
+        for index, (result, _) in enumerate(outcomes):
+            result['index'] = index
+            results.append(result)
+        return results
+    
+    @staticmethod
+    def convert_curl_session(curl_commands: List[Optional[str]], user_id: Optional[int] = None,
+                             variable_mode: Optional[str] = None, client: Optional[str] = None,
+                             pool_size: int = 10, retries: int = 3) -> Dict[str, Any]:
+        """
+        把多条curl命令转换为一个按源复用连接的脚本并保存结果
+        
+        每个源(协议 + 主机)生成一个 requests.Session 或 httpx.Client，同源请求共用连接池，
+        避免每个请求重新建立 TCP/TLS 连接。
+        
+        Args:
+            curl_commands: curl命令列表，按顺序发送
+            user_id: 用户ID(可选)
+            variable_mode: 用户变量替换方式(可选)
+            client: requests(默认) 或 httpx
+            pool_size: 每个源的最大连接数
+            retries: 失败重试次数
+        
+        Returns:
+            转换结果字典(origins 为各会话对应的源和请求序号)
+        
+        Raises:
+            ValueError: 参数无效或命令解析失败
+        """
+        client = client or 'requests'
+        if client not in SESSION_CLIENTS:
+            raise ValueError(f"不支持的会话客户端: {client}，可选: {', '.join(SESSION_CLIENTS)}")
+        if not _is_integer(pool_size) or not 1 <= pool_size <= SESSION_MAX_POOL_SIZE:
+            raise ValueError(f"pool_size 应为 1 到 {SESSION_MAX_POOL_SIZE} 之间的整数")
+        if not _is_integer(retries) or not 0 <= retries <= SESSION_MAX_RETRIES:
+            raise ValueError(f"retries 应为 0 到 {SESSION_MAX_RETRIES} 之间的整数")
+        
+        irs = ConverterService._parse_commands(curl_commands)
+        variables = ConverterService._load_variables(user_id, variable_mode)
+        python_code = generate_session(irs, client, variables, reference=variable_mode == 'reference',
+                                       pool_size=pool_size, retries=retries)
+        result = ConverterService._save_script(curl_commands, python_code, user_id, variable_mode, variables)
+        result['origins'] = [{'origin': origin, 'requests': [index + 1 for index in indexes]}
+                             for origin, indexes in group_by_origin(irs)]
+        return result
+    
+    @staticmethod
+    def convert_curl_load(curl_commands: List[Optional[str]], user_id: Optional[int] = None,
+                          variable_mode: Optional[str] = None, concurrency: int = 10,
+                          rate_limit: Optional[float] = None, iterations: int = 1) -> Dict[str, Any]:
+        """
+        把多条curl命令转换为异步并发压测脚本(asyncio + httpx.AsyncClient)并保存结果
+        
+        Args:
+            curl_commands: curl命令列表，脚本按顺序循环发送
+            user_id: 用户ID(可选)
+            variable_mode: 用户变量替换方式(可选)
+            concurrency: 最大并发请求数
+            rate_limit: 每秒最多发出的请求数(可选，不传表示不限)
+            iterations: 每条命令发送的次数
+        
+        Returns:
+            转换结果字典
+        
+        Raises:
+            ValueError: 参数无效、命令解析失败或命令包含文件上传
+        """
+        if not _is_integer(concurrency) or not 1 <= concurrency <= LOAD_MAX_CONCURRENCY:
+            raise ValueError(f"concurrency 应为 1 到 {LOAD_MAX_CONCURRENCY} 之间的整数")
+        if rate_limit is not None and (isinstance(rate_limit, bool) or not isinstance(rate_limit, (int, float))
+                                       or not 0 < rate_limit <= LOAD_MAX_RATE_LIMIT):
+            raise ValueError(f"rate_limit 应为大于 0、不超过 {LOAD_MAX_RATE_LIMIT} 的数")
+        if not _is_integer(iterations) or not 1 <= iterations <= LOAD_MAX_ITERATIONS:
+            raise ValueError(f"iterations 应为 1 到 {LOAD_MAX_ITERATIONS} 之间的整数")
+        
+        irs = ConverterService._parse_commands(curl_commands)
+        variables = ConverterService._load_variables(user_id, variable_mode)
+        python_code = generate_load(irs, variables, reference=variable_mode == 'reference',
+                                    concurrency=concurrency, rate_limit=rate_limit, iterations=iterations)
+        result = ConverterService._save_script(curl_commands, python_code, user_id, variable_mode, variables)
+        result['total_requests'] = len(irs) * iterations
+        return result
+    
+    @staticmethod
+    def _parse_commands(curl_commands: List[Optional[str]]) -> list:
+        """
+        解析生成脚本用的多条curl命令(使用请求表示缓存)
+        
+        Raises:
+            ValueError: 命令为空或解析失败(消息包含命令序号)
+        """
+        irs = []
+        for index, item in enumerate(curl_commands):
+            if not isinstance(item, str) or not item.strip():
+                raise ValueError(f"第 {index + 1} 条命令为空")
+            try:
+                irs.append(ConverterService._parse(item))
+            except Exception as e:
+                # 与 _run_conversion 一致，任何解析异常都作为该命令的转换失败返回
+                raise ValueError(f"第 {index + 1} 条命令解析失败: {str(e)}")
+        return irs
+    
+    @staticmethod
+    def _save_script(curl_commands: List[str], python_code: str, user_id: Optional[int],
+                     variable_mode: Optional[str], variables: Optional[Dict[str, str]]) -> Dict[str, Any]:
+        """把由多条命令生成的脚本保存为一条转换记录，返回转换结果"""
+        curl_text = '\n'.join(curl_commands)
+        ConverterService._save_records([{
+            'user_id': user_id,
+            'curl_command': curl_text,
+            'python_code': python_code,
+            'status': '转换成功',
+            'created_at': datetime.utcnow()
+        }])
+        
+        result = {
+            'success': True,
+            'curl': curl_text,
+            'python': python_code,
+            'status': 'converted',
+            'message': '转换成功'
+        }
+        if variable_mode:
+            result['missing_variables'] = find_missing(curl_text, variables or {})
+        return result
     
     @staticmethod
     def get_conversion_history(limit: int = 20, user_id: Optional[int] = None) -> List[Dict[str, Any]]:
@@ -84,6 +496,19 @@ class ConverterService:
             'created_at': r.created_at.isoformat() if r.created_at else None
         } for r in results]
     
+    @staticmethod
+    def get_recent_conversions(limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        获取最近的转换记录预览(读取内存缓冲区，不查询数据库)
+        
+        Args:
+            limit: 限制记录数量(不超过缓冲区容量)
+        
+        Returns:
+            转换记录预览列表，curl和python_preview字段为截断后的内容，python字段为完整代码
+        """
+        return recent_feed.get_recent(limit)
+    
     @staticmethod
     def get_conversion_by_id(conversion_id: int) -> Optional[ConversionResult]:
         """根据ID获取转换结果"""
@@ -97,6 +522,36 @@ class ConverterService:
             .limit(limit)\
             .all()
     
+    @staticmethod
+    def get_user_conversions_page(user_id: int, limit: int = 50, cursor: Optional[str] = None,
+                                  include_total: bool = False) -> Dict[str, Any]:
+        """
+        按游标分页获取用户的转换记录
+        
+        Args:
+            user_id: 用户ID
+            limit: 每页数量
+            cursor: 上一页返回的 next_cursor，None 表示第一页
+            include_total: 是否统计记录总数
+        
+        Returns:
+            转换记录列表和下一页游标
+        
+        Raises:
+            ValueError: 游标无效
+        """
+        query = ConversionResult.query.filter_by(user_id=user_id)
+        total = query.count() if include_total else None
+        conversions, next_cursor = keyset_page(
+            query, [ConversionResult.created_at, ConversionResult.id], cursor, limit
+        )
+        return {
+            'conversions': conversions,
+            'total': total,
+            'per_page': limit,
+            'next_cursor': next_cursor
+        }
+    
     @staticmethod
     def delete_conversion(conversion_id: int, user_id: Optional[int] = None) -> bool:
         """
@@ -120,6 +575,7 @@ class ConverterService:
             
             db.session.delete(conversion)
             db.session.commit()
+            recent_feed.remove(conversion_id, conversion.user_id, conversion.created_at)
             return True
         except Exception as e:
             db.session.rollback()
@@ -163,11 +619,8 @@ class ConverterService:
         Returns:
             是否为有效的curl命令
         """
-        curl_command = curl_command.strip()
-        if not curl_command.startswith('curl'):
+        try:
+            parse_curl_command(curl_command)
+        except ValueError:
             return False
-        
-        # 基本格式检查
-        import re
-        url_match = re.search(r'curl\s+["\']?([^"\'\s]+)', curl_command)
-        return bool(url_match)
\ No newline at end of file
+        return True
\ No newline at end of file
@@ -0,0 +1,135 @@
+import os
+import threading
+from typing import Any, Dict, Iterable
+from app.models import db, StoredFile, UserStorageUsage
+
+
+class DownloadCounter:
+    """
+    批量下载计数器
+
+    下载次数先在内存中累加，后台线程每隔 flush_interval 秒把增量合并为
+    UPDATE ... SET download_count = download_count + n 批量写入，
+    避免每次下载都执行一次读-改-写事务。文件所属用户的用量汇总在同一事务中累加。
+    """
+
+    def __init__(self, app, flush_interval: float = 5.0):
+        """
+        初始化计数器
+
+        Args:
+            app: Flask 应用(后台线程写入时使用其应用上下文)
+            flush_interval: 写入间隔(秒)
+        """
+        self.app = app
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.flushed = 0
+        self.errors = 0
+
+    def increment(self, file_id: int, count: int = 1):
+        """累加下载次数"""
+        self._ensure_started()
+        with self._lock:
+            self._pending[file_id] = self._pending.get(file_id, 0) + count
+
+    def pending(self, file_id: int) -> int:
+        """获取尚未写入数据库的下载次数"""
+        with self._lock:
+            return self._pending.get(file_id, 0)
+
+    def pending_many(self, file_ids: Iterable[int]) -> Dict[int, int]:
+        """批量获取尚未写入数据库的下载次数"""
+        with self._lock:
+            return {file_id: self._pending[file_id] for file_id in file_ids if file_id in self._pending}
+
+    def discard(self, file_id: int):
+        """丢弃文件的未写入计数(文件删除时调用)"""
+        with self._lock:
+            self._pending.pop(file_id, None)
+
+    def flush(self):
+        """把累加的下载次数写入数据库，失败时保留增量等待下次写入"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return
+
+            try:
+                with self.app.app_context():
+                    try:
+                        # 使用表级 UPDATE 以 executemany 方式一次提交所有增量
+                        table = StoredFile.__table__
+                        usage = UserStorageUsage.__table__
+                        params = [{'file_id': file_id, 'increment': count} for file_id, count in batch.items()]
+                        db.session.execute(
+                            table.update()
+                            .where(table.c.id == db.bindparam('file_id'))
+                            .values(download_count=db.func.coalesce(table.c.download_count, 0) + db.bindparam('increment')),
+                            params
+                        )
+                        owner = db.select(table.c.user_id).where(table.c.id == db.bindparam('file_id')).scalar_subquery()
+                        db.session.execute(
+                            usage.update()
+                            .where(usage.c.user_id == owner)
+                            .values(total_downloads=usage.c.total_downloads + db.bindparam('increment')),
+                            params
+                        )
+                        db.session.commit()
+                    except Exception:
+                        db.session.rollback()
+                        raise
+                    finally:
+                        db.session.remove()
+                self.flushed += sum(batch.values())
+            except Exception as e:
+                self.errors += 1
+                with self._lock:
+                    for file_id, count in batch.items():
+                        self._pending[file_id] = self._pending.get(file_id, 0) + count
+                self.app.logger.error(f"下载次数写入失败: {str(e)}")
+
+    def stop(self):
+        """停止后台线程并写入剩余的计数(之后再计数时自动重新启动)"""
+        self._stop_event.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(self.flush_interval + 1)
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """获取计数器统计信息"""
+        with self._lock:
+            pending_files = len(self._pending)
+            pending_downloads = sum(self._pending.values())
+        return {
+            'pending_files': pending_files,
+            'pending_downloads': pending_downloads,
+            'flushed': self.flushed,
+            'errors': self.errors
+        }
+
+    def _running(self) -> bool:
+        return (self._thread is not None and self._thread.is_alive() and not self._stop_event.is_set()
+                and self._pid == os.getpid())
+
+    def _ensure_started(self):
+        # 按进程启动后台线程，避免 fork 之后线程丢失(如 gunicorn --preload)；stop() 之后再计数时重新启动
+        if self._running():
+            return
+        with self._lock:
+            if self._running():
+                return
+            self._pid = os.getpid()
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name='download-counter', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
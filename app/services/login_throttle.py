@@ -0,0 +1,126 @@
+import math
+import threading
+from typing import Any, Dict, Optional
+from app.utils.rate_limiter import MemoryWindowStore, RedisWindowStore, SlidingWindowRateLimiter
+
+
+class LoginThrottled(Exception):
+    """登录尝试过于频繁"""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LoginThrottle:
+    """
+    登录限流
+
+    同时按用户名和客户端IP限流，在查询数据库和校验密码之前检查：
+    - 用户名：只统计失败的尝试，登录成功后清零，防止针对单个账号猜密码；
+    - IP：统计所有尝试，防止同一来源对大量账号撞库。
+    """
+
+    def __init__(self, username_limiter: SlidingWindowRateLimiter, ip_limiter: SlidingWindowRateLimiter):
+        """
+        初始化登录限流
+
+        Args:
+            username_limiter: 按用户名统计失败次数的限流器
+            ip_limiter: 按客户端IP统计尝试次数的限流器
+        """
+        self.username_limiter = username_limiter
+        self.ip_limiter = ip_limiter
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected_username = 0
+        self.rejected_ip = 0
+
+    def before_attempt(self, username: str, client_ip: Optional[str] = None):
+        """
+        登录尝试前检查(IP的尝试次数在这里计入)
+
+        Raises:
+            LoginThrottled: 超过限制
+        """
+        retry_after = self.username_limiter.peek(self._username_key(username))
+        if retry_after:
+            self._count('rejected_username')
+            raise LoginThrottled("该账号登录失败次数过多，请稍后重试", math.ceil(retry_after))
+
+        if client_ip:
+            retry_after = self.ip_limiter.hit(client_ip)
+            if retry_after:
+                self._count('rejected_ip')
+                raise LoginThrottled("登录尝试过于频繁，请稍后重试", math.ceil(retry_after))
+        self._count('allowed')
+
+    def record_failure(self, username: str):
+        """记录一次失败的登录"""
+        self.username_limiter.hit(self._username_key(username))
+
+    def record_success(self, username: str):
+        """登录成功后清除该账号的失败计数"""
+        self.username_limiter.reset(self._username_key(username))
+
+    def stats(self) -> Dict[str, Any]:
+        """获取登录限流统计信息"""
+        return {
+            'username_limit': self.username_limiter.stats(),
+            'ip_limit': self.ip_limiter.stats(),
+            'allowed': self.allowed,
+            'rejected_username': self.rejected_username,
+            'rejected_ip': self.rejected_ip
+        }
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    @staticmethod
+    def _username_key(username: str) -> str:
+        # 不区分大小写，避免通过改变大小写绕过限制
+        return username.strip().lower()
+
+
+def create_login_throttle(config, redis_client=None) -> Optional[LoginThrottle]:
+    """
+    根据应用配置创建登录限流
+
+    Args:
+        config: 应用配置
+        redis_client: 使用 redis 存储时的客户端，不传时按 LOGIN_THROTTLE_REDIS_URL 创建
+
+    Returns:
+        登录限流，未开启时返回None
+
+    Raises:
+        ValueError: 不支持的存储或缺少依赖
+    """
+    if not config.get('LOGIN_THROTTLE_ENABLED', True):
+        return None
+
+    backend_name = config.get('LOGIN_THROTTLE_BACKEND', 'memory')
+    if backend_name == 'memory':
+        username_store, ip_store = MemoryWindowStore(), MemoryWindowStore()
+    elif backend_name == 'redis':
+        if redis_client is None:
+            url = config.get('LOGIN_THROTTLE_REDIS_URL')
+            if not url:
+                raise ValueError("使用Redis存储登录限流计数时必须配置 LOGIN_THROTTLE_REDIS_URL")
+            try:
+                import redis
+            except ImportError:
+                raise ValueError("使用Redis存储登录限流计数需要安装 redis 包")
+            redis_client = redis.Redis.from_url(url)
+        username_store = RedisWindowStore(redis_client, prefix='login-throttle:user:')
+        ip_store = RedisWindowStore(redis_client, prefix='login-throttle:ip:')
+    else:
+        raise ValueError(f"不支持的登录限流存储: {backend_name}")
+
+    return LoginThrottle(
+        SlidingWindowRateLimiter(config.get('LOGIN_THROTTLE_USERNAME_LIMIT', 5),
+                                 config.get('LOGIN_THROTTLE_USERNAME_WINDOW', 300), username_store),
+        SlidingWindowRateLimiter(config.get('LOGIN_THROTTLE_IP_LIMIT', 30),
+                                 config.get('LOGIN_THROTTLE_IP_WINDOW', 60), ip_store)
+    )
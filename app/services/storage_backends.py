@@ -0,0 +1,250 @@
+import io
+import os
+import threading
+from typing import BinaryIO, Dict, Optional
+from app.utils.s3 import S3Client
+
+
+def prune_empty_dirs(path: str, root: str):
+    """自下而上删除 path 到 root(不含)之间的空目录"""
+    root = os.path.abspath(root)
+    current = os.path.abspath(path)
+    while current != root and os.path.commonpath([root, current]) == root:
+        try:
+            os.rmdir(current)
+        except OSError:
+            return
+        current = os.path.dirname(current)
+
+
+class StorageBackend:
+    """
+    文件存储后端接口
+
+    文件按存储键(如 blobs/ab/cd/<hash>)寻址。文件记录中保存 locate() 返回的位置，
+    key_for() 把位置还原为存储键，不属于本后端的位置(如早期的本地文件)返回None。
+    """
+
+    name = None
+
+    def put_file(self, key: str, local_path: str):
+        """把写好的本地临时文件存为对象(成功后临时文件被移走或删除)"""
+        raise NotImplementedError
+
+    def open(self, key: str, start: int = 0, stop: Optional[int] = None) -> BinaryIO:
+        """
+        以流的方式读取对象
+
+        Args:
+            key: 存储键
+            start: 起始字节
+            stop: 结束字节(不含)，None 表示到末尾；后端可以返回更多内容，由调用方截断
+        """
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        """对象是否存在"""
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        """删除对象(不存在时忽略)"""
+        raise NotImplementedError
+
+    def move(self, source_key: str, key: str):
+        """移动对象"""
+        raise NotImplementedError
+
+    def locate(self, key: str) -> str:
+        """存储键对应的位置(保存在文件记录中)"""
+        return f'{self.name}://{key}'
+
+    def key_for(self, location: str) -> Optional[str]:
+        """把位置还原为存储键"""
+        prefix = f'{self.name}://'
+        return location[len(prefix):] if location.startswith(prefix) else None
+
+    def local_path(self, key: str) -> Optional[str]:
+        """对象在本机文件系统中的路径，非本地存储返回None"""
+        return None
+
+
+class LocalStorageBackend(StorageBackend):
+    """本地磁盘存储，位置即文件路径(多个节点需要共享磁盘)"""
+
+    name = 'local'
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def put_file(self, key: str, local_path: str):
+        path = self.local_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(local_path, path)
+
+    def open(self, key: str, start: int = 0, stop: Optional[int] = None) -> BinaryIO:
+        stream = open(self.local_path(key), 'rb')
+        stream.seek(start)
+        return stream
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.local_path(key))
+
+    def delete(self, key: str):
+        path = self.local_path(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def move(self, source_key: str, key: str):
+        source_path = self.local_path(source_key)
+        path = self.local_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(source_path, path)
+        prune_empty_dirs(os.path.dirname(source_path), self.root)
+
+    def locate(self, key: str) -> str:
+        return self.local_path(key)
+
+    def key_for(self, location: str) -> Optional[str]:
+        root = os.path.abspath(self.root)
+        path = os.path.abspath(location)
+        if os.path.commonpath([root, path]) != root or path == root:
+            return None
+        return os.path.relpath(path, root).replace(os.sep, '/')
+
+    def local_path(self, key: str) -> Optional[str]:
+        return os.path.join(self.root, *key.split('/'))
+
+
+class MemoryStorageBackend(StorageBackend):
+    """进程内存储(仅用于测试)"""
+
+    name = 'memory'
+
+    def __init__(self):
+        self.objects: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def put_file(self, key: str, local_path: str):
+        with open(local_path, 'rb') as f:
+            data = f.read()
+        with self._lock:
+            self.objects[key] = data
+        os.remove(local_path)
+
+    def open(self, key: str, start: int = 0, stop: Optional[int] = None) -> BinaryIO:
+        with self._lock:
+            if key not in self.objects:
+                raise FileNotFoundError(key)
+            return io.BytesIO(self.objects[key][start:stop])
+
+    def exists(self, key: str) -> bool:
+        with self._lock:
+            return key in self.objects
+
+    def delete(self, key: str):
+        with self._lock:
+            self.objects.pop(key, None)
+
+    def move(self, source_key: str, key: str):
+        with self._lock:
+            self.objects[key] = self.objects.pop(source_key)
+
+
+class S3StorageBackend(StorageBackend):
+    """S3 兼容对象存储，各节点无需共享磁盘"""
+
+    name = 's3'
+
+    def __init__(self, client: S3Client, prefix: str = ''):
+        """
+        初始化后端
+
+        Args:
+            client: S3 客户端
+            prefix: 对象键前缀(多个应用共用存储桶时区分)
+        """
+        self.client = client
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+
+    def put_file(self, key: str, local_path: str):
+        with open(local_path, 'rb') as f:
+            self.client.put_object(self._object_key(key), f, os.fstat(f.fileno()).st_size)
+        os.remove(local_path)
+
+    def open(self, key: str, start: int = 0, stop: Optional[int] = None) -> BinaryIO:
+        # 只下载需要的部分(Range: bytes=start-end，end 包含在内)
+        byte_range = None
+        if start or stop is not None:
+            byte_range = f"bytes={start}-{'' if stop is None else stop - 1}"
+        return self.client.get_object(self._object_key(key), byte_range=byte_range)
+
+    def exists(self, key: str) -> bool:
+        return self.client.head_object(self._object_key(key)) is not None
+
+    def delete(self, key: str):
+        self.client.delete_object(self._object_key(key))
+
+    def move(self, source_key: str, key: str):
+        self.client.copy_object(self._object_key(source_key), self._object_key(key))
+        self.client.delete_object(self._object_key(source_key))
+
+    def locate(self, key: str) -> str:
+        return f's3://{self.client.bucket}/{self.prefix}{key}'
+
+    def key_for(self, location: str) -> Optional[str]:
+        prefix = f's3://{self.client.bucket}/{self.prefix}'
+        return location[len(prefix):] if location.startswith(prefix) else None
+
+    def _object_key(self, key: str) -> str:
+        return self.prefix + key
+
+
+# 按配置缓存的后端实例(内存后端需要在请求之间共享)
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_storage_backend(config) -> StorageBackend:
+    """
+    根据应用配置获取存储后端
+
+    Args:
+        config: 应用配置
+
+    Returns:
+        存储后端
+
+    Raises:
+        ValueError: 不支持的存储后端或缺少配置
+    """
+    backend_name = config.get('STORAGE_BACKEND', 'local')
+    upload_folder = config.get('UPLOAD_FOLDER', 'uploads')
+
+    if backend_name == 'local':
+        return LocalStorageBackend(upload_folder)
+
+    if backend_name == 'memory':
+        cache_key = ('memory',)
+    elif backend_name == 's3':
+        if not config.get('S3_ENDPOINT_URL') or not config.get('S3_BUCKET'):
+            raise ValueError("使用S3存储时必须配置 S3_ENDPOINT_URL 和 S3_BUCKET")
+        cache_key = ('s3', config.get('S3_ENDPOINT_URL'), config.get('S3_BUCKET'),
+                     config.get('S3_ACCESS_KEY_ID'), config.get('S3_PREFIX', ''))
+    else:
+        raise ValueError(f"不支持的存储后端: {backend_name}")
+
+    with _backends_lock:
+        backend = _backends.get(cache_key)
+        if backend is None:
+            if backend_name == 'memory':
+                backend = MemoryStorageBackend()
+            else:
+                backend = S3StorageBackend(S3Client(
+                    endpoint_url=config.get('S3_ENDPOINT_URL'),
+                    bucket=config.get('S3_BUCKET'),
+                    access_key=config.get('S3_ACCESS_KEY_ID') or '',
+                    secret_key=config.get('S3_SECRET_ACCESS_KEY') or '',
+                    region=config.get('S3_REGION', 'us-east-1')
+                ), prefix=config.get('S3_PREFIX', ''))
+            _backends[cache_key] = backend
+        return backend
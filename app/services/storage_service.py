@@ -1,38 +1,184 @@
+import atexit
+import hashlib
+import json
 import os
+import shutil
+import time
 import uuid
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, BinaryIO, Iterator, List, Tuple
+from urllib.parse import quote as url_quote
+from sqlalchemy.exc import IntegrityError
 from werkzeug.datastructures import FileStorage
 from app.models import db, User
+from app.services.download_counter import DownloadCounter
+from app.services.storage_backends import StorageBackend, LocalStorageBackend, get_storage_backend, prune_empty_dirs
+from app.utils.pagination import keyset_page
+
+# 下载次数批量计数器(DOWNLOAD_COUNT_FLUSH_SECONDS 大于0时创建)
+download_counter = None
+
+class _ConcatenatedReader:
+    """按顺序读取多个文件的只读流"""
+    
+    def __init__(self, paths):
+        self._paths = list(paths)
+        self._current = None
+    
+    def read(self, size: int = -1) -> bytes:
+        while True:
+            if self._current is None:
+                if not self._paths:
+                    return b''
+                self._current = open(self._paths.pop(0), 'rb')
+            chunk = self._current.read(size)
+            if chunk:
+                return chunk
+            self._current.close()
+            self._current = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        if self._current is not None:
+            self._current.close()
+            self._current = None
 
 class StorageService:
     """对象存储服务"""
     
-    def __init__(self, upload_folder: str = 'uploads', max_file_size: int = 10 * 1024 * 1024):
+    # 文件交付方式：direct 由应用直接发送；x-accel-redirect / x-sendfile 交给前端代理发送
+    DELIVERY_MODES = ('direct', 'x-accel-redirect', 'x-sendfile')
+    
+    def __init__(self, upload_folder: str = 'uploads', max_file_size: int = 10 * 1024 * 1024,
+                 upload_session_ttl: int = 24 * 3600, delivery_mode: str = 'direct',
+                 accel_redirect_prefix: str = '/protected-uploads/',
+                 quota_bytes: Optional[int] = None, max_files: Optional[int] = None,
+                 fanout_levels: int = 2, fanout_width: int = 2, backend: Optional[StorageBackend] = None):
         """
         初始化存储服务
         
         Args:
             upload_folder: 上传文件存储目录
             max_file_size: 最大文件大小（字节）
+            upload_session_ttl: 分片上传会话的最长空闲时间（秒）
+            delivery_mode: 文件交付方式
+            accel_redirect_prefix: X-Accel-Redirect 模式下 nginx internal location 的前缀
+            quota_bytes: 每个用户的存储配额（字节），None 表示不限制
+            max_files: 每个用户的最大文件数，None 表示不限制
+            fanout_levels: blob目录的分层级数
+            fanout_width: 每级目录名取内容哈希的十六进制字符数
+            backend: 文件存储后端，默认为 upload_folder 下的本地磁盘；
+                upload_folder 始终用于暂存上传中的数据
         """
+        if delivery_mode not in self.DELIVERY_MODES:
+            raise ValueError(f"不支持的文件交付方式: {delivery_mode}")
+        if fanout_levels < 0 or fanout_width < 1 or fanout_levels * fanout_width > 32:
+            raise ValueError(f"无效的目录分层配置: {fanout_levels} 级 x {fanout_width} 字符")
+        if delivery_mode == 'x-sendfile' and backend is not None and backend.local_path('') is None:
+            raise ValueError("x-sendfile 交付方式只支持本地存储")
+        
         self.upload_folder = upload_folder
         self.max_file_size = max_file_size
+        self.delivery_mode = delivery_mode
+        self.accel_redirect_prefix = accel_redirect_prefix.rstrip('/') + '/'
+        self.chunk_size = 64 * 1024
+        self.staging_folder = os.path.join(upload_folder, '.staging')
+        self.max_upload_parts = 10000
+        self.upload_session_ttl = upload_session_ttl
+        self.quota_bytes = quota_bytes
+        self.max_files = max_files
+        self.fanout_levels = fanout_levels
+        self.fanout_width = fanout_width
+        self.backend = backend or LocalStorageBackend(upload_folder)
         self.allowed_extensions = {'txt', 'pdf', 'png', 'jpg', 'jpeg', 'gif', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx'}
         
         # 确保上传目录存在
         os.makedirs(self.upload_folder, exist_ok=True)
         
+    @staticmethod
+    def init_app(app):
+        """根据应用配置初始化下载次数计数器"""
+        global download_counter
+        if download_counter is not None:
+            download_counter.stop()
+            download_counter = None
+        flush_seconds = app.config.get('DOWNLOAD_COUNT_FLUSH_SECONDS', 5)
+        if flush_seconds and flush_seconds > 0:
+            download_counter = DownloadCounter(app, flush_interval=flush_seconds)
+            atexit.register(download_counter.stop)
+    
+    @staticmethod
+    def get_download_counter_stats() -> Optional[Dict[str, Any]]:
+        """获取下载次数计数器统计信息(未启用时返回None)"""
+        return download_counter.stats() if download_counter is not None else None
+    
+    @staticmethod
+    def flush_download_counts():
+        """立即把累加的下载次数写入数据库"""
+        if download_counter is not None:
+            download_counter.flush()
+    
+    @classmethod
+    def from_config(cls, config) -> 'StorageService':
+        """根据应用配置创建存储服务"""
+        return cls(
+            upload_folder=config.get('UPLOAD_FOLDER', 'uploads'),
+            max_file_size=config.get('MAX_FILE_SIZE', 10 * 1024 * 1024),
+            upload_session_ttl=config.get('UPLOAD_SESSION_TTL', 24 * 3600),
+            delivery_mode=config.get('FILE_DELIVERY_MODE', 'direct'),
+            accel_redirect_prefix=config.get('FILE_ACCEL_REDIRECT_PREFIX', '/protected-uploads/'),
+            quota_bytes=config.get('STORAGE_QUOTA_BYTES'),
+            max_files=config.get('STORAGE_MAX_FILES'),
+            fanout_levels=config.get('STORAGE_FANOUT_LEVELS', 2),
+            fanout_width=config.get('STORAGE_FANOUT_WIDTH', 2),
+            backend=get_storage_backend(config)
+        )
+    
     def _allowed_file(self, filename: str) -> bool:
         """检查文件扩展名是否允许"""
         return '.' in filename and filename.rsplit('.', 1)[1].lower() in self.allowed_extensions
     
-    def _generate_unique_filename(self, original_filename: str) -> str:
-        """生成唯一文件名"""
-        ext = original_filename.rsplit('.', 1)[1].lower() if '.' in original_filename else ''
-        unique_id = str(uuid.uuid4())
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        return f"{timestamp}_{unique_id}.{ext}" if ext else f"{timestamp}_{unique_id}"
+    def _size_limit_message(self) -> str:
+        return f"文件大小超过限制（最大 {self.max_file_size / (1024 * 1024):.1f}MB）"
+    
+    def _write_stream(self, stream: BinaryIO, file_path: str) -> Tuple[int, str]:
+        """
+        将数据流分块写入文件
+        
+        先写入同目录下的临时文件，完成后原子重命名；超过 max_file_size 时立即中止并删除临时文件。
+        
+        Args:
+            stream: 可读的二进制流
+            file_path: 目标文件路径
+        
+        Returns:
+            (文件大小, SHA-256十六进制摘要)
+        
+        Raises:
+            ValueError: 文件大小超过限制
+        """
+        temp_path = f"{file_path}.part"
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(temp_path, 'wb') as output:
+                while True:
+                    chunk = stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_file_size:
+                        raise ValueError(self._size_limit_message())
+                    digest.update(chunk)
+                    output.write(chunk)
+            os.replace(temp_path, file_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return size, digest.hexdigest()
     
     def upload_file(self, file: FileStorage, user: User, description: str = "") -> Dict[str, Any]:
         """
@@ -52,35 +198,259 @@ class StorageService:
         if not self._allowed_file(file.filename):
             raise ValueError(f"不支持的文件类型，支持的类型：{', '.join(self.allowed_extensions)}")
         
-        if file.content_length > self.max_file_size:
-            raise ValueError(f"文件大小超过限制（最大 {self.max_file_size / (1024 * 1024):.1f}MB）")
+        # 请求头声明了大小时提前拒绝，实际大小在写入过程中校验
+        if file.content_length and file.content_length > self.max_file_size:
+            raise ValueError(self._size_limit_message())
+        
+        return self._save_file(file.stream, user, file.filename,
+                               file.content_type or 'application/octet-stream', description)
+    
+    def _blob_key(self, content_hash: str) -> str:
+        """按当前目录分层配置计算内容哈希对应的blob存储键"""
+        width = self.fanout_width
+        prefixes = [content_hash[i * width:(i + 1) * width] for i in range(self.fanout_levels)]
+        return '/'.join(['blobs'] + prefixes + [content_hash])
+    
+    def _blob_path(self, content_hash: str) -> str:
+        """按当前目录分层配置计算内容哈希对应的blob位置(保存在文件记录中)"""
+        return self.backend.locate(self._blob_key(content_hash))
+    
+    def _acquire_blob(self, temp_path: str, content_hash: str, size: int) -> str:
+        """
+        为刚写入的临时文件获取blob引用(在当前事务中，由调用方提交)
+        
+        内容已存在时只增加引用计数并删除临时文件，否则把临时文件存入存储后端。
+        已存在的blob沿用其记录的存储键，目录分层配置变更前写入的blob不受影响。
+        先在当前事务中持有blob记录再写入文件，与 _remove_orphan_blob 互斥。
+        
+        Returns:
+            blob位置
+        """
+        from app.models import FileBlob
+        
+        # 原子地增加引用计数，ref_count为0的blob正在被删除，不能复用
+        updated = db.session.execute(
+            db.update(FileBlob)
+            .where(FileBlob.content_hash == content_hash, FileBlob.ref_count > 0)
+            .values(ref_count=FileBlob.ref_count + 1)
+        ).rowcount
+        if not updated:
+            try:
+                with db.session.begin_nested():
+                    db.session.add(FileBlob(content_hash=content_hash, storage_key=self._blob_key(content_hash),
+                                            size=size, ref_count=1))
+            except IntegrityError:
+                # 其他请求同时写入了相同内容
+                db.session.execute(
+                    db.update(FileBlob)
+                    .where(FileBlob.content_hash == content_hash)
+                    .values(ref_count=FileBlob.ref_count + 1)
+                )
+                updated = True
+        
+        storage_key = db.session.execute(
+            db.select(FileBlob.storage_key).where(FileBlob.content_hash == content_hash)
+        ).scalar_one()
+        if updated and self.backend.exists(storage_key):
+            os.remove(temp_path)
+        else:
+            self.backend.put_file(storage_key, temp_path)
+        return self.backend.locate(storage_key)
+    
+    def _is_blob_backed(self, stored_file) -> bool:
+        """文件记录是否引用blob(早期上传的文件保存在用户目录中)"""
+        if not stored_file.content_hash:
+            return False
+        key = self.backend.key_for(stored_file.file_path)
+        return key is not None and key.startswith('blobs/')
+    
+    def _release_blob(self, stored_file) -> Optional[str]:
+        """
+        释放文件记录对blob的引用(在当前事务中，由调用方提交)
         
+        Returns:
+            引用计数归零、提交后需要删除的blob文件路径，或None
+        """
+        from app.models import FileBlob
+        if not self._is_blob_backed(stored_file):
+            return None
+        
+        db.session.execute(
+            db.update(FileBlob)
+            .where(FileBlob.content_hash == stored_file.content_hash)
+            .values(ref_count=FileBlob.ref_count - 1)
+        )
+        deleted = db.session.execute(
+            db.delete(FileBlob)
+            .where(FileBlob.content_hash == stored_file.content_hash, FileBlob.ref_count <= 0)
+        ).rowcount
+        return stored_file.file_path if deleted else None
+    
+    def _remove_orphan_blob(self, blob_path: str, content_hash: str):
+        """
+        提交后删除已无引用的blob文件(期间被重新上传的内容保留)
+        
+        上传在写入文件前必须先持有同一内容哈希的记录，因此先插入引用计数为0的占位记录再删除文件：
+        插入失败说明内容已被重新引用，保留文件；删除期间上传相同内容的请求等本事务结束后才写入文件。
+        """
+        from app.models import FileBlob
+        key = self.backend.key_for(blob_path)
+        if key is None:
+            return
+        placeholder = FileBlob(content_hash=content_hash, storage_key=key, size=0, ref_count=0)
         try:
-            # 生成唯一文件名
-            original_filename = file.filename
-            unique_filename = self._generate_unique_filename(original_filename)
-            
-            # 创建用户专属目录
-            user_folder = os.path.join(self.upload_folder, str(user.id))
-            os.makedirs(user_folder, exist_ok=True)
-            
-            # 保存文件
-            file_path = os.path.join(user_folder, unique_filename)
-            file.save(file_path)
-            
-            # 获取文件信息
-            file_size = os.path.getsize(file_path)
-            file_type = file.content_type or 'application/octet-stream'
+            db.session.add(placeholder)
+            db.session.flush()
+        except IntegrityError:
+            db.session.rollback()
+            return
+        try:
+            self.backend.delete(key)
+        finally:
+            db.session.delete(placeholder)
+            db.session.commit()
+    
+    def _ensure_usage_row(self, user_id: int) -> bool:
+        """用户没有用量汇总时按已有文件回填，返回是否新建(由调用方提交)"""
+        from app.models import StoredFile, UserStorageUsage
+        
+        if db.session.get(UserStorageUsage, user_id) is not None:
+            return False
+        rows = db.session.query(
+            StoredFile.file_type,
+            db.func.count(StoredFile.id),
+            db.func.coalesce(db.func.sum(StoredFile.file_size), 0),
+            db.func.coalesce(db.func.sum(StoredFile.download_count), 0)
+        ).filter(StoredFile.user_id == user_id).group_by(StoredFile.file_type).all()
+        usage = UserStorageUsage(user_id=user_id, file_count=0, total_size=0, total_downloads=0, type_counts={})
+        for file_type, count, size, downloads in rows:
+            usage.file_count += count
+            usage.total_size += size
+            usage.total_downloads += downloads
+            major_type = self._major_type(file_type)
+            usage.type_counts[major_type] = usage.type_counts.get(major_type, 0) + count
+        try:
+            with db.session.begin_nested():
+                db.session.add(usage)
+            return True
+        except IntegrityError:
+            # 并发请求已创建
+            return False
+    
+    @staticmethod
+    def _major_type(file_type: str) -> str:
+        """文件类型分布按主类型统计(如 text/plain -> text)"""
+        return file_type.split('/')[0] if '/' in file_type else file_type
+    
+    def _update_type_count(self, user_id: int, file_type: str, delta: int):
+        """
+        更新用量汇总中的类型分布(调用方已在当前事务中更新过汇总行)
+        
+        之前的 UPDATE 已锁定汇总行，并发上传和删除在本事务结束前等待，读出后写回不会丢失更新。
+        """
+        from app.models import UserStorageUsage
+        
+        table = UserStorageUsage.__table__
+        type_counts = dict(db.session.execute(
+            db.select(table.c.type_counts).where(table.c.user_id == user_id)
+        ).scalar_one() or {})
+        major_type = self._major_type(file_type)
+        type_counts[major_type] = type_counts.get(major_type, 0) + delta
+        if type_counts[major_type] <= 0:
+            del type_counts[major_type]
+        db.session.execute(table.update().where(table.c.user_id == user_id).values(type_counts=type_counts))
+    
+    def _reserve_usage(self, user_id: int, file_size: int, file_type: str):
+        """
+        在用量汇总中计入新文件(随文件记录一起提交)
+        
+        使用带配额条件的原子更新，并发上传不会超出配额。
+        
+        Raises:
+            ValueError: 超出存储配额或文件数限制
+        """
+        from app.models import UserStorageUsage
+        
+        self._ensure_usage_row(user_id)
+        table = UserStorageUsage.__table__
+        statement = table.update().where(table.c.user_id == user_id).values(
+            file_count=table.c.file_count + 1,
+            total_size=table.c.total_size + file_size,
+            updated_at=datetime.utcnow()
+        )
+        if self.quota_bytes is not None:
+            statement = statement.where(table.c.total_size + file_size <= self.quota_bytes)
+        if self.max_files is not None:
+            statement = statement.where(table.c.file_count + 1 <= self.max_files)
+        
+        if db.session.execute(statement).rowcount == 0:
+            usage = self._get_usage(user_id)
+            if self.max_files is not None and usage['file_count'] + 1 > self.max_files:
+                raise ValueError(f"文件数量已达上限（{self.max_files}个）")
+            raise ValueError(f"存储空间不足，已使用 {usage['total_size']} 字节，配额 {self.quota_bytes} 字节")
+        self._update_type_count(user_id, file_type, 1)
+    
+    def _release_usage(self, stored_file):
+        """从用量汇总中扣除文件(随删除一起提交)"""
+        from app.models import UserStorageUsage
+        
+        table = UserStorageUsage.__table__
+        if db.session.execute(table.update().where(table.c.user_id == stored_file.user_id).values(
+            file_count=table.c.file_count - 1,
+            total_size=table.c.total_size - stored_file.file_size,
+            total_downloads=table.c.total_downloads - (stored_file.download_count or 0),
+            updated_at=datetime.utcnow()
+        )).rowcount:
+            self._update_type_count(stored_file.user_id, stored_file.file_type, -1)
+    
+    def _get_usage_row(self, user_id: int):
+        """获取用户用量汇总记录(一次主键查询)"""
+        from app.models import UserStorageUsage
+        
+        usage = db.session.get(UserStorageUsage, user_id, populate_existing=True)
+        if usage is None:
+            if self._ensure_usage_row(user_id):
+                db.session.commit()
+            usage = db.session.get(UserStorageUsage, user_id, populate_existing=True)
+        return usage
+    
+    def _get_usage(self, user_id: int) -> Dict[str, Any]:
+        """获取用户存储用量(一次主键查询)"""
+        usage = self._get_usage_row(user_id)
+        return {
+            'file_count': usage.file_count,
+            'total_size': usage.total_size,
+            'quota_bytes': self.quota_bytes,
+            'max_files': self.max_files
+        }
+    
+    def _save_file(self, stream: BinaryIO, user: User, original_filename: str,
+                   file_type: str, description: str) -> Dict[str, Any]:
+        """
+        将数据流保存为用户文件并创建文件记录
+        
+        数据先写入暂存目录，再按内容哈希存入blob；相同内容只保存一份，重复上传只增加一条记录。
+        """
+        os.makedirs(self.staging_folder, exist_ok=True)
+        temp_path = os.path.join(self.staging_folder, f"tmp-{uuid.uuid4().hex}")
+        blob_path = None
+        try:
+            # 分块写入文件，同时计算大小和哈希
+            file_size, content_hash = self._write_stream(stream, temp_path)
+            # 先在用量汇总中占用配额，超出配额时不会创建blob
+            self._reserve_usage(user.id, file_size, file_type)
+            blob_path = self._acquire_blob(temp_path, content_hash, file_size)
             
             # 创建文件记录
             from app.models import StoredFile
             stored_file = StoredFile(
                 user_id=user.id,
                 original_filename=original_filename,
-                stored_filename=unique_filename,
-                file_path=file_path,
+                stored_filename=content_hash,
+                file_path=blob_path,
                 file_size=file_size,
                 file_type=file_type,
+                content_hash=content_hash,
                 description=description
             )
             
@@ -93,60 +463,413 @@ class StorageService:
                 'filename': original_filename,
                 'file_size': file_size,
                 'file_type': file_type,
+                'content_hash': content_hash,
                 'upload_time': stored_file.upload_time
             }
             
         except Exception as e:
             db.session.rollback()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            if blob_path:
+                self._remove_orphan_blob(blob_path, content_hash)
             raise e
     
+    # ---- 分片上传(可断点续传) ----
+    
+    def _session_folder(self, upload_id: str) -> str:
+        """获取上传会话的暂存目录"""
+        if not upload_id or len(upload_id) != 32 or not all(c in '0123456789abcdef' for c in upload_id):
+            raise ValueError("无效的上传会话ID")
+        return os.path.join(self.staging_folder, upload_id)
+    
+    def _load_session(self, upload_id: str, user: User) -> Tuple[str, Dict[str, Any]]:
+        """读取上传会话并校验所属用户"""
+        session_folder = self._session_folder(upload_id)
+        try:
+            with open(os.path.join(session_folder, 'session.json'), 'r', encoding='utf-8') as f:
+                session = json.load(f)
+        except FileNotFoundError:
+            raise ValueError("上传会话不存在或已过期")
+        
+        if session['user_id'] != user.id:
+            raise ValueError("无权限操作此上传会话")
+        return session_folder, session
+    
+    def _list_parts(self, session_folder: str) -> Dict[int, str]:
+        """列出会话中已上传的分片 {序号: 路径}"""
+        parts = {}
+        for name in os.listdir(session_folder):
+            if name.startswith('part-') and not name.endswith('.part'):
+                parts[int(name[5:])] = os.path.join(session_folder, name)
+        return parts
+    
+    def initiate_upload_session(self, user: User, filename: str, content_type: Optional[str] = None,
+                                description: str = "") -> Dict[str, Any]:
+        """
+        创建分片上传会话
+        
+        会话状态保存在暂存目录中，多个工作进程可以共同处理同一个会话。
+        
+        Args:
+            user: 上传用户
+            filename: 原始文件名
+            content_type: 文件MIME类型
+            description: 文件描述
+        
+        Returns:
+            会话信息(upload_id 等)
+        """
+        if not filename:
+            raise ValueError("没有选择文件")
+        
+        if not self._allowed_file(filename):
+            raise ValueError(f"不支持的文件类型，支持的类型：{', '.join(self.allowed_extensions)}")
+        
+        # 顺带清理过期的会话
+        self.cleanup_stale_upload_sessions()
+        
+        upload_id = uuid.uuid4().hex
+        session_folder = self._session_folder(upload_id)
+        os.makedirs(session_folder)
+        
+        session = {
+            'upload_id': upload_id,
+            'user_id': user.id,
+            'filename': filename,
+            'content_type': content_type or 'application/octet-stream',
+            'description': description,
+            'created_at': datetime.utcnow().isoformat()
+        }
+        with open(os.path.join(session_folder, 'session.json'), 'w', encoding='utf-8') as f:
+            json.dump(session, f)
+        
+        return {
+            'upload_id': upload_id,
+            'max_file_size': self.max_file_size,
+            'max_parts': self.max_upload_parts,
+            'expires_in': self.upload_session_ttl
+        }
+    
+    def upload_part(self, upload_id: str, user: User, index: int, stream: BinaryIO) -> Dict[str, Any]:
+        """
+        上传一个分片，同一序号重复上传时覆盖之前的内容
+        
+        Args:
+            upload_id: 上传会话ID
+            user: 上传用户
+            index: 分片序号(从0开始)
+            stream: 分片数据流
+        
+        Returns:
+            分片信息
+        """
+        session_folder, _ = self._load_session(upload_id, user)
+        
+        if index < 0 or index >= self.max_upload_parts:
+            raise ValueError(f"分片序号应在 0 到 {self.max_upload_parts - 1} 之间")
+        
+        size, content_hash = self._write_stream(stream, os.path.join(session_folder, f'part-{index:05d}'))
+        
+        # 已上传分片总大小不能超过文件大小限制
+        total = sum(os.path.getsize(path) for path in self._list_parts(session_folder).values())
+        if total > self.max_file_size:
+            os.remove(os.path.join(session_folder, f'part-{index:05d}'))
+            raise ValueError(self._size_limit_message())
+        
+        return {'index': index, 'size': size, 'sha256': content_hash}
+    
+    def get_upload_session(self, upload_id: str, user: User) -> Dict[str, Any]:
+        """获取上传会话状态(用于断点续传时查询已上传的分片)"""
+        session_folder, session = self._load_session(upload_id, user)
+        parts = self._list_parts(session_folder)
+        return {
+            'upload_id': upload_id,
+            'filename': session['filename'],
+            'parts': [{'index': index, 'size': os.path.getsize(path)} for index, path in sorted(parts.items())]
+        }
+    
+    def complete_upload_session(self, upload_id: str, user: User) -> Dict[str, Any]:
+        """
+        完成分片上传：按序号流式拼接所有分片并创建文件记录
+        
+        分片序号必须从0开始连续；拼接过程不把文件读入内存。
+        
+        Args:
+            upload_id: 上传会话ID
+            user: 上传用户
+        
+        Returns:
+            上传结果字典
+        """
+        session_folder, session = self._load_session(upload_id, user)
+        parts = self._list_parts(session_folder)
+        
+        if not parts:
+            raise ValueError("没有已上传的分片")
+        if sorted(parts) != list(range(len(parts))):
+            missing = sorted(set(range(max(parts) + 1)) - set(parts))
+            raise ValueError(f"缺少分片: {missing}")
+        
+        with _ConcatenatedReader([parts[index] for index in range(len(parts))]) as stream:
+            result = self._save_file(stream, user, session['filename'],
+                                     session['content_type'], session['description'])
+        
+        shutil.rmtree(session_folder, ignore_errors=True)
+        return result
+    
+    def abort_upload_session(self, upload_id: str, user: User) -> bool:
+        """取消上传会话并删除已上传的分片"""
+        session_folder, _ = self._load_session(upload_id, user)
+        shutil.rmtree(session_folder, ignore_errors=True)
+        return True
+    
+    def cleanup_stale_upload_sessions(self, max_age: Optional[float] = None) -> int:
+        """
+        清理长时间没有活动的上传会话和遗留的临时文件
+        
+        Args:
+            max_age: 最长空闲时间(秒)，默认为 upload_session_ttl
+        
+        Returns:
+            清理的会话数量
+        """
+        max_age = self.upload_session_ttl if max_age is None else max_age
+        deadline = time.time() - max_age
+        removed = 0
+        
+        if not os.path.isdir(self.staging_folder):
+            return 0
+        
+        for entry in os.scandir(self.staging_folder):
+            # 目录的修改时间在每次写入分片时更新
+            if entry.stat().st_mtime >= deadline:
+                continue
+            if entry.is_dir():
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                # 异常中断遗留的上传临时文件
+                os.remove(entry.path)
+            removed += 1
+        return removed
+    
+    # ---- 存储布局迁移 ----
+    
+    def _hash_file(self, file_path: str) -> Tuple[int, str]:
+        """分块计算已有文件的大小和SHA-256"""
+        hasher = hashlib.sha256()
+        size = 0
+        with open(file_path, 'rb') as f:
+            while True:
+                chunk = f.read(self.chunk_size)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                size += len(chunk)
+        return size, hasher.hexdigest()
+    
+    def _migrate_legacy_file(self, stored_file) -> bool:
+        """
+        把不在当前存储后端中的文件存入blob存储并改写文件记录
+        
+        包括用户目录中的早期文件，以及切换存储后端前保存在本地磁盘上的blob
+        (其引用计数已包含本记录，只需复制内容)。文件先硬链接(不支持时复制)到暂存目录
+        再存入后端，提交成功且没有其他记录引用时才删除原文件。
+        
+        Returns:
+            内容是否已存在(去重)
+        """
+        from app.models import FileBlob, StoredFile
+        
+        legacy_path = stored_file.file_path
+        file_size, content_hash = self._hash_file(legacy_path)
+        blob = FileBlob.query.filter_by(content_hash=content_hash).first()
+        local_key = LocalStorageBackend(self.upload_folder).key_for(legacy_path)
+        local_blob = blob is not None and local_key is not None and local_key == blob.storage_key
+        
+        os.makedirs(self.staging_folder, exist_ok=True)
+        temp_path = os.path.join(self.staging_folder, f"tmp-{uuid.uuid4().hex}")
+        blob_path = None
+        try:
+            try:
+                os.link(legacy_path, temp_path)
+            except OSError:
+                shutil.copyfile(legacy_path, temp_path)
+            if local_blob:
+                if self.backend.exists(blob.storage_key):
+                    os.remove(temp_path)
+                else:
+                    self.backend.put_file(blob.storage_key, temp_path)
+                stored_file.file_path = self.backend.locate(blob.storage_key)
+            else:
+                blob_path = self._acquire_blob(temp_path, content_hash, file_size)
+                stored_file.file_path = blob_path
+            stored_file.stored_filename = content_hash
+            stored_file.content_hash = content_hash
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            if blob_path:
+                self._remove_orphan_blob(blob_path, content_hash)
+            raise
+        
+        if StoredFile.query.filter_by(file_path=legacy_path).first() is None and legacy_path != stored_file.file_path:
+            os.remove(legacy_path)
+            prune_empty_dirs(os.path.dirname(legacy_path), self.upload_folder)
+        return blob is not None and not local_blob
+    
+    def _relocate_blob(self, blob) -> bool:
+        """
+        把按旧的目录分层配置存放的blob移动到当前布局并改写引用它的文件记录
+        
+        Returns:
+            是否移动了文件(文件缺失时返回False)
+        """
+        from app.models import StoredFile
+        
+        old_key = blob.storage_key
+        new_key = self._blob_key(blob.content_hash)
+        if not self.backend.exists(old_key):
+            return False
+        
+        self.backend.move(old_key, new_key)
+        try:
+            blob.storage_key = new_key
+            StoredFile.query.filter_by(content_hash=blob.content_hash, file_path=self.backend.locate(old_key))\
+                .update({'file_path': self.backend.locate(new_key)}, synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            self.backend.move(new_key, old_key)
+            raise
+        
+        return True
+    
+    def migrate_storage_layout(self, dry_run: bool = False) -> Dict[str, int]:
+        """
+        把已有文件迁移到当前的blob目录分层布局
+        
+        1. 用户目录(uploads/<user_id>/)中的早期文件按内容哈希存入blob，相同内容合并为一份；
+           切换到其他存储后端后，本地磁盘上的blob也会复制到新的后端；
+        2. 按旧的目录分层配置存放的blob移动到当前布局。
+        两种情况都会改写 StoredFile.file_path。每个文件单独提交，中断后可以重新执行。
+        迁移期间正在下载被移动文件的请求可能失败，建议在维护窗口执行。
+        
+        Args:
+            dry_run: 只统计需要迁移的文件，不做修改
+        
+        Returns:
+            迁移统计(legacy_files, deduplicated, relocated_blobs, missing, failed)
+        """
+        from app.models import StoredFile, FileBlob
+        
+        result = {'legacy_files': 0, 'deduplicated': 0, 'relocated_blobs': 0, 'missing': 0, 'failed': 0}
+        
+        # 先只查询判断所需的列，逐个迁移时再加载记录
+        rows = db.session.query(StoredFile.id, StoredFile.file_path, StoredFile.content_hash)\
+            .order_by(StoredFile.id).all()
+        legacy_ids = [row.id for row in rows if not self._is_blob_backed(row)]
+        for file_id in legacy_ids:
+            stored_file = db.session.get(StoredFile, file_id)
+            if stored_file is None:
+                continue
+            if not os.path.exists(stored_file.file_path):
+                result['missing'] += 1
+                continue
+            if dry_run:
+                result['legacy_files'] += 1
+                continue
+            try:
+                if self._migrate_legacy_file(stored_file):
+                    result['deduplicated'] += 1
+                result['legacy_files'] += 1
+            except Exception:
+                result['failed'] += 1
+        
+        rows = db.session.query(FileBlob.id, FileBlob.content_hash, FileBlob.storage_key)\
+            .order_by(FileBlob.id).all()
+        blob_ids = [row.id for row in rows if row.storage_key != self._blob_key(row.content_hash)]
+        for blob_id in blob_ids:
+            blob = db.session.get(FileBlob, blob_id)
+            if blob is None:
+                continue
+            if dry_run:
+                result['relocated_blobs'] += 1
+                continue
+            try:
+                if self._relocate_blob(blob):
+                    result['relocated_blobs'] += 1
+                else:
+                    result['missing'] += 1
+            except Exception:
+                result['failed'] += 1
+        
+        return result
+    
     def get_file_by_id(self, file_id: int) -> Optional[Any]:
         """根据ID获取文件记录"""
         from app.models import StoredFile
         return StoredFile.query.get(file_id)
     
-    def get_user_files(self, user: User, page: int = 1, per_page: int = 10) -> Dict[str, Any]:
+    def get_user_files(self, user: User, page: int = 1, per_page: int = 10,
+                       cursor: Optional[str] = None, include_total: bool = True) -> Dict[str, Any]:
         """
         获取用户的文件列表
         
+        传入 cursor(第一页传空字符串)时使用游标分页，按 (upload_time, id) 定位，
+        不受页码深度影响；否则使用页码分页。
+        
         Args:
             user: 用户对象
-            page: 页码
+            page: 页码(游标分页时忽略)
             per_page: 每页数量
+            cursor: 上一页返回的 next_cursor
+            include_total: 是否统计文件总数(关闭可省去一次COUNT查询)
         
         Returns:
             文件列表和分页信息
+        
+        Raises:
+            ValueError: 游标无效
         """
         from app.models import StoredFile
         
+        query = StoredFile.query.filter_by(user_id=user.id)
+        
         # 获取总数
-        total_files = StoredFile.query.filter_by(user_id=user.id).count()
+        total_files = query.count() if include_total else None
         
-        # 获取分页数据
-        files = StoredFile.query.filter_by(user_id=user.id)\
-            .order_by(StoredFile.upload_time.desc())\
-            .offset((page - 1) * per_page)\
-            .limit(per_page)\
-            .all()
+        if cursor is not None:
+            files, next_cursor = keyset_page(query, [StoredFile.upload_time, StoredFile.id], cursor, per_page)
+        else:
+            # 获取分页数据
+            files = query.order_by(StoredFile.upload_time.desc(), StoredFile.id.desc())\
+                .offset((page - 1) * per_page)\
+                .limit(per_page)\
+                .all()
+            next_cursor = None
         
         return {
             'files': files,
             'total': total_files,
             'page': page,
             'per_page': per_page,
-            'total_pages': (total_files + per_page - 1) // per_page
+            'total_pages': (total_files + per_page - 1) // per_page if include_total else None,
+            'next_cursor': next_cursor
         }
     
-    def download_file(self, file_id: int, user: User) -> Optional[str]:
+    def get_downloadable_file(self, file_id: int, user: User) -> Optional[Any]:
         """
-        下载文件
+        获取可下载的文件记录(一次查询完成权限和存在性校验)
         
         Args:
             file_id: 文件ID
             user: 用户对象
         
         Returns:
-            文件路径或None（如果文件不存在或无权限）
+            StoredFile对象或None（如果文件不存在或无权限）
         """
         stored_file = self.get_file_by_id(file_id)
         
@@ -156,10 +879,86 @@ class StorageService:
         if stored_file.user_id != user.id:
             return None
         
-        if not os.path.exists(stored_file.file_path):
+        # 远程存储不在这里检查，避免每次下载多一次请求；对象缺失时读取会失败
+        local_path = self.get_local_path(stored_file)
+        if local_path is not None and not os.path.exists(local_path):
             return None
         
-        return stored_file.file_path
+        return stored_file
+    
+    def get_local_path(self, stored_file) -> Optional[str]:
+        """
+        获取文件在本机磁盘上的路径
+        
+        Returns:
+            文件路径，文件保存在远程存储中时返回None
+        """
+        key = self.backend.key_for(stored_file.file_path)
+        if key is None:
+            # 早期上传、保存在用户目录中的本地文件
+            return stored_file.file_path
+        return self.backend.local_path(key)
+    
+    def stream_file(self, stored_file, start: int = 0, stop: Optional[int] = None) -> Iterator[bytes]:
+        """
+        分块读取文件内容(开始迭代时才打开文件)
+        
+        Args:
+            stored_file: 文件记录
+            start: 起始字节
+            stop: 结束字节(不含)，None 表示到文件末尾；对象存储只下载这一部分
+        """
+        remaining = None if stop is None else stop - start
+        if remaining is not None and remaining <= 0:
+            return
+        local_path = self.get_local_path(stored_file)
+        if local_path is not None:
+            stream = open(local_path, 'rb')
+            stream.seek(start)
+        else:
+            stream = self.backend.open(self.backend.key_for(stored_file.file_path), start, stop)
+        with stream:
+            while remaining is None or remaining > 0:
+                chunk = stream.read(self.chunk_size if remaining is None else min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+    
+    def get_delivery_headers(self, stored_file) -> Optional[Dict[str, str]]:
+        """
+        获取交给前端代理发送文件的内部重定向响应头
+        
+        Args:
+            stored_file: 已通过权限校验的文件记录
+        
+        Returns:
+            响应头字典，direct 模式下返回None
+        """
+        if self.delivery_mode == 'x-accel-redirect':
+            # 存储键与上传目录下的相对路径一致，使用对象存储时由 nginx 反向代理到存储桶
+            key = self.backend.key_for(stored_file.file_path)
+            if key is None:
+                key = os.path.relpath(stored_file.file_path, self.upload_folder).replace(os.sep, '/')
+            return {'X-Accel-Redirect': self.accel_redirect_prefix + url_quote(key)}
+        if self.delivery_mode == 'x-sendfile':
+            return {'X-Sendfile': os.path.abspath(self.get_local_path(stored_file))}
+        return None
+    
+    def download_file(self, file_id: int, user: User) -> Optional[str]:
+        """
+        下载文件
+        
+        Args:
+            file_id: 文件ID
+            user: 用户对象
+        
+        Returns:
+            文件路径或None（如果文件不存在或无权限）
+        """
+        stored_file = self.get_downloadable_file(file_id, user)
+        return stored_file.file_path if stored_file else None
     
     def delete_file(self, file_id: int, user: User) -> bool:
         """
@@ -181,13 +980,22 @@ class StorageService:
             if stored_file.user_id != user.id:
                 raise ValueError("无权限删除此文件")
             
-            # 删除物理文件
-            if os.path.exists(stored_file.file_path):
-                os.remove(stored_file.file_path)
-            
-            # 删除数据库记录
+            # 删除数据库记录，blob的引用计数在同一事务中减少
+            content_hash = stored_file.content_hash
+            file_path = stored_file.file_path
+            blob_backed = self._is_blob_backed(stored_file)
+            orphan_blob_path = self._release_blob(stored_file)
+            self._release_usage(stored_file)
             db.session.delete(stored_file)
             db.session.commit()
+            if download_counter is not None:
+                download_counter.discard(file_id)
+            
+            # 删除物理文件：blob只在最后一个引用删除后删除
+            if orphan_blob_path:
+                self._remove_orphan_blob(orphan_blob_path, content_hash)
+            elif not blob_backed and os.path.exists(file_path):
+                os.remove(file_path)
             
             return True
             
@@ -248,64 +1056,83 @@ class StorageService:
             'file_type': stored_file.file_type,
             'description': stored_file.description,
             'upload_time': stored_file.upload_time,
-            'download_count': stored_file.download_count
+            'download_count': self._merged_download_count(stored_file)
         }
     
+    def _merged_download_count(self, stored_file) -> int:
+        """数据库中的下载次数加上尚未写入的增量"""
+        pending = download_counter.pending(stored_file.id) if download_counter is not None else 0
+        return (stored_file.download_count or 0) + pending
+    
+    def files_to_dicts(self, files) -> List[Dict[str, Any]]:
+        """把文件记录转换为字典，下载次数包含尚未写入的增量"""
+        pending = download_counter.pending_many(f.id for f in files) if download_counter is not None else {}
+        result = []
+        for stored_file in files:
+            data = stored_file.to_dict()
+            data['download_count'] = (stored_file.download_count or 0) + pending.get(stored_file.id, 0)
+            result.append(data)
+        return result
+    
     def get_storage_stats(self, user: User) -> Dict[str, Any]:
         """
         获取用户存储统计信息
         
+        文件数、大小、下载次数和类型分布都读取用量汇总(一次主键查询)，与文件数量无关。
+        启用下载计数器时，尚未写入的下载次数在下次写入后计入。
+        
         Args:
             user: 用户对象
         
         Returns:
             存储统计信息
         """
-        from app.models import StoredFile
-        
-        # 获取用户所有文件
-        files = StoredFile.query.filter_by(user_id=user.id).all()
-        
-        total_files = len(files)
-        total_size = sum(f.file_size for f in files)
-        total_downloads = sum(f.download_count for f in files)
-        
-        # 计算文件类型分布
-        type_stats = {}
-        for file in files:
-            file_type = file.file_type.split('/')[0] if '/' in file.file_type else file.file_type
-            type_stats[file_type] = type_stats.get(file_type, 0) + 1
+        usage = self._get_usage_row(user.id)
         
         return {
-            'total_files': total_files,
-            'total_size': total_size,
-            'total_downloads': total_downloads,
-            'type_distribution': type_stats,
-            'storage_limit': self.max_file_size * 100,  # 假设每个用户最多100个文件
-            'storage_used': total_size
+            'total_files': usage.file_count,
+            'total_size': usage.total_size,
+            'total_downloads': usage.total_downloads,
+            'type_distribution': dict(usage.type_counts or {}),
+            'storage_limit': self.quota_bytes,
+            'file_limit': self.max_files,
+            'storage_used': usage.total_size
         }
     
     def increment_download_count(self, file_id: int) -> bool:
         """
         增加文件下载次数
         
+        启用计数器时只在内存中累加，由后台线程批量写入；
+        否则直接执行 download_count = download_count + 1 的原子更新。
+        
         Args:
-            file_id: 文件ID
+            file_id: 文件ID(调用方已校验文件存在)
         
         Returns:
             是否成功
         """
+        if download_counter is not None:
+            download_counter.increment(file_id)
+            return True
+        
+        from app.models import StoredFile, UserStorageUsage
+        
         try:
-            stored_file = self.get_file_by_id(file_id)
-            
-            if not stored_file:
-                return False
-            
-            stored_file.download_count += 1
+            result = db.session.execute(
+                db.update(StoredFile)
+                .where(StoredFile.id == file_id)
+                .values(download_count=db.func.coalesce(StoredFile.download_count, 0) + 1)
+                .execution_options(synchronize_session=False)
+            )
+            usage = UserStorageUsage.__table__
+            owner = db.select(StoredFile.user_id).where(StoredFile.id == file_id).scalar_subquery()
+            db.session.execute(usage.update().where(usage.c.user_id == owner)
+                               .values(total_downloads=usage.c.total_downloads + 1))
             db.session.commit()
             
-            return True
+            return result.rowcount > 0
             
         except Exception:
             db.session.rollback()
-            return False
\ No newline at end of file
+            return False
@@ -0,0 +1,330 @@
+import heapq
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional
+from app.models import db, RevokedToken
+from app.utils.bloom import BloomFilter
+
+
+class BlocklistStore:
+    """
+    已注销token的存储接口
+
+    条目按 jti 寻址，保存到 token 的过期时间(Unix 时间戳)为止；过期的 token 本身
+    已无法通过校验，条目随之可以删除。
+    """
+
+    name = None
+    # 是否在多个工作进程之间共享(共享存储在查询前使用布隆过滤器)
+    shared = True
+
+    def add(self, jti: str, expires_at: float):
+        """加入已注销的token"""
+        raise NotImplementedError
+
+    def contains(self, jti: str) -> bool:
+        """token是否已注销"""
+        raise NotImplementedError
+
+    def active(self) -> Iterable[str]:
+        """所有未过期的已注销token(用于重建布隆过滤器)"""
+        raise NotImplementedError
+
+    def purge_expired(self) -> int:
+        """删除过期条目，返回删除数量"""
+        return 0
+
+
+class MemoryBlocklistStore(BlocklistStore):
+    """进程内存储，只对当前工作进程生效(单进程部署和测试)"""
+
+    name = 'memory'
+    shared = False
+
+    def __init__(self):
+        self._entries: Dict[str, float] = {}
+        self._expiry_heap = []
+        self._lock = threading.Lock()
+
+    def add(self, jti: str, expires_at: float):
+        with self._lock:
+            self._purge(time.time())
+            self._entries[jti] = expires_at
+            heapq.heappush(self._expiry_heap, (expires_at, jti))
+
+    def contains(self, jti: str) -> bool:
+        expires_at = self._entries.get(jti)
+        return expires_at is not None and expires_at > time.time()
+
+    def active(self) -> Iterable[str]:
+        now = time.time()
+        with self._lock:
+            return [jti for jti, expires_at in self._entries.items() if expires_at > now]
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            return self._purge(time.time())
+
+    def _purge(self, now: float) -> int:
+        purged = 0
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            expires_at, jti = heapq.heappop(self._expiry_heap)
+            # 同一jti重复注销时以最后一次的过期时间为准
+            if self._entries.get(jti) == expires_at:
+                del self._entries[jti]
+                purged += 1
+        return purged
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DatabaseBlocklistStore(BlocklistStore):
+    """保存在 revoked_token 表中，所有工作进程共享"""
+
+    name = 'database'
+
+    def add(self, jti: str, expires_at: float):
+        try:
+            db.session.merge(RevokedToken(jti=jti, expires_at=_to_datetime(expires_at)))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def contains(self, jti: str) -> bool:
+        return db.session.query(RevokedToken.jti).filter_by(jti=jti).first() is not None
+
+    def active(self) -> Iterable[str]:
+        now = datetime.utcnow()
+        return [row.jti for row in db.session.query(RevokedToken.jti).filter(RevokedToken.expires_at > now)]
+
+    def purge_expired(self) -> int:
+        try:
+            purged = RevokedToken.query.filter(RevokedToken.expires_at <= datetime.utcnow()).delete()
+            db.session.commit()
+            return purged
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+class RedisBlocklistStore(BlocklistStore):
+    """
+    保存在 Redis 中，所有工作进程和节点共享
+
+    每个token一个带过期时间的键用于查询，另有一个按过期时间排序的有序集合用于重建布隆过滤器。
+    """
+
+    name = 'redis'
+
+    def __init__(self, client, prefix: str = 'revoked-token:'):
+        """
+        初始化存储
+
+        Args:
+            client: redis-py 兼容的客户端(测试时可使用 tests.fake_redis.FakeRedis)
+            prefix: 键前缀
+        """
+        self.client = client
+        self.prefix = prefix
+        self.index_key = prefix + 'index'
+
+    def add(self, jti: str, expires_at: float):
+        ttl = max(1, int(expires_at - time.time()) + 1)
+        self.client.set(self.prefix + jti, 1, ex=ttl)
+        self.client.zadd(self.index_key, {jti: expires_at})
+
+    def contains(self, jti: str) -> bool:
+        return self.client.exists(self.prefix + jti) > 0
+
+    def active(self) -> Iterable[str]:
+        members = self.client.zrangebyscore(self.index_key, time.time(), '+inf')
+        return [member.decode('utf-8') if isinstance(member, bytes) else member for member in members]
+
+    def purge_expired(self) -> int:
+        # 查询用的键由 Redis 自动过期，这里只清理有序集合
+        return self.client.zremrangebyscore(self.index_key, '-inf', time.time())
+
+
+class TokenBlocklist:
+    """
+    JWT黑名单
+
+    共享存储前有一个进程内的布隆过滤器：绝大多数请求的token没有注销，
+    过滤器判断"一定不在黑名单"后直接放行，不访问存储；判断"可能在"时查询存储确认。
+    过滤器由后台线程每隔 sync_interval 秒按存储重建一次(同时定期清理过期条目)，请求线程
+    不执行重建和清理。因此在其他工作进程注销的token最多延迟 sync_interval 秒生效，
+    在当前进程注销的token立即生效；第一次重建完成前每次都查询存储。
+    """
+
+    # 清理过期条目的间隔(秒)
+    PURGE_INTERVAL = 300
+
+    def __init__(self, store: BlocklistStore, sync_interval: float = 5, error_rate: float = 0.001, app=None):
+        """
+        初始化黑名单
+
+        Args:
+            store: 存储
+            sync_interval: 布隆过滤器重建间隔(秒)，0 表示不使用过滤器，每次都查询存储
+            error_rate: 布隆过滤器误判率
+            app: Flask 应用(后台线程访问数据库存储时使用其应用上下文)
+        """
+        self.store = store
+        self.app = app
+        self.sync_interval = sync_interval
+        self.error_rate = error_rate
+        self.use_filter = store.shared and sync_interval > 0
+        self._filter: Optional[BloomFilter] = None
+        self._recent: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._next_purge = 0.0
+        self.checks = 0
+        self.filter_passes = 0
+        self.store_lookups = 0
+        self.syncs = 0
+        self.sync_errors = 0
+
+    def revoke(self, jti: str, expires_at: float):
+        """
+        注销token
+
+        Args:
+            jti: token ID
+            expires_at: token过期时间(Unix 时间戳)
+        """
+        self.store.add(jti, expires_at)
+        if self.use_filter:
+            with self._lock:
+                # 重建过滤器期间注销的token也要加入新的过滤器
+                self._recent[jti] = expires_at
+                if self._filter is not None:
+                    self._filter.add(jti)
+
+    def is_revoked(self, jti: str) -> bool:
+        """token是否已注销"""
+        self.checks += 1
+        if self.use_filter:
+            self._ensure_started()
+            bloom = self._filter
+            if bloom is not None and jti not in bloom:
+                self.filter_passes += 1
+                return False
+        self.store_lookups += 1
+        return self.store.contains(jti)
+
+    def sync(self):
+        """按存储重建布隆过滤器"""
+        now = time.time()
+        if now >= self._next_purge:
+            self.store.purge_expired()
+            self._next_purge = now + self.PURGE_INTERVAL
+
+        jtis = list(self.store.active())
+        with self._lock:
+            self._recent = {jti: expires_at for jti, expires_at in self._recent.items() if expires_at > now}
+            bloom = BloomFilter(capacity=max(1024, 2 * (len(jtis) + len(self._recent))), error_rate=self.error_rate)
+            bloom.update(jtis)
+            bloom.update(self._recent)
+            self._filter = bloom
+        self.syncs += 1
+
+    def stop(self):
+        """停止后台重建线程"""
+        self._stop_event.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(5)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取黑名单统计信息"""
+        bloom = self._filter
+        return {
+            'store': self.store.name,
+            'filter_entries': bloom.count if bloom is not None else None,
+            'checks': self.checks,
+            'filter_passes': self.filter_passes,
+            'store_lookups': self.store_lookups,
+            'syncs': self.syncs,
+            'sync_errors': self.sync_errors
+        }
+
+    def _running(self) -> bool:
+        return (self._thread is not None and self._thread.is_alive() and not self._stop_event.is_set()
+                and self._pid == os.getpid())
+
+    def _ensure_started(self):
+        # 按进程启动后台线程，避免 fork 之后线程丢失(如 gunicorn --preload)
+        if self._running():
+            return
+        with self._start_lock:
+            if self._running():
+                return
+            self._pid = os.getpid()
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name='token-blocklist-sync', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                if self.app is not None:
+                    with self.app.app_context():
+                        try:
+                            self.sync()
+                        finally:
+                            db.session.remove()
+                else:
+                    self.sync()
+            except Exception:
+                # 重建失败时保留原来的过滤器；没有过滤器时直接查询存储
+                self.sync_errors += 1
+            if self._stop_event.wait(self.sync_interval):
+                return
+
+
+def create_token_blocklist(config, redis_client=None, app=None) -> TokenBlocklist:
+    """
+    根据应用配置创建JWT黑名单
+
+    Args:
+        config: 应用配置
+        redis_client: 使用 redis 存储时的客户端，不传时按 TOKEN_BLOCKLIST_REDIS_URL 创建
+        app: Flask 应用(使用数据库存储时后台线程需要)
+
+    Returns:
+        JWT黑名单
+
+    Raises:
+        ValueError: 不支持的存储或缺少依赖
+    """
+    backend_name = config.get('TOKEN_BLOCKLIST_BACKEND', 'database')
+    if backend_name == 'memory':
+        store = MemoryBlocklistStore()
+    elif backend_name == 'database':
+        store = DatabaseBlocklistStore()
+    elif backend_name == 'redis':
+        if redis_client is None:
+            url = config.get('TOKEN_BLOCKLIST_REDIS_URL')
+            if not url:
+                raise ValueError("使用Redis存储token黑名单时必须配置 TOKEN_BLOCKLIST_REDIS_URL")
+            try:
+                import redis
+            except ImportError:
+                raise ValueError("使用Redis存储token黑名单需要安装 redis 包")
+            redis_client = redis.Redis.from_url(url)
+        store = RedisBlocklistStore(redis_client, prefix=config.get('TOKEN_BLOCKLIST_REDIS_PREFIX', 'revoked-token:'))
+    else:
+        raise ValueError(f"不支持的token黑名单存储: {backend_name}")
+    return TokenBlocklist(store, sync_interval=config.get('TOKEN_BLOCKLIST_SYNC_SECONDS', 5), app=app)
+
+
+def _to_datetime(timestamp: float) -> datetime:
+    """Unix 时间戳转换为数据库中使用的 UTC 时间(不带时区)"""
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
@@ -1,8 +1,68 @@
-import bcrypt
-from app.models import db, User
+from sqlalchemy.orm import make_transient_to_detached
+from app.models import db, User, UserStorageUsage, UserVariableVersion
+from app.utils.cache import LRUCache
+from app.utils.password_hasher import PasswordHasher, PasswordHasherBusy
 from typing import Optional, Dict, Any
 
+# 用户记录缓存(按用户ID缓存列值快照，已认证请求不再查询用户表)
+user_cache = LRUCache(max_entries=10000, ttl=30)
+
+# 密码哈希计算线程池(bcrypt 不在请求线程中执行)
+password_hasher = PasswordHasher()
+
 class UserService:
+    @staticmethod
+    def init_app(app):
+        """根据应用配置初始化用户记录缓存和密码哈希线程池"""
+        global user_cache, password_hasher
+        user_cache = LRUCache(
+            max_entries=app.config.get('USER_CACHE_MAX_ENTRIES', 10000),
+            ttl=app.config.get('USER_CACHE_TTL', 30)
+        )
+        password_hasher.shutdown()
+        password_hasher = PasswordHasher(
+            rounds=app.config.get('BCRYPT_LOG_ROUNDS', 12),
+            max_workers=app.config.get('PASSWORD_HASH_WORKERS', 2),
+            max_pending=app.config.get('PASSWORD_HASH_MAX_PENDING', 16),
+            timeout=app.config.get('PASSWORD_HASH_TIMEOUT', 5),
+            retry_after=app.config.get('PASSWORD_HASH_RETRY_AFTER', 1)
+        )
+    
+    @staticmethod
+    def get_password_hasher_stats() -> Dict[str, Any]:
+        """获取密码哈希线程池统计信息"""
+        return password_hasher.stats()
+    
+    @staticmethod
+    def get_cached_user(user_id: int) -> Optional[User]:
+        """
+        根据ID获取用户，优先使用缓存
+        
+        缓存命中时由列值快照还原对象并关联到当前会话，不查询数据库；
+        还原的对象可以正常修改和提交。
+        
+        Args:
+            user_id: 用户ID
+        
+        Returns:
+            User对象或None
+        """
+        snapshot = user_cache.get(user_id)
+        if snapshot is not None:
+            user = User(**snapshot)
+            make_transient_to_detached(user)
+            return db.session.merge(user, load=False)
+        
+        user = db.session.get(User, user_id)
+        if user is not None:
+            user_cache.set(user_id, {column.key: getattr(user, column.key) for column in User.__table__.columns})
+        return user
+    
+    @staticmethod
+    def invalidate_cached_user(user_id: int):
+        """用户信息变更后删除缓存"""
+        user_cache.delete(user_id)
+    
     @staticmethod
     def create_user(username: str, password: str, role: str = 'user', **kwargs) -> Optional[User]:
         """
@@ -16,13 +76,16 @@ class UserService:
         
         Returns:
             User对象或None(如果用户名已存在)
+        
+        Raises:
+            PasswordHasherBusy: 密码哈希线程池繁忙
         """
         if UserService.get_user_by_username(username):
             return None
         
         new_user = User(
             username=username,
-            password=bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()),
+            password=password_hasher.hash(password),
             role=role,
             **kwargs
         )
@@ -74,6 +137,7 @@ class UserService:
                     setattr(user, key, value)
             
             db.session.commit()
+            UserService.invalidate_cached_user(user.id)
             return True
         except Exception as e:
             db.session.rollback()
@@ -91,16 +155,21 @@ class UserService:
         
         Returns:
             是否修改成功
-        """
-        if not bcrypt.checkpw(current_password.encode('utf-8'), user.password):
-            raise ValueError("当前密码错误")
         
+        Raises:
+            ValueError: 当前密码错误或新密码不符合要求
+            PasswordHasherBusy: 密码哈希线程池繁忙
+        """
         if len(new_password) < 6:
             raise ValueError("新密码长度至少6位")
         
+        if not password_hasher.verify(current_password, user.password):
+            raise ValueError("当前密码错误")
+        
         try:
-            user.password = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt())
+            user.password = password_hasher.hash(new_password)
             db.session.commit()
+            UserService.invalidate_cached_user(user.id)
             return True
         except Exception as e:
             db.session.rollback()
@@ -108,15 +177,44 @@ class UserService:
     
     @staticmethod
     def verify_password(user: User, password: str) -> bool:
-        """验证用户密码"""
-        return bcrypt.checkpw(password.encode('utf-8'), user.password)
+        """验证用户密码(在密码哈希线程池中执行，繁忙时抛出 PasswordHasherBusy)"""
+        return password_hasher.verify(password, user.password)
+    
+    @staticmethod
+    def rehash_password_if_needed(user: User, password: str) -> bool:
+        """
+        成本因子配置变更后，在用户登录成功时用新的成本因子重新计算哈希
+        
+        Args:
+            user: 已通过密码校验的用户
+            password: 明文密码
+        
+        Returns:
+            是否重新计算了哈希(线程池繁忙时跳过，下次登录再处理)
+        """
+        if not password_hasher.needs_rehash(user.password):
+            return False
+        try:
+            user.password = password_hasher.hash(password)
+            db.session.commit()
+        except PasswordHasherBusy:
+            return False
+        except Exception:
+            db.session.rollback()
+            raise
+        UserService.invalidate_cached_user(user.id)
+        return True
     
     @staticmethod
     def delete_user(user: User) -> bool:
         """删除用户"""
         try:
+            user_id = user.id
+            UserStorageUsage.query.filter_by(user_id=user_id).delete()
+            UserVariableVersion.query.filter_by(user_id=user_id).delete()
             db.session.delete(user)
             db.session.commit()
+            UserService.invalidate_cached_user(user_id)
             return True
         except Exception as e:
             db.session.rollback()
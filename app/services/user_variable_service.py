@@ -1,8 +1,34 @@
-from app.models import db, UserVariables
-from typing import Optional, List
+from sqlalchemy.exc import IntegrityError
+from app.models import db, UserVariables, UserVariableVersion
+from app.utils.cache import LRUCache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+def _snapshot_size(snapshot) -> int:
+    """Approximate size of a cached variable snapshot in bytes"""
+    return sum(len(variable['variable_name']) + len(variable['variable_value']) for variable in snapshot[1]) + 64
+
+
+# Per-user variable snapshots: user_id -> (version, variables as dicts ordered by id)
+variable_cache = LRUCache(max_entries=10000, ttl=None, sizeof=_snapshot_size)
+
+# Maximum number of changes accepted by one bulk request
+bulk_max_size = 500
 
 
 class UserVariableService:
+    @staticmethod
+    def init_app(app):
+        """Configure the variable cache from the application config"""
+        global variable_cache, bulk_max_size
+        variable_cache = LRUCache(
+            max_entries=app.config.get('VARIABLE_CACHE_MAX_ENTRIES', 10000),
+            max_bytes=app.config.get('VARIABLE_CACHE_MAX_BYTES', 64 * 1024 * 1024),
+            ttl=None,
+            sizeof=_snapshot_size
+        )
+        bulk_max_size = app.config.get('VARIABLE_BULK_MAX_SIZE', 500)
+    
     @staticmethod
     def create_variable(user_id: int, variable_name: str, variable_value: str) -> Optional[UserVariables]:
         """
@@ -16,18 +42,21 @@ class UserVariableService:
         Returns:
             UserVariables object or None (if variable already exists)
         """
-        # Check if a variable with the same name already exists
-        existing_variable = UserVariableService.get_variable_by_name(user_id, variable_name)
-        if existing_variable:
-            return None
-        
+        # The unique index on (user_id, variable_name) rejects duplicates, no existence query needed
         new_variable = UserVariables(
             user_id=user_id,
             variable_name=variable_name,
             variable_value=variable_value
         )
-        db.session.add(new_variable)
-        db.session.commit()
+        try:
+            db.session.add(new_variable)
+            db.session.flush()
+            UserVariableService._bump_version(user_id)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return None
+        UserVariableService.invalidate_cache(user_id)
         return new_variable
     
     @staticmethod
@@ -37,7 +66,7 @@ class UserVariableService:
         
         Args:
             variable_id: Variable ID
-            
+        
         Returns:
             UserVariables object or None
         """
@@ -51,7 +80,7 @@ class UserVariableService:
         Args:
             user_id: User ID
             variable_name: Variable name
-            
+        
         Returns:
             UserVariables object or None
         """
@@ -64,30 +93,109 @@ class UserVariableService:
         
         Args:
             user_id: User ID
-            
+        
         Returns:
             List of UserVariables objects
         """
         return UserVariables.query.filter_by(user_id=user_id).all()
     
     @staticmethod
-    def update_variable(variable_id: int, variable_value: str) -> Optional[UserVariables]:
+    def get_version(user_id: int) -> int:
         """
-        Update user variable value
+        Get the current version of a user's variables (one primary key lookup)
+        
+        Args:
+            user_id: User ID
+        
+        Returns:
+            Version number, 0 if the variables have never been modified
+        """
+        version = db.session.query(UserVariableVersion.version).filter_by(user_id=user_id).scalar()
+        return version or 0
+    
+    @staticmethod
+    def get_variables_snapshot(user_id: int, version: Optional[int] = None) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Get all variables for a user as dicts, served from the cache while the version is unchanged
+        
+        Writes in other worker processes bump the version in the database, so a stale
+        cache entry is never served; only the version lookup hits the database on a cache hit.
+        
+        Args:
+            user_id: User ID
+            version: Current version if the caller already looked it up
+        
+        Returns:
+            (version, list of variable dicts ordered by ID)
+        """
+        if version is None:
+            version = UserVariableService.get_version(user_id)
+        cached = variable_cache.get(user_id)
+        if cached is not None and cached[0] == version:
+            return cached
+        
+        variables = UserVariables.query.filter_by(user_id=user_id).order_by(UserVariables.id).all()
+        # Tag the snapshot with the version read before loading: a concurrent write
+        # makes the next lookup miss instead of serving outdated rows
+        snapshot = (version, [variable.to_dict() for variable in variables])
+        variable_cache.set(user_id, snapshot)
+        return snapshot
+    
+    @staticmethod
+    def get_variable_map(user_id: int) -> Dict[str, str]:
+        """
+        Get a user's variables as a name -> value mapping
+        
+        Args:
+            user_id: User ID
+        
+        Returns:
+            Mapping of variable names to values
+        """
+        _, variables = UserVariableService.get_variables_snapshot(user_id)
+        return {variable['variable_name']: variable['variable_value'] for variable in variables}
+    
+    @staticmethod
+    def invalidate_cache(user_id: int):
+        """Drop the cached variables of a user in this process"""
+        variable_cache.delete(user_id)
+    
+    @staticmethod
+    def get_cache_stats() -> Dict[str, Any]:
+        """Get variable cache statistics"""
+        return variable_cache.stats()
+    
+    @staticmethod
+    def update_variable(variable_id: int, variable_value: str, variable_name: Optional[str] = None) -> Optional[UserVariables]:
+        """
+        Update user variable value (and optionally its name)
         
         Args:
             variable_id: Variable ID
             variable_value: New variable value
-            
+            variable_name: New variable name
+        
         Returns:
             Updated UserVariables object or None (if variable doesn't exist)
+        
+        Raises:
+            ValueError: The new name is already used by another variable of the user
         """
         variable = UserVariableService.get_variable_by_id(variable_id)
         if not variable:
             return None
         
         variable.variable_value = variable_value
-        db.session.commit()
+        if variable_name:
+            variable.variable_name = variable_name
+        try:
+            db.session.flush()
+            UserVariableService._bump_version(variable.user_id)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            raise ValueError("变量名已存在")
+        UserVariableService.invalidate_cache(variable.user_id)
         return variable
     
     @staticmethod
@@ -97,7 +205,7 @@ class UserVariableService:
         
         Args:
             variable_id: Variable ID
-            
+        
         Returns:
             Whether deletion was successful
         """
@@ -105,8 +213,11 @@ class UserVariableService:
         if not variable:
             return False
         
+        user_id = variable.user_id
         db.session.delete(variable)
+        UserVariableService._bump_version(user_id)
         db.session.commit()
+        UserVariableService.invalidate_cache(user_id)
         return True
     
     @staticmethod
@@ -117,14 +228,119 @@ class UserVariableService:
         Args:
             user_id: User ID
             variable_name: Variable name
-            
+        
         Returns:
             Whether deletion was successful
         """
-        variable = UserVariableService.get_variable_by_name(user_id, variable_name)
-        if not variable:
+        deleted = UserVariables.query.filter_by(user_id=user_id, variable_name=variable_name).delete()
+        if not deleted:
+            db.session.rollback()
             return False
         
-        db.session.delete(variable)
+        UserVariableService._bump_version(user_id)
         db.session.commit()
-        return True
\ No newline at end of file
+        UserVariableService.invalidate_cache(user_id)
+        return True
+    
+    @staticmethod
+    def bulk_update(user_id: int, upserts: Dict[str, str], deletes: Iterable[str] = ()) -> Dict[str, int]:
+        """
+        Apply many variable changes in one transaction
+        
+        Upserts are written with a single INSERT ... ON CONFLICT (user_id, variable_name)
+        DO UPDATE statement and deletes with a single DELETE ... IN statement.
+        
+        Args:
+            user_id: User ID
+            upserts: Variables to create or overwrite (name -> value)
+            deletes: Names of variables to delete
+        
+        Returns:
+            Number of upserted and deleted variables and the new version
+        
+        Raises:
+            ValueError: Invalid or conflicting changes
+        """
+        deletes = list(dict.fromkeys(deletes))
+        if not upserts and not deletes:
+            raise ValueError("没有需要修改的变量")
+        if len(upserts) + len(deletes) > bulk_max_size:
+            raise ValueError(f"单次最多修改 {bulk_max_size} 个变量")
+        for name, value in upserts.items():
+            if not isinstance(name, str) or not name or len(name) > 100:
+                raise ValueError(f"变量名无效: {name}")
+            if not isinstance(value, str) or not value:
+                raise ValueError(f"变量值不能为空: {name}")
+        conflicting = set(upserts) & set(deletes)
+        if conflicting:
+            raise ValueError(f"变量不能同时修改和删除: {', '.join(sorted(conflicting))}")
+        
+        try:
+            deleted = 0
+            if deletes:
+                deleted = UserVariables.query.filter(
+                    UserVariables.user_id == user_id, UserVariables.variable_name.in_(deletes)
+                ).delete(synchronize_session=False)
+            if upserts:
+                UserVariableService._upsert(user_id, upserts)
+            UserVariableService._bump_version(user_id)
+            version = UserVariableService.get_version(user_id)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        UserVariableService.invalidate_cache(user_id)
+        return {'upserted': len(upserts), 'deleted': deleted, 'version': version}
+    
+    @staticmethod
+    def _upsert(user_id: int, upserts: Dict[str, str]):
+        """Create or overwrite variables with one conflict-aware statement where the database supports it"""
+        table = UserVariables.__table__
+        rows = [{'user_id': user_id, 'variable_name': name, 'variable_value': value}
+                for name, value in upserts.items()]
+        dialect = db.session.get_bind().dialect.name
+        
+        if dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            statement = insert(table)
+            db.session.execute(statement.on_conflict_do_update(
+                index_elements=[table.c.user_id, table.c.variable_name],
+                set_={'variable_value': statement.excluded.variable_value}
+            ), rows)
+        elif dialect in ('mysql', 'mariadb'):
+            from sqlalchemy.dialects.mysql import insert
+            statement = insert(table)
+            db.session.execute(statement.on_duplicate_key_update(
+                variable_value=statement.inserted.variable_value
+            ), rows)
+        else:
+            # Other databases: one query for the existing names, then batched UPDATE and INSERT
+            existing = {name for (name,) in db.session.query(UserVariables.variable_name).filter(
+                UserVariables.user_id == user_id, UserVariables.variable_name.in_(list(upserts)))}
+            updates = [row for row in rows if row['variable_name'] in existing]
+            inserts = [row for row in rows if row['variable_name'] not in existing]
+            if updates:
+                db.session.execute(table.update().where(
+                    table.c.user_id == db.bindparam('b_user_id'),
+                    table.c.variable_name == db.bindparam('b_variable_name')
+                ).values(variable_value=db.bindparam('b_variable_value')), [
+                    {'b_' + key: value for key, value in row.items()} for row in updates
+                ])
+            if inserts:
+                db.session.execute(table.insert(), inserts)
+    
+    @staticmethod
+    def _bump_version(user_id: int):
+        """Increment the user's variable version inside the current transaction"""
+        table = UserVariableVersion.__table__
+        statement = table.update().where(table.c.user_id == user_id).values(version=table.c.version + 1)
+        if db.session.execute(statement).rowcount == 0:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(table.insert().values(user_id=user_id, version=1))
+            except IntegrityError:
+                # Created by a concurrent request
+                db.session.execute(statement)
@@ -1 +1,5 @@
-# -*- coding: utf-8 -*-
\ No newline at end of file
+# -*- coding: utf-8 -*-
+from .batch_writer import BatchWriter
+from .cache import LRUCache
+
+__all__ = ['BatchWriter', 'LRUCache']
\ No newline at end of file
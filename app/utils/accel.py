@@ -0,0 +1,50 @@
+import os
+from urllib.parse import unquote
+from werkzeug.utils import send_file
+
+
+class AccelRedirectEmulator:
+    """
+    在应用内模拟 nginx 的 X-Accel-Redirect 处理(仅用于本地开发和测试)
+
+    应用返回 X-Accel-Redirect 头时，按前缀映射到本地目录并直接发送文件，
+    行为与 nginx 的 internal location 一致，包括 Range 和条件请求。
+    """
+
+    def __init__(self, wsgi_app, prefix: str, root: str):
+        self.wsgi_app = wsgi_app
+        self.prefix = prefix.rstrip('/') + '/'
+        self.root = os.path.abspath(root)
+
+    def __call__(self, environ, start_response):
+        captured = {}
+
+        def capture(status, headers, exc_info=None):
+            captured['status'] = status
+            captured['headers'] = headers
+            return lambda data: None
+
+        body = self.wsgi_app(environ, capture)
+        headers = dict((key.lower(), value) for key, value in captured['headers'])
+        target = headers.get('x-accel-redirect')
+
+        if target is None or not captured['status'].startswith('200') or not target.startswith(self.prefix):
+            start_response(captured['status'], captured['headers'])
+            return body
+
+        if hasattr(body, 'close'):
+            body.close()
+
+        path = os.path.abspath(os.path.join(self.root, unquote(target[len(self.prefix):])))
+        if not path.startswith(self.root + os.sep) or not os.path.isfile(path):
+            start_response('404 NOT FOUND', [('Content-Type', 'text/plain')])
+            return [b'Not Found']
+
+        mimetype = headers.get('content-type', 'application/octet-stream').split(';')[0]
+        response = send_file(path, environ, mimetype=mimetype, conditional=True,
+                             etag=headers.get('etag', '').strip('"') or True)
+        # 保留应用设置的下载文件名和缓存策略
+        for name in ('Content-Disposition', 'Cache-Control', 'Last-Modified'):
+            if name.lower() in headers:
+                response.headers[name] = headers[name.lower()]
+        return response(environ, start_response)
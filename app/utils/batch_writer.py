@@ -0,0 +1,139 @@
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+
+class BatchWriter:
+    """
+    后台批量写入器(write-behind)
+
+    调用方把条目放入有界队列后立即返回，后台线程每隔 flush_interval 秒
+    或攒够 batch_size 条时调用 handler 批量写入。队列满时新条目被丢弃并计数。
+    """
+
+    def __init__(self, handler: Callable[[List[Any]], None], flush_interval: float = 0.5,
+                 batch_size: int = 200, max_queue_size: int = 10000, on_error: Callable[[Exception], None] = None):
+        """
+        初始化写入器
+
+        Args:
+            handler: 批量写入函数，接收条目列表
+            flush_interval: 最长刷新间隔(秒)
+            batch_size: 每批最多条目数
+            max_queue_size: 队列容量
+            on_error: 写入失败时的回调
+        """
+        self.handler = handler
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_queue_size = max_queue_size
+        self.on_error = on_error
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stop_event = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+
+    def put(self, item: Any) -> bool:
+        """
+        放入一个条目
+
+        Returns:
+            是否放入成功(队列已满时返回 False)
+        """
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def put_many(self, items: List[Any]) -> int:
+        """放入多个条目，返回成功放入的数量"""
+        return sum(1 for item in items if self.put(item))
+
+    def flush(self):
+        """立即把队列中的条目全部写入"""
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return
+            self._write(batch)
+
+    def stop(self, timeout: float = 5.0):
+        """停止后台线程并写入剩余条目(之后再放入条目时自动重新启动)"""
+        self._stop_event.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout)
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """获取写入器统计信息"""
+        return {
+            'queue_depth': self._queue.qsize(),
+            'max_queue_size': self.max_queue_size,
+            'dropped': self.dropped,
+            'written': self.written,
+            'batches': self.batches,
+            'errors': self.errors
+        }
+
+    def _running(self) -> bool:
+        return (self._thread is not None and self._thread.is_alive() and not self._stop_event.is_set()
+                and self._pid == os.getpid())
+
+    def _ensure_started(self):
+        # 按进程启动后台线程，避免 fork 之后线程丢失(如 gunicorn --preload)；stop() 之后再放入条目时重新启动
+        if self._running():
+            return
+        with self._start_lock:
+            if self._running():
+                return
+            self._pid = os.getpid()
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name='batch-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._stop_event.is_set():
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+
+    def _drain(self, limit: int) -> List[Any]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[Any]):
+        with self._flush_lock:
+            try:
+                self.handler(batch)
+                self.written += len(batch)
+                self.batches += 1
+            except Exception as e:
+                self.errors += 1
+                self.dropped += len(batch)
+                if self.on_error:
+                    self.on_error(e)
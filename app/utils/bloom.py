@@ -0,0 +1,48 @@
+import hashlib
+import math
+from typing import Iterable
+
+
+class BloomFilter:
+    """
+    布隆过滤器
+
+    判断"一定不存在"时没有误判，判断"可能存在"时有 error_rate 的误判率，不支持删除。
+    """
+
+    def __init__(self, capacity: int = 1024, error_rate: float = 0.001):
+        """
+        初始化过滤器
+
+        Args:
+            capacity: 预计元素数量，超过后误判率上升
+            error_rate: capacity 个元素时的误判率
+        """
+        capacity = max(1, capacity)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def add(self, item: str):
+        """加入元素"""
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def update(self, items: Iterable[str]):
+        """批量加入元素"""
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def _positions(self, item: str):
+        # 双重哈希：由一次摘要的两半生成 k 个位置
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
@@ -0,0 +1,124 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class LRUCache:
+    """
+    线程安全的 LRU 缓存
+
+    同时按条目数、总字节数和过期时间(TTL)限制容量，并统计命中、未命中和淘汰次数。
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024,
+                 ttl: Optional[float] = 3600, sizeof: Callable[[Any], int] = None):
+        """
+        初始化缓存
+
+        Args:
+            max_entries: 最大条目数
+            max_bytes: 所有缓存值的最大总字节数
+            ttl: 过期时间(秒)，None 表示不过期
+            sizeof: 计算缓存值字节数的函数
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._sizeof = sizeof or _default_sizeof
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._lock = threading.Lock()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """获取缓存值，命中时将条目移到最近使用的位置"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key, size)
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> bool:
+        """
+        写入缓存值
+
+        Returns:
+            是否写入成功(单个值超过 max_bytes 时不缓存)
+        """
+        size = self._sizeof(value)
+        if size > self.max_bytes:
+            return False
+
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old[1]
+
+            self._entries[key] = (value, size, expires_at)
+            self._total_bytes += size
+
+            while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_size
+                self.evictions += 1
+        return True
+
+    def delete(self, key: Hashable) -> bool:
+        """删除缓存值"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            self._remove(key, entry[1])
+            return True
+
+    def clear(self):
+        """清空缓存(不重置统计)"""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits / lookups * 100) if lookups > 0 else 0
+            }
+
+    def _remove(self, key: Hashable, size: int):
+        del self._entries[key]
+        self._total_bytes -= size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _default_sizeof(value: Any) -> int:
+    """估算缓存值占用的字节数"""
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    return 1
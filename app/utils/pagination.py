@@ -0,0 +1,78 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List
+from app.models import db
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """
+    将排序键编码为不透明的分页游标
+
+    Args:
+        values: 排序键(支持 datetime、int、str)
+
+    Returns:
+        URL 安全的 base64 字符串
+    """
+    payload = [{'t': value.isoformat()} if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """
+    解码分页游标
+
+    Args:
+        cursor: encode_cursor 生成的游标
+        size: 排序键个数
+
+    Returns:
+        排序键列表
+
+    Raises:
+        ValueError: 游标无效
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values = [datetime.fromisoformat(value['t']) if isinstance(value, dict) else value for value in payload]
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("无效的分页游标")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("无效的分页游标")
+    return values
+
+
+def keyset_page(query, columns, cursor: str, limit: int):
+    """
+    按游标(keyset)方式获取一页数据
+
+    按 columns 倒序排列，取游标之后的 limit 条记录，多取一条用于判断是否还有下一页。
+
+    Args:
+        query: 已添加过滤条件的查询
+        columns: 排序列(最后一列须唯一，如主键)
+        cursor: 上一页返回的游标，None 或空字符串表示第一页
+        limit: 每页数量
+
+    Returns:
+        (记录列表, 下一页游标或 None)
+
+    Raises:
+        ValueError: 游标无效或每页数量小于 1
+    """
+    if limit < 1:
+        raise ValueError("每页数量必须大于 0")
+    if cursor:
+        values = decode_cursor(cursor, len(columns))
+        query = query.filter(db.tuple_(*columns) < db.tuple_(*values))
+
+    rows = query.order_by(*[column.desc() for column in columns]).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor([getattr(last, column.key) for column in columns])
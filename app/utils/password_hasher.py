@@ -0,0 +1,124 @@
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Optional
+import bcrypt
+
+_BCRYPT_COST = re.compile(rb'^\$2[abxy]?\$(\d{2})\$')
+
+
+class PasswordHasherBusy(Exception):
+    """密码计算线程池已满或等待超时"""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """
+    有界的 bcrypt 计算线程池
+
+    bcrypt 计算时释放 GIL，放到专用线程中执行后同一进程的其他请求线程不受影响；
+    同时执行和排队的任务总数超过上限时直接拒绝(准入控制)，不让登录洪峰占满所有工作线程。
+    """
+
+    def __init__(self, rounds: int = 12, max_workers: int = 2, max_pending: int = 16,
+                 timeout: Optional[float] = 5, retry_after: int = 1):
+        """
+        初始化线程池
+
+        Args:
+            rounds: bcrypt 成本因子(4-31)，修改后旧哈希在用户登录时重新计算
+            max_workers: 同时计算的线程数
+            max_pending: 最多排队等待的任务数，超过时拒绝
+            timeout: 等待结果的最长时间(秒)，None 表示不限
+            retry_after: 拒绝时建议客户端重试的间隔(秒)
+        """
+        if not 4 <= rounds <= 31:
+            raise ValueError("bcrypt 成本因子必须在4到31之间")
+        if max_workers < 1 or max_pending < 0:
+            raise ValueError("线程数必须大于0，排队数不能为负数")
+        self.rounds = rounds
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def hash(self, password: str) -> bytes:
+        """计算密码哈希"""
+        return self._run(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt(self.rounds))
+
+    def verify(self, password: str, hashed: bytes) -> bool:
+        """校验密码"""
+        return self._run(bcrypt.checkpw, password.encode('utf-8'), hashed)
+
+    def needs_rehash(self, hashed: bytes) -> bool:
+        """哈希的成本因子与当前配置不一致时需要重新计算"""
+        match = _BCRYPT_COST.match(hashed)
+        return match is None or int(match.group(1)) != self.rounds
+
+    def stats(self) -> Dict[str, Any]:
+        """获取线程池统计信息"""
+        return {
+            'rounds': self.rounds,
+            'max_workers': self.max_workers,
+            'max_pending': self.max_pending,
+            'in_flight': self.in_flight,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts
+        }
+
+    def shutdown(self):
+        """关闭线程池(等待已提交的任务完成)"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _run(self, func: Callable, *args) -> Any:
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordHasherBusy("认证服务繁忙，请稍后重试", self.retry_after)
+
+        with self._lock:
+            self.in_flight += 1
+        try:
+            future = self._get_executor().submit(func, *args)
+        except Exception:
+            self._release(None)
+            raise
+        # 任务结束时才释放名额：等待超时的任务仍在计算，继续占用名额
+        future.add_done_callback(self._release)
+
+        try:
+            return future.result(self.timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise PasswordHasherBusy("认证服务繁忙，请稍后重试", self.retry_after)
+
+    def _release(self, future):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+        self._slots.release()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # fork 出的子进程不继承线程，需要重新创建线程池
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='bcrypt')
+                self._pid = os.getpid()
+            return self._executor
@@ -0,0 +1,167 @@
+import math
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+
+class MemoryWindowStore:
+    """进程内的窗口计数存储，只保留每个键的当前和上一个窗口"""
+
+    name = 'memory'
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._counts: Dict[str, List[int]] = {}  # key -> [窗口序号, 当前窗口计数, 上一窗口计数]
+        self._lock = threading.Lock()
+
+    def incr(self, key: str, window_index: int, window: float) -> Tuple[int, int]:
+        """当前窗口计数加1，返回(上一窗口计数, 当前窗口计数)"""
+        with self._lock:
+            entry = self._counts.get(key)
+            if entry is None and len(self._counts) >= self.max_keys:
+                self._sweep(window_index)
+            entry = self._roll(key, window_index)
+            entry[1] += 1
+            return entry[2], entry[1]
+
+    def counts(self, key: str, window_index: int) -> Tuple[int, int]:
+        """返回(上一窗口计数, 当前窗口计数)"""
+        with self._lock:
+            entry = self._counts.get(key)
+            if entry is None or entry[0] < window_index - 1:
+                return 0, 0
+            if entry[0] == window_index - 1:
+                return entry[1], 0
+            return entry[2], entry[1]
+
+    def delete(self, key: str, window_index: int):
+        """清除计数"""
+        with self._lock:
+            self._counts.pop(key, None)
+
+    def _roll(self, key: str, window_index: int) -> List[int]:
+        entry = self._counts.get(key)
+        if entry is None or entry[0] < window_index - 1:
+            entry = self._counts[key] = [window_index, 0, 0]
+        elif entry[0] == window_index - 1:
+            entry[:] = [window_index, 0, entry[1]]
+        return entry
+
+    def _sweep(self, window_index: int):
+        # 两个窗口内没有请求的键不再影响计数
+        for key in [key for key, entry in self._counts.items() if entry[0] < window_index - 1]:
+            del self._counts[key]
+
+    def __len__(self):
+        return len(self._counts)
+
+
+class RedisWindowStore:
+    """
+    保存在 Redis 中的窗口计数，所有工作进程共享
+
+    每个窗口一个计数键(INCR 原子递增)，两个窗口后自动过期。
+    """
+
+    name = 'redis'
+
+    def __init__(self, client, prefix: str = 'rate-limit:'):
+        """
+        初始化存储
+
+        Args:
+            client: redis-py 兼容的客户端(测试时可使用 tests.fake_redis.FakeRedis)
+            prefix: 键前缀
+        """
+        self.client = client
+        self.prefix = prefix
+
+    def incr(self, key: str, window_index: int, window: float) -> Tuple[int, int]:
+        current_key = self._key(key, window_index)
+        current = self.client.incr(current_key)
+        if current == 1:
+            self.client.expire(current_key, int(math.ceil(window * 2)))
+        previous = self.client.get(self._key(key, window_index - 1))
+        return int(previous or 0), int(current)
+
+    def counts(self, key: str, window_index: int) -> Tuple[int, int]:
+        previous, current = self.client.mget([self._key(key, window_index - 1), self._key(key, window_index)])
+        return int(previous or 0), int(current or 0)
+
+    def delete(self, key: str, window_index: int):
+        self.client.delete(self._key(key, window_index - 1), self._key(key, window_index))
+
+    def _key(self, key: str, window_index: int) -> str:
+        return f'{self.prefix}{key}:{window_index}'
+
+
+class SlidingWindowRateLimiter:
+    """
+    滑动窗口计数限流器
+
+    按固定窗口计数，用上一窗口计数按剩余时间比例加权估算滑动窗口内的请求数：
+        估算值 = 上一窗口计数 * (1 - 当前窗口已过去的比例) + 当前窗口计数
+    每个键只需两个计数器，不用记录每次请求的时间。
+    """
+
+    def __init__(self, limit: int, window: float, store=None):
+        """
+        初始化限流器
+
+        Args:
+            limit: 窗口内允许的最大次数
+            window: 窗口长度(秒)
+            store: 计数存储，默认进程内存储
+        """
+        if limit < 1 or window <= 0:
+            raise ValueError("限流次数和窗口长度必须大于0")
+        self.limit = limit
+        self.window = window
+        self.store = store or MemoryWindowStore()
+
+    def hit(self, key: str) -> float:
+        """
+        记录一次请求
+
+        Returns:
+            0 表示未超限，否则为建议的重试等待时间(秒)
+        """
+        now = time.time()
+        window_index, elapsed = self._position(now)
+        previous, current = self.store.incr(key, window_index, self.window)
+        return self._retry_after(previous, current, elapsed, allowed=self.limit)
+
+    def peek(self, key: str) -> float:
+        """
+        检查是否已超限(不计数)
+
+        Returns:
+            0 表示还可以请求，否则为建议的重试等待时间(秒)
+        """
+        window_index, elapsed = self._position(time.time())
+        previous, current = self.store.counts(key, window_index)
+        # 再请求一次后不超过上限才放行
+        return self._retry_after(previous, current, elapsed, allowed=self.limit - 1)
+
+    def reset(self, key: str):
+        """清除计数"""
+        window_index, _ = self._position(time.time())
+        self.store.delete(key, window_index)
+
+    def stats(self) -> Dict[str, Any]:
+        return {'limit': self.limit, 'window': self.window, 'store': self.store.name}
+
+    def _position(self, now: float) -> Tuple[int, float]:
+        window_index = int(now // self.window)
+        return window_index, now - window_index * self.window
+
+    def _retry_after(self, previous: int, current: int, elapsed: float, allowed: float) -> float:
+        weight = 1 - elapsed / self.window
+        if previous * weight + current <= allowed:
+            return 0
+        if current > allowed:
+            # 当前窗口已超限：到下一窗口后当前计数变为上一窗口计数，再按比例衰减到上限以内
+            return (self.window - elapsed) + self.window * (1 - allowed / current)
+        # 上一窗口的加权部分衰减到上限以内所需的时间
+        target_weight = (allowed - current) / previous
+        return max(0.0, (weight - target_weight) * self.window)
@@ -0,0 +1,185 @@
+import datetime
+import hashlib
+import hmac
+import http.client
+from typing import BinaryIO, Dict, Optional
+from urllib.parse import quote, urlsplit
+from xml.etree import ElementTree
+
+
+class S3Error(Exception):
+    """S3 请求失败"""
+
+    def __init__(self, status: int, code: str, message: str = ''):
+        super().__init__(f"S3 请求失败: {status} {code} {message}".strip())
+        self.status = status
+        self.code = code
+
+
+class _Response:
+    """S3 响应，关闭时同时关闭连接(HTTP/1.1 keep-alive 下先关闭连接会丢弃未读取的响应体)"""
+
+    def __init__(self, connection, response):
+        self._connection = connection
+        self._response = response
+        self.status = response.status
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        return self._response.read(amt)
+
+    def getheader(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        return self._response.getheader(name, default)
+
+    def getheaders(self):
+        return self._response.getheaders()
+
+    def close(self):
+        self._response.close()
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class S3Client:
+    """
+    最小的 S3 兼容对象存储客户端(AWS Signature V4，路径风格寻址)
+
+    只实现文件存储需要的 PUT/GET/HEAD/DELETE/COPY，上传和下载都是流式的。
+    适用于 AWS S3、MinIO、Ceph RGW 等 S3 兼容服务。
+    """
+
+    def __init__(self, endpoint_url: str, bucket: str, access_key: str, secret_key: str,
+                 region: str = 'us-east-1', timeout: float = 30):
+        """
+        初始化客户端
+
+        Args:
+            endpoint_url: 服务地址，如 https://s3.us-east-1.amazonaws.com 或 http://127.0.0.1:9000
+            bucket: 存储桶名称
+            access_key: 访问密钥ID
+            secret_key: 访问密钥
+            region: 区域
+            timeout: 请求超时(秒)
+        """
+        parts = urlsplit(endpoint_url)
+        if parts.scheme not in ('http', 'https') or not parts.netloc:
+            raise ValueError(f"无效的S3服务地址: {endpoint_url}")
+        self.scheme = parts.scheme
+        self.host = parts.netloc
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.timeout = timeout
+
+    def put_object(self, key: str, body: BinaryIO, size: int, content_type: str = 'application/octet-stream'):
+        """流式上传对象(请求体不参与签名，避免预先读取整个文件)"""
+        response = self._request('PUT', key, body=body, headers={
+            'Content-Length': str(size),
+            'Content-Type': content_type
+        })
+        self._finish(response)
+
+    def get_object(self, key: str, byte_range: Optional[str] = None):
+        """
+        下载对象
+
+        Returns:
+            可读取的响应流(调用方负责 close)
+        """
+        headers = {'Range': byte_range} if byte_range else {}
+        response = self._request('GET', key, headers=headers)
+        if response.status not in (200, 206):
+            self._raise_error(response)
+        return response
+
+    def head_object(self, key: str) -> Optional[Dict[str, str]]:
+        """获取对象元数据，对象不存在时返回None"""
+        response = self._request('HEAD', key)
+        response.read()
+        response.close()
+        if response.status == 404:
+            return None
+        if response.status != 200:
+            raise S3Error(response.status, 'HeadFailed')
+        return {name.lower(): value for name, value in response.getheaders()}
+
+    def delete_object(self, key: str):
+        """删除对象(对象不存在时不报错)"""
+        self._finish(self._request('DELETE', key))
+
+    def copy_object(self, source_key: str, key: str):
+        """在存储桶内复制对象"""
+        response = self._request('PUT', key, headers={
+            'x-amz-copy-source': quote(f'/{self.bucket}/{source_key}', safe='/-_.~')
+        })
+        self._finish(response)
+
+    def _request(self, method: str, key: str, body=None, headers: Optional[Dict[str, str]] = None):
+        path = quote(f'/{self.bucket}/{key}', safe='/-_.~')
+        headers = dict(headers or {})
+        headers.update(self._sign(method, path, headers))
+        connection_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        connection = connection_class(self.host, timeout=self.timeout)
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+        except Exception:
+            connection.close()
+            raise
+        # 连接在调用方读取或关闭响应后才关闭
+        return _Response(connection, response)
+
+    def _sign(self, method: str, path: str, headers: Dict[str, str]) -> Dict[str, str]:
+        """计算 Signature V4 签名头"""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        amz_date = now.strftime('%Y%m%dT%H%M%SZ')
+        date = now.strftime('%Y%m%d')
+        signed = {
+            'host': self.host,
+            'x-amz-content-sha256': 'UNSIGNED-PAYLOAD',
+            'x-amz-date': amz_date
+        }
+        signed.update({name.lower(): value for name, value in headers.items() if name.lower().startswith('x-amz-')})
+        signed_headers = ';'.join(sorted(signed))
+        canonical_headers = ''.join(f'{name}:{signed[name].strip()}\n' for name in sorted(signed))
+        canonical_request = '\n'.join([method, path, '', canonical_headers, signed_headers, 'UNSIGNED-PAYLOAD'])
+
+        scope = f'{date}/{self.region}/s3/aws4_request'
+        string_to_sign = '\n'.join([
+            'AWS4-HMAC-SHA256', amz_date, scope,
+            hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()
+        ])
+        key = ('AWS4' + self.secret_key).encode('utf-8')
+        for part in (date, self.region, 's3', 'aws4_request'):
+            key = hmac.new(key, part.encode('utf-8'), hashlib.sha256).digest()
+        signature = hmac.new(key, string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
+
+        return {
+            'x-amz-content-sha256': 'UNSIGNED-PAYLOAD',
+            'x-amz-date': amz_date,
+            'Authorization': f'AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, '
+                             f'SignedHeaders={signed_headers}, Signature={signature}'
+        }
+
+    def _finish(self, response):
+        if response.status >= 300:
+            self._raise_error(response)
+        response.read()
+        response.close()
+
+    def _raise_error(self, response):
+        body = response.read()
+        response.close()
+        code, message = 'Unknown', ''
+        try:
+            root = ElementTree.fromstring(body)
+            code = root.findtext('Code') or code
+            message = root.findtext('Message') or ''
+        except ElementTree.ParseError:
+            pass
+        raise S3Error(response.status, code, message)
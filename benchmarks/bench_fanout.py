@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上传目录分层布局基准测试
+
+在临时目录中分别按平铺布局(所有文件在一个目录)和按哈希前缀分层的布局
+(与 StorageService 的 blob 布局一致)创建 N 个文件，测量随机 stat、open、
+不存在文件的查找以及列出文件所在目录的耗时。
+
+用法: python benchmarks/bench_fanout.py [--sizes 10000,100000,1000000] [--levels 2] [--width 2]
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.storage_service import StorageService
+
+
+def make_hashes(count: int):
+    """生成 count 个内容哈希"""
+    return [hashlib.sha256(str(i).encode()).hexdigest() for i in range(count)]
+
+
+def flat_path(root: str, content_hash: str) -> str:
+    return os.path.join(root, 'flat', content_hash)
+
+
+def populate(paths):
+    """创建文件(每个文件写入少量内容)"""
+    created = set()
+    for path in paths:
+        folder = os.path.dirname(path)
+        if folder not in created:
+            os.makedirs(folder, exist_ok=True)
+            created.add(folder)
+        with open(path, 'wb') as f:
+            f.write(b'x')
+
+
+def timed(operation, samples):
+    """返回每次操作耗时的中位数(微秒)"""
+    timings = []
+    for sample in samples:
+        begin = time.perf_counter()
+        operation(sample)
+        timings.append((time.perf_counter() - begin) * 1e6)
+    return statistics.median(timings)
+
+
+def read_file(path: str):
+    with open(path, 'rb') as f:
+        f.read()
+
+
+def stat_missing(path: str):
+    try:
+        os.stat(path)
+    except FileNotFoundError:
+        pass
+
+
+def list_folder(path: str):
+    with os.scandir(os.path.dirname(path)) as entries:
+        for _ in entries:
+            pass
+
+
+def measure(path_of, hashes, missing, samples: int, list_samples: int):
+    """测量一种布局的各项操作耗时"""
+    existing = [path_of(h) for h in random.sample(hashes, min(samples, len(hashes)))]
+    absent = [path_of(h) for h in missing]
+    return {
+        'stat': timed(os.stat, existing),
+        'open+read': timed(read_file, existing),
+        'stat(不存在)': timed(stat_missing, absent),
+        '列出所在目录': timed(list_folder, existing[:list_samples]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='上传目录分层布局基准测试')
+    parser.add_argument('--sizes', default='10000,100000,1000000', help='文件数量，逗号分隔')
+    parser.add_argument('--levels', type=int, default=2, help='分层级数')
+    parser.add_argument('--width', type=int, default=2, help='每级目录名的十六进制字符数')
+    parser.add_argument('--samples', type=int, default=5000, help='每项操作的采样次数')
+    parser.add_argument('--list-samples', type=int, default=20, help='列目录操作的采样次数')
+    parser.add_argument('--dir', default=None, help='测试目录(默认系统临时目录，应与上传目录在同一文件系统)')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    print(f"分层布局: {args.levels} 级 x {args.width} 字符; 采样 {args.samples} 次(页缓存已预热)")
+
+    for size in sizes:
+        with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+            service = StorageService(upload_folder=tmp, fanout_levels=args.levels, fanout_width=args.width)
+            hashes = make_hashes(size)
+            missing = [hashlib.sha256(f'missing-{i}'.encode()).hexdigest() for i in range(args.samples)]
+            layouts = {
+                '平铺': lambda h: flat_path(tmp, h),
+                '分层': service._blob_path,
+            }
+
+            results = {}
+            for name, path_of in layouts.items():
+                begin = time.perf_counter()
+                populate(path_of(h) for h in hashes)
+                elapsed = time.perf_counter() - begin
+                results[name] = measure(path_of, hashes, missing, args.samples, args.list_samples)
+                results[name]['创建(每个文件)'] = elapsed / size * 1e6
+
+            print(f"\n文件数 {size}")
+            print(f"{'操作(us)':<16}{'平铺':>14}{'分层':>14}")
+            for operation in results['平铺']:
+                print(f"{operation:<16}{results['平铺'][operation]:>14.1f}{results['分层'][operation]:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
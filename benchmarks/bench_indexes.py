@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+热点查询索引基准测试
+
+在临时 SQLite 数据库中为 conversion_result、stored_file、user_variables
+各写入 N 行数据，分别在无索引和执行迁移后测量热点查询耗时。
+
+用法: python benchmarks/bench_indexes.py [--rows 1000000] [--users 1000]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import sqlalchemy as sa
+from app.models import ConversionResult, StoredFile, UserVariables
+from app.models.migrations import upgrade_database
+
+QUERIES = {
+    '用户转换记录(最近50条)': lambda user_id: sa.select(ConversionResult.id)
+        .where(ConversionResult.user_id == user_id)
+        .order_by(ConversionResult.created_at.desc()).limit(50),
+    '用户文件列表(第1页)': lambda user_id: sa.select(StoredFile.id)
+        .where(StoredFile.user_id == user_id)
+        .order_by(StoredFile.upload_time.desc()).limit(10),
+    '按变量名查询变量': lambda user_id: sa.select(UserVariables.id)
+        .where(UserVariables.user_id == user_id, UserVariables.variable_name == f'var_{user_id}_7'),
+}
+
+
+def populate(engine, rows: int, users: int, chunk: int = 50000):
+    """写入测试数据"""
+    start = datetime(2024, 1, 1)
+    with engine.begin() as connection:
+        for offset in range(0, rows, chunk):
+            count = min(chunk, rows - offset)
+            connection.execute(ConversionResult.__table__.insert(), [{
+                'user_id': random.randint(1, users),
+                'curl_command': 'curl https://example.com',
+                'python_code': 'import requests',
+                'status': '转换成功',
+                'created_at': start + timedelta(seconds=offset + i)
+            } for i in range(count)])
+            connection.execute(StoredFile.__table__.insert(), [{
+                'user_id': random.randint(1, users),
+                'original_filename': 'a.txt',
+                'stored_filename': 'a.txt',
+                'file_path': 'uploads/a.txt',
+                'file_size': 1,
+                'file_type': 'text/plain',
+                'upload_time': start + timedelta(seconds=offset + i),
+                'download_count': 0
+            } for i in range(count)])
+            connection.execute(UserVariables.__table__.insert(), [{
+                'user_id': (offset + i) % users + 1,
+                'variable_name': f'var_{(offset + i) % users + 1}_{(offset + i) // users}',
+                'variable_value': 'value',
+                'created_at': start
+            } for i in range(count)])
+
+
+def measure(engine, users: int, repeat: int):
+    """测量各查询的耗时中位数(毫秒)"""
+    results = {}
+    with engine.connect() as connection:
+        for name, build in QUERIES.items():
+            timings = []
+            for _ in range(repeat):
+                statement = build(random.randint(1, users))
+                begin = time.perf_counter()
+                connection.execute(statement).all()
+                timings.append((time.perf_counter() - begin) * 1000)
+            results[name] = statistics.median(timings)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='热点查询索引基准测试')
+    parser.add_argument('--rows', type=int, default=1000000, help='每张表的行数')
+    parser.add_argument('--users', type=int, default=1000, help='用户数')
+    parser.add_argument('--repeat', type=int, default=20, help='每个查询的执行次数')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = sa.create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        tables = [ConversionResult.__table__, StoredFile.__table__, UserVariables.__table__]
+
+        # 只建表不建索引，模拟迁移前的数据库
+        for table in tables:
+            indexes = set(table.indexes)
+            table.indexes.clear()
+            table.create(engine)
+            table.indexes.update(indexes)
+
+        print(f"写入数据: 每张表 {args.rows} 行, {args.users} 个用户")
+        begin = time.perf_counter()
+        populate(engine, args.rows, args.users)
+        print(f"  耗时 {time.perf_counter() - begin:.1f}s")
+
+        before = measure(engine, args.users, args.repeat)
+
+        begin = time.perf_counter()
+        upgrade_database(engine, explicit=True)
+        print(f"执行迁移(建索引) 耗时 {time.perf_counter() - begin:.1f}s")
+
+        after = measure(engine, args.users, args.repeat)
+
+        print(f"\n{'查询':<24}{'无索引(ms)':>12}{'有索引(ms)':>12}{'加速比':>10}")
+        for name in QUERIES:
+            speedup = before[name] / after[name] if after[name] > 0 else float('inf')
+            print(f"{name:<24}{before[name]:>12.2f}{after[name]:>12.3f}{speedup:>9.0f}x")
+
+
+if __name__ == '__main__':
+    main()
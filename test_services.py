@@ -6,6 +6,7 @@ Service层功能测试脚本
 
 import sys
 import os
+import time
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
 
 from app import create_app
@@ -99,6 +100,142 @@ def test_auth_service():
         print("✗ 错误密码认证应该失败")
         return False
     
+    # 测试token携带用户ID，并通过缓存获取当前用户
+    from flask import current_app
+    from flask_jwt_extended import verify_jwt_in_request
+    from app.services.user_service import user_cache
+    headers = {'Authorization': f"Bearer {auth_result['access_token']}"}
+    for _ in range(2):
+        with current_app.test_request_context(headers=headers):
+            verify_jwt_in_request()
+            current_user = AuthService.get_current_user()
+            if not current_user or current_user.username != 'authtest' or AuthService.get_current_user() is not current_user:
+                print("✗ 获取当前用户失败")
+                return False
+    if user_cache.get(auth_result['user']['id']) is not None:
+        print("✓ 当前用户通过缓存获取成功")
+    else:
+        print("✗ 当前用户未缓存")
+        return False
+    
+    # 测试修改成本因子后登录时重新计算哈希，以及线程池满时拒绝
+    import threading
+    from app.services import user_service
+    from app.utils.password_hasher import PasswordHasher, PasswordHasherBusy
+    original_hasher = user_service.password_hasher
+    user_service.password_hasher = PasswordHasher(rounds=4, max_workers=1, max_pending=0)
+    try:
+        AuthService.authenticate_user('authtest', 'auth123')
+        if not test_user.password.startswith(b'$2b$04$') or not AuthService.authenticate_user('authtest', 'auth123'):
+            print("✗ 登录时未按新的成本因子重新计算哈希")
+            return False
+        release = threading.Event()
+        blocker = threading.Thread(target=user_service.password_hasher._run, args=(release.wait,))
+        blocker.start()
+        while user_service.password_hasher.in_flight == 0:
+            release.wait(0.01)
+        try:
+            AuthService.authenticate_user('authtest', 'auth123')
+            print("✗ 线程池已满时应拒绝认证")
+            return False
+        except PasswordHasherBusy:
+            pass
+        finally:
+            release.set()
+            blocker.join()
+        if user_service.password_hasher.stats()['rejected'] == 1:
+            print("✓ 登录时按新成本因子重新计算哈希，线程池满时拒绝成功")
+        else:
+            print("✗ 线程池统计错误")
+            return False
+    finally:
+        user_service.password_hasher.shutdown()
+        user_service.password_hasher = original_hasher
+    
+    # 测试注销后token失效，以及黑名单条目按token过期时间失效
+    from flask_jwt_extended import decode_token
+    from flask_jwt_extended.exceptions import RevokedTokenError
+    from app.services.token_blocklist import RedisBlocklistStore, TokenBlocklist
+    from tests.fake_redis import FakeRedis
+    claims = decode_token(auth_result['access_token'])
+    AuthService.logout_user(claims['jti'], claims['exp'])
+    with current_app.test_request_context(headers=headers):
+        try:
+            verify_jwt_in_request()
+            print("✗ 注销后的token应该失效")
+            return False
+        except RevokedTokenError:
+            pass
+    blocklist = TokenBlocklist(RedisBlocklistStore(FakeRedis()), sync_interval=60)
+    blocklist.revoke('revoked-jti', time.time() + 60)
+    blocklist.revoke('expired-jti', time.time() - 1)
+    blocklist.sync()
+    try:
+        if (blocklist.is_revoked('revoked-jti') and not blocklist.is_revoked('expired-jti')
+                and not blocklist.is_revoked('other-jti') and blocklist.stats()['filter_passes'] >= 1):
+            print("✓ 注销token和黑名单过期成功")
+        else:
+            print("✗ 黑名单检查错误")
+            return False
+    finally:
+        blocklist.stop()
+    
+    # 测试过滤器重建和过期清理在后台线程执行，其他工作进程的注销在 sync_interval 内生效
+    import threading
+    from app.services.token_blocklist import DatabaseBlocklistStore
+    store = DatabaseBlocklistStore()
+    sync_threads = []
+    original_active = store.active
+    def recording_active():
+        sync_threads.append(threading.get_ident())
+        return original_active()
+    store.active = recording_active
+    blocklist = TokenBlocklist(store, sync_interval=0.05, app=current_app._get_current_object())
+    try:
+        before = blocklist.is_revoked('other-worker-jti')
+        deadline = time.time() + 5
+        while blocklist.stats()['syncs'] < 1 and time.time() < deadline:
+            time.sleep(0.01)
+        store.add('other-worker-jti', time.time() + 60)
+        syncs = blocklist.stats()['syncs']
+        while blocklist.stats()['syncs'] < syncs + 2 and time.time() < deadline:
+            time.sleep(0.01)
+        after = blocklist.is_revoked('other-worker-jti')
+        if (not before and after and sync_threads and threading.get_ident() not in sync_threads
+                and blocklist.stats()['sync_errors'] == 0):
+            print("✓ 黑名单后台同步成功")
+        else:
+            print(f"✗ 黑名单后台同步错误: {before}, {after}, {blocklist.stats()}")
+            return False
+    finally:
+        blocklist.stop()
+    
+    # 测试登录限流：同一账号失败次数过多后即使密码正确也拒绝，登录成功后清零
+    from app.services import auth_service
+    from app.services.login_throttle import LoginThrottled, create_login_throttle
+    original_throttle = auth_service.login_throttle
+    auth_service.login_throttle = create_login_throttle({
+        'LOGIN_THROTTLE_BACKEND': 'redis', 'LOGIN_THROTTLE_USERNAME_LIMIT': 2, 'LOGIN_THROTTLE_IP_LIMIT': 2
+    }, redis_client=FakeRedis())
+    try:
+        AuthService.authenticate_user('authtest', 'auth123', client_ip='10.0.0.1')
+        AuthService.authenticate_user('AuthTest', 'wrongpassword', client_ip='10.0.0.2')
+        AuthService.authenticate_user('authtest', 'wrongpassword', client_ip='10.0.0.2')
+        rejected = []
+        for username, password, client_ip in [('authtest', 'auth123', '10.0.0.3'), ('other', 'x', '10.0.0.2')]:
+            try:
+                AuthService.authenticate_user(username, password, client_ip=client_ip)
+            except LoginThrottled as e:
+                rejected.append(e.retry_after > 0)
+        stats = auth_service.login_throttle.stats()
+        if rejected == [True, True] and stats['rejected_username'] == 1 and stats['rejected_ip'] == 1:
+            print("✓ 登录限流成功")
+        else:
+            print(f"✗ 登录限流错误: {stats}")
+            return False
+    finally:
+        auth_service.login_throttle = original_throttle
+    
     # 清理测试用户
     try:
         UserService.delete_user(test_user)
@@ -109,6 +246,90 @@ def test_auth_service():
     
     return True
 
+def test_user_variable_service():
+    """测试UserVariableService功能"""
+    print("\n=== 测试 UserVariableService ===")
+    from app.services.user_variable_service import UserVariableService, variable_cache
+    
+    user = UserService.get_user_by_username('user')
+    variable = UserVariableService.create_variable(user.id, 'token', 'abc')
+    if variable and UserVariableService.create_variable(user.id, 'token', 'other') is None:
+        print("✓ 变量创建成功，重名变量被拒绝")
+    else:
+        print("✗ 变量创建失败")
+        return False
+    
+    # 测试批量修改在一个事务中完成，并使缓存失效
+    version, variables = UserVariableService.get_variables_snapshot(user.id)
+    result = UserVariableService.bulk_update(user.id, {'token': 'xyz', 'host': 'example.com', 'port': '8080'}, ['missing'])
+    if result['upserted'] != 3 or result['deleted'] != 0 or result['version'] <= version:
+        print(f"✗ 变量批量修改结果错误: {result}")
+        return False
+    result = UserVariableService.bulk_update(user.id, {}, ['port'])
+    if UserVariableService.get_variable_map(user.id) != {'token': 'xyz', 'host': 'example.com'} or result['deleted'] != 1:
+        print(f"✗ 变量批量修改后读取错误: {UserVariableService.get_variable_map(user.id)}")
+        return False
+    try:
+        UserVariableService.bulk_update(user.id, {'token': 'a'}, ['token'])
+        print("✗ 同时修改和删除同一变量应该失败")
+        return False
+    except ValueError:
+        pass
+    print("✓ 变量批量修改成功")
+    
+    # 测试版本号不变时从缓存读取
+    hits = variable_cache.hits
+    UserVariableService.get_variables_snapshot(user.id)
+    if variable_cache.hits == hits + 1:
+        print("✓ 变量缓存命中成功")
+    else:
+        print("✗ 变量缓存未命中")
+        return False
+    
+    try:
+        UserVariableService.update_variable(variable.id, 'value', 'host')
+        print("✗ 改为已存在的变量名应该失败")
+        return False
+    except ValueError:
+        pass
+    UserVariableService.bulk_update(user.id, {}, ['token', 'host'])
+    if UserVariableService.get_variable_map(user.id) == {}:
+        print("✓ 变量清理成功")
+    else:
+        print("✗ 变量清理失败")
+        return False
+    
+    # 测试启动时的自动迁移遇到重复变量时中止，不删除数据；upgrade-db 显式执行时才清理
+    import tempfile
+    import sqlalchemy as sa
+    from app.models import ConversionResult, StoredFile, UserVariables
+    from app.models.migrations import upgrade_database
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = sa.create_engine(f"sqlite:///{os.path.join(tmp, 'migrate.db')}")
+        for table in (ConversionResult.__table__, StoredFile.__table__, UserVariables.__table__):
+            indexes = set(table.indexes)
+            table.indexes.clear()
+            table.create(engine)
+            table.indexes.update(indexes)
+        with engine.begin() as connection:
+            connection.execute(UserVariables.__table__.insert(), [
+                {'user_id': 1, 'variable_name': 'host', 'variable_value': value} for value in ('old', 'new')
+            ])
+        automatic = upgrade_database(engine)
+        with engine.connect() as connection:
+            rows_kept = connection.execute(sa.text('SELECT COUNT(*) FROM user_variables')).scalar()
+        explicit = upgrade_database(engine, explicit=True)
+        with engine.connect() as connection:
+            remaining = connection.execute(sa.text('SELECT variable_value FROM user_variables')).scalars().all()
+        engine.dispose()
+    if 1 not in automatic and 2 in automatic and rows_kept == 2 and explicit == [1] and remaining == ['new']:
+        print("✓ 自动迁移遇到重复变量时中止，显式迁移清理成功")
+    else:
+        print(f"✗ 迁移清理重复变量错误: {automatic} {explicit} {rows_kept} {remaining}")
+        return False
+    
+    return True
+
 def test_converter_service():
     """测试ConverterService功能"""
     print("\n=== 测试 ConverterService ===")
@@ -125,6 +346,15 @@ def test_converter_service():
         print(f"✗ curl转换失败: {result['message']}")
         return False
     
+    # 测试转换缓存
+    hits_before = ConverterService.get_cache_stats()['hits']
+    cached_result = ConverterService.convert_curl_command(curl_command)
+    if cached_result['python'] == result['python'] and ConverterService.get_cache_stats()['hits'] == hits_before + 1:
+        print("✓ 重复转换命中缓存")
+    else:
+        print("✗ 重复转换未命中缓存")
+        return False
+    
     # 测试无效curl命令
     invalid_result = ConverterService.convert_curl_command('invalid command')
     if not invalid_result['success']:
@@ -133,6 +363,14 @@ def test_converter_service():
         print("✗ 无效curl命令转换应该失败")
         return False
     
+    # 测试批量转换
+    batch_results = ConverterService.convert_curl_commands([curl_command, 'invalid command', 'curl https://example.com'])
+    if [r['success'] for r in batch_results] == [True, False, True] and [r['index'] for r in batch_results] == [0, 1, 2]:
+        print("✓ 批量转换成功，结果顺序与输入一致")
+    else:
+        print("✗ 批量转换失败")
+        return False
+    
     # 测试转换历史查询
     history = ConverterService.get_conversion_history(limit=5)
     print(f"✓ 转换历史查询成功，返回 {len(history)} 条记录")
@@ -157,6 +395,681 @@ def test_converter_service():
         print("✗ 无效curl命令验证应该失败")
         return False
     
+    # 测试用户变量替换
+    from app.services.user_variable_service import UserVariableService
+    user = UserService.get_user_by_username('user')
+    UserVariableService.bulk_update(user.id, {'base': 'https://api.example.com', 'token': 'abc'})
+    command = "curl '{{base}}/items' -H 'Authorization: Bearer $token' -H 'X-Trace: {{trace}}'"
+    expanded = ConverterService.convert_curl_command(command, user.id, 'expand')
+    referenced = ConverterService.convert_curl_command(command, user.id, 'reference')
+    UserVariableService.bulk_update(user.id, {}, ['base', 'token'])
+    if ("url = 'https://api.example.com/items'" in expanded['python']
+            and "'Authorization': 'Bearer abc'" in expanded['python']
+            and "url = f'{base}/items'" in referenced['python'] and "token = 'abc'" in referenced['python']
+            and expanded['missing_variables'] == ['trace']):
+        print("✓ 用户变量替换成功")
+    else:
+        print(f"✗ 用户变量替换失败: {expanded} {referenced}")
+        return False
+    
+    # 测试多目标代码生成(命令只解析一次)
+    from app.converter import available_targets
+    from app.services.converter_service import request_ir_cache
+    command = "curl -X POST https://api.example.com/items -H 'Content-Type: application/json' -d '{\"id\": 1}' -k"
+    parsed_before = request_ir_cache.misses
+    result = ConverterService.convert_curl_command(command, user.id, targets=available_targets())
+    outputs = result.get('outputs', {})
+    try:
+        for code in outputs.values():
+            compile(code, '<generated>', 'exec')
+        compiled = True
+    except SyntaxError:
+        compiled = False
+    if (set(outputs) == set(available_targets()) and result['python'] == outputs['requests'] and compiled
+            and "httpx.Client(verify=False)" in outputs['httpx'] and "ssl=False" in outputs['aiohttp']
+            and request_ir_cache.misses == parsed_before + 1):
+        print(f"✓ 多目标代码生成成功: {', '.join(outputs)}")
+    else:
+        print(f"✗ 多目标代码生成失败: {result}")
+        return False
+    
+    try:
+        ConverterService.convert_curl_command(command, user.id, targets=['perl'])
+        print("✗ 不支持的生成目标应该报错")
+        return False
+    except ValueError:
+        print("✓ 不支持的生成目标报错（符合预期）")
+    
+    # 测试按源复用连接的会话代码
+    commands = [
+        "curl https://api.example.com/a -H 'Accept: application/json'",
+        "curl https://other.example.com/b",
+        "curl -X POST https://api.example.com/c -H 'Accept: application/json' -d x=1"
+    ]
+    result = ConverterService.convert_curl_session(commands, user.id, pool_size=5)
+    code = result['python']
+    if (result['origins'] == [{'origin': 'https://api.example.com', 'requests': [1, 3]},
+                              {'origin': 'https://other.example.com', 'requests': [2]}]
+            and code.count('= create_session()') == 2 and "session_1.post(url, data=data)" in code
+            and "session_1.headers.update({" in code and 'POOL_SIZE = 5' in code):
+        compile(code, '<session>', 'exec')
+        print("✓ 会话代码生成成功")
+    else:
+        print(f"✗ 会话代码生成失败: {result}")
+        return False
+    
+    # 测试 URL 中的换行不会在注释之外生成可执行代码
+    injected = "curl $'http://example.com/a\\nimport os; os.system(\"id\")'"
+    code = ConverterService.convert_curl_session([injected], user.id)['python']
+    if not any(line.startswith('import os') for line in code.split('\n')):
+        print("✓ 会话代码注释转义成功")
+    else:
+        print(f"✗ 会话代码注释未转义: {code}")
+        return False
+    
+    # 测试异步并发压测脚本
+    result = ConverterService.convert_curl_load(commands, user.id, concurrency=8, rate_limit=50, iterations=10)
+    code = result['python']
+    if (result['total_requests'] == 30 and 'CONCURRENCY = 8' in code and 'RATE_LIMIT = 50' in code
+            and code.count('REQUESTS.append(') == 3 and 'httpx.AsyncClient' in code and 'BUCKETS_MS' in code):
+        compile(code, '<load>', 'exec')
+        print("✓ 压测脚本生成成功")
+    else:
+        print(f"✗ 压测脚本生成失败: {result}")
+        return False
+    
+    try:
+        ConverterService.convert_curl_load(commands, user.id, concurrency=0)
+        print("✗ 无效的并发数应该报错")
+        return False
+    except ValueError:
+        print("✓ 无效的并发数报错（符合预期）")
+    
+    # 测试压测脚本注释转义、布尔值参数和解析异常
+    code = ConverterService.convert_curl_load([injected], user.id)['python']
+    rejected = 0
+    for options in ({'concurrency': True}, {'iterations': False}, {'rate_limit': True}):
+        try:
+            ConverterService.convert_curl_load(commands, user.id, **options)
+        except ValueError:
+            rejected += 1
+    from unittest import mock
+    with mock.patch('app.services.converter_service.parse_request', side_effect=AttributeError('boom')):
+        try:
+            ConverterService.convert_curl_load(['curl https://uncached.example.com/'], user.id)
+            parse_error = None
+        except ValueError as e:
+            parse_error = str(e)
+    if (not any(line.startswith('import os') for line in code.split('\n')) and rejected == 3
+            and parse_error == '第 1 条命令解析失败: boom'):
+        print("✓ 压测脚本参数和注释校验成功")
+    else:
+        print(f"✗ 压测脚本参数和注释校验失败: {rejected} {parse_error}")
+        return False
+    
+    # 测试后台批量写入器停止后再放入条目时重新启动
+    from app.utils.batch_writer import BatchWriter
+    written = []
+    writer = BatchWriter(written.extend, flush_interval=0.01)
+    writer.put('before-stop')
+    writer.stop()
+    writer.put('after-stop')
+    deadline = time.monotonic() + 2
+    while len(written) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    restarted = list(written)
+    writer.stop()
+    if restarted == ['before-stop', 'after-stop']:
+        print("✓ 批量写入器停止后重新启动成功")
+    else:
+        print(f"✗ 批量写入器停止后未写入: {restarted}")
+        return False
+    
+    # 测试最近转换记录保留完整代码供复制，删除转换记录后从缓冲区移除
+    from app.models import ConversionResult
+    from app.services import converter_service
+    long_command = 'curl https://feed.example.com/' + 'a' * 1000
+    long_result = ConverterService.convert_curl_command(long_command, user.id)
+    appended = ConverterService.get_recent_conversions(limit=1)[0]
+    latest = ConversionResult.query.order_by(ConversionResult.id.desc()).first()
+    ConverterService.delete_conversion(latest.id, user.id)
+    after_delete = ConverterService.get_recent_conversions()
+    ConverterService.convert_curl_command(long_command, user.id)
+    converter_service.recent_feed.clear()
+    reloaded = ConverterService.get_recent_conversions(limit=1)[0]
+    latest = ConversionResult.query.order_by(ConversionResult.id.desc()).first()
+    ConverterService.delete_conversion(latest.id, user.id)
+    if (appended['python'] == long_result['python'] == reloaded['python'] and appended['truncated']
+            and len(appended['python_preview']) < len(appended['python'])
+            and all(entry['curl'] != appended['curl'] for entry in after_delete)
+            and all(entry['curl'] != appended['curl'] for entry in ConverterService.get_recent_conversions())):
+        print("✓ 最近转换记录复制完整代码和删除后移除成功")
+    else:
+        print("✗ 最近转换记录复制或删除错误")
+        return False
+    
+    # 测试每页数量限制：游标分页拒绝小于 1 的数量，接口把 per_page 限制在 1..100
+    from flask import current_app
+    from app.utils.pagination import keyset_page
+    try:
+        keyset_page(ConversionResult.query, [ConversionResult.created_at, ConversionResult.id], None, 0)
+        print("✗ 每页数量为 0 时应报错")
+        return False
+    except ValueError:
+        pass
+    client = current_app.test_client()
+    token = client.post('/login', json={'username': 'user', 'password': 'user123'}).json['access_token']
+    auth = {'Authorization': f'Bearer {token}'}
+    pages = [client.get(url, headers=auth) for url in
+             ('/api/conversions?per_page=0', '/api/files?cursor=&per_page=0', '/api/files?per_page=1000')]
+    if ([page.status_code for page in pages] == [200, 200, 200]
+            and [page.json['pagination']['per_page'] for page in pages] == [1, 1, 100]):
+        print("✓ 每页数量限制成功")
+    else:
+        print(f"✗ 每页数量限制失败: {[page.status_code for page in pages]}")
+        return False
+    
+    return True
+    
+def test_storage_service():
+    """测试StorageService功能"""
+    print("\n=== 测试 StorageService ===")
+    
+    import hashlib
+    import io
+    import tempfile
+    from werkzeug.datastructures import FileStorage
+    from app.models import StoredFile
+    from app.services.storage_service import StorageService
+    
+    user = UserService.create_user('storagetest', 'storage123', 'user')
+    from app.models import db
+    db.session.commit()
+    
+    with tempfile.TemporaryDirectory() as upload_folder:
+        storage_service = StorageService(upload_folder=upload_folder, max_file_size=1024 * 1024)
+        
+        # 测试分块上传
+        content = b'x' * (200 * 1024 + 7)
+        file = FileStorage(stream=io.BytesIO(content), filename='test.txt', content_type='text/plain')
+        result = storage_service.upload_file(file, user, '测试文件')
+        if result['file_size'] == len(content) and result['content_hash'] == hashlib.sha256(content).hexdigest():
+            print(f"✓ 文件上传成功: {result['file_size']} 字节")
+        else:
+            print("✗ 文件上传结果错误")
+            return False
+        
+        # 测试超过大小限制时中止上传
+        file = FileStorage(stream=io.BytesIO(b'x' * (1024 * 1024 + 1)), filename='big.txt')
+        try:
+            storage_service.upload_file(file, user)
+            print("✗ 超过大小限制的文件应该上传失败")
+            return False
+        except ValueError:
+            leftovers = [name for _, _, names in os.walk(upload_folder) for name in names]
+            if len(leftovers) == 1:
+                print("✓ 超过大小限制的文件上传失败（符合预期）")
+            else:
+                print(f"✗ 上传失败后残留文件: {leftovers}")
+                return False
+        
+        # 测试相同内容去重存储
+        file = FileStorage(stream=io.BytesIO(content), filename='copy.txt', content_type='text/plain')
+        copy_result = storage_service.upload_file(file, user)
+        copy_file = storage_service.get_file_by_id(copy_result['file_id'])
+        if copy_file.file_path == storage_service.get_file_by_id(result['file_id']).file_path:
+            print("✓ 相同内容共享存储")
+        else:
+            print("✗ 相同内容未去重")
+            return False
+        
+        # 测试下载次数批量写入
+        for _ in range(3):
+            storage_service.increment_download_count(result['file_id'])
+        if storage_service.get_file_info(result['file_id'], user)['download_count'] != 3:
+            print("✗ 下载次数读取未合并未写入的增量")
+            return False
+        StorageService.flush_download_counts()
+        db.session.expire_all()
+        if storage_service.get_file_by_id(result['file_id']).download_count == 3 \
+                and storage_service.get_storage_stats(user)['total_downloads'] == 3:
+            print("✓ 下载次数批量写入成功")
+        else:
+            print("✗ 下载次数写入结果错误")
+            return False
+        
+        # 测试下载计数器停止后再计数时重新启动后台写入
+        from flask import current_app
+        from app.services.download_counter import DownloadCounter
+        counter = DownloadCounter(current_app._get_current_object(), flush_interval=0.01)
+        counter.increment(result['file_id'])
+        counter.stop()
+        counter.increment(result['file_id'])
+        deadline = time.monotonic() + 2
+        while counter.stats()['flushed'] < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        restarted = counter.stats()
+        counter.stop()
+        db.session.expire_all()
+        if restarted['pending_downloads'] == 0 and restarted['flushed'] == 2 \
+                and storage_service.get_file_by_id(result['file_id']).download_count == 5:
+            print("✓ 下载计数器停止后重新启动成功")
+        else:
+            print(f"✗ 下载计数器停止后未写入: {restarted}")
+            return False
+        
+        storage_service.delete_file(result['file_id'], user)
+        if os.path.exists(copy_file.file_path):
+            print("✓ 仍有引用时保留文件数据")
+        else:
+            print("✗ 仍有引用的文件数据被删除")
+            return False
+        
+        storage_service.delete_file(copy_result['file_id'], user)
+        if not os.path.exists(copy_file.file_path):
+            print("✓ 最后一个引用删除后删除文件数据")
+        else:
+            print("✗ 无引用的文件数据未删除")
+            return False
+        
+        # 测试删除无引用blob的同时上传相同内容：上传等删除结束后再写入，文件数据不丢失
+        import threading
+        from unittest import mock
+        from flask import current_app
+        app = current_app._get_current_object()
+        race_content = b'race' * 1000
+        race_first = storage_service.upload_file(FileStorage(stream=io.BytesIO(race_content), filename='race.txt'), user)
+        race_result = {}
+        def upload_same_content():
+            with app.app_context():
+                race_user = UserService.get_user_by_username('storagetest')
+                race_result.update(storage_service.upload_file(
+                    FileStorage(stream=io.BytesIO(race_content), filename='race-copy.txt'), race_user))
+        original_delete = storage_service.backend.delete
+        def delete_during_upload(key):
+            uploader = threading.Thread(target=upload_same_content)
+            uploader.start()
+            uploader.join(0.3)
+            original_delete(key)
+            race_result['uploader'] = uploader
+        with mock.patch.object(storage_service.backend, 'delete', side_effect=delete_during_upload):
+            storage_service.delete_file(race_first['file_id'], user)
+        race_result['uploader'].join()
+        race_file = storage_service.get_file_by_id(race_result.get('file_id'))
+        if race_file is not None and os.path.exists(race_file.file_path):
+            print("✓ 删除无引用文件数据时并发上传相同内容成功")
+        else:
+            print("✗ 删除无引用文件数据时并发上传的内容丢失")
+            return False
+        storage_service.delete_file(race_file.id, user)
+        
+        # 测试分片上传：缺少分片时报错，重复上传的分片覆盖之前的内容，完成后按序号合并
+        part_data = [os.urandom(1000), os.urandom(500), os.urandom(10)]
+        upload_id = storage_service.initiate_upload_session(user, 'parts.txt', content_type='text/plain')['upload_id']
+        storage_service.upload_part(upload_id, user, 0, io.BytesIO(part_data[0]))
+        storage_service.upload_part(upload_id, user, 2, io.BytesIO(part_data[2]))
+        try:
+            storage_service.complete_upload_session(upload_id, user)
+            missing_error = None
+        except ValueError as e:
+            missing_error = str(e)
+        storage_service.upload_part(upload_id, user, 1, io.BytesIO(b'overwritten'))
+        storage_service.upload_part(upload_id, user, 1, io.BytesIO(part_data[1]))
+        part_sizes = [part['size'] for part in storage_service.get_upload_session(upload_id, user)['parts']]
+        parts_result = storage_service.complete_upload_session(upload_id, user)
+        parts_file = storage_service.get_file_by_id(parts_result['file_id'])
+        with open(parts_file.file_path, 'rb') as f:
+            merged = f.read()
+        if (missing_error == '缺少分片: [1]' and part_sizes == [1000, 500, 10] and merged == b''.join(part_data)
+                and parts_file.original_filename == 'parts.txt'
+                and not os.path.exists(os.path.join(storage_service.staging_folder, upload_id))):
+            print("✓ 分片上传和合并成功")
+        else:
+            print(f"✗ 分片上传结果错误: {missing_error} {part_sizes}")
+            return False
+        storage_service.delete_file(parts_file.id, user)
+        
+        # 测试取消上传和清理过期的上传会话
+        upload_id = storage_service.initiate_upload_session(user, 'aborted.txt')['upload_id']
+        storage_service.upload_part(upload_id, user, 0, io.BytesIO(b'abc'))
+        storage_service.abort_upload_session(upload_id, user)
+        try:
+            storage_service.get_upload_session(upload_id, user)
+            print("✗ 取消后的上传会话应该不存在")
+            return False
+        except ValueError:
+            pass
+        stale_id = storage_service.initiate_upload_session(user, 'stale.txt')['upload_id']
+        fresh_id = storage_service.initiate_upload_session(user, 'fresh.txt')['upload_id']
+        stale_temp = os.path.join(storage_service.staging_folder, 'tmp-stale')
+        open(stale_temp, 'wb').close()
+        old_time = time.time() - storage_service.upload_session_ttl - 60
+        for path in (os.path.join(storage_service.staging_folder, stale_id), stale_temp):
+            os.utime(path, (old_time, old_time))
+        removed = storage_service.cleanup_stale_upload_sessions()
+        if (removed == 2 and not os.path.exists(stale_temp)
+                and sorted(os.listdir(storage_service.staging_folder)) == [fresh_id]):
+            print("✓ 取消上传和清理过期上传会话成功")
+        else:
+            print(f"✗ 清理过期上传会话错误: {removed} {os.listdir(storage_service.staging_folder)}")
+            return False
+        
+        # 测试分片超过大小限制时接口返回413
+        from unittest import mock
+        from flask import current_app
+        client_app = current_app.test_client()
+        auth = {'Authorization': f'Bearer {AuthService.create_token(user)}'}
+        with mock.patch('app.routes.routes._get_storage_service', return_value=storage_service):
+            oversized = client_app.put(f'/api/files/uploads/{fresh_id}/parts/0', headers=auth,
+                                       data=b'x' * (storage_service.max_file_size + 1))
+        storage_service.abort_upload_session(fresh_id, user)
+        if oversized.status_code == 413:
+            print("✓ 超过大小限制的分片返回413")
+        else:
+            print(f"✗ 超过大小限制的分片返回 {oversized.status_code}")
+            return False
+        
+        # 测试存储统计和配额
+        quota_service = StorageService(upload_folder=upload_folder, quota_bytes=1000, max_files=2)
+        quota_service.upload_file(FileStorage(stream=io.BytesIO(b'a' * 600), filename='a.txt', content_type='text/plain'), user)
+        try:
+            quota_service.upload_file(FileStorage(stream=io.BytesIO(b'b' * 600), filename='b.txt'), user)
+            print("✗ 超出存储配额的文件应该上传失败")
+            return False
+        except ValueError:
+            pass
+        quota_service.upload_file(FileStorage(stream=io.BytesIO(b'c' * 300), filename='c.png', content_type='image/png'), user)
+        from sqlalchemy import event
+        from app.services import storage_service as storage_module
+        image_file = StoredFile.query.filter_by(user_id=user.id, file_type='image/png').one()
+        original_counter = storage_module.download_counter
+        storage_module.download_counter = None
+        try:
+            quota_service.increment_download_count(image_file.id)
+        finally:
+            storage_module.download_counter = original_counter
+        statements = []
+        def record_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        user.id  # 先加载用户，只记录统计本身的查询
+        event.listen(db.engine, 'before_cursor_execute', record_statement)
+        try:
+            stats = quota_service.get_storage_stats(user)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record_statement)
+        if (stats['total_files'] == 2 and stats['total_size'] == 900 and stats['storage_used'] == 900
+                and stats['type_distribution'] == {'text': 1, 'image': 1} and stats['total_downloads'] == 1
+                and len(statements) == 1 and 'FROM user_storage_usage' in statements[0]):
+            print("✓ 存储统计和配额检查成功")
+        else:
+            print(f"✗ 存储统计结果错误: {stats}, {statements}")
+            return False
+        
+        for stored_file in StoredFile.query.filter_by(user_id=user.id).all():
+            quota_service.delete_file(stored_file.id, user)
+        stats = quota_service.get_storage_stats(user)
+        if (stats['storage_used'] != 0 or stats['total_files'] != 0 or stats['total_downloads'] != 0
+                or stats['type_distribution'] != {}):
+            print(f"✗ 删除文件后存储用量未扣除: {stats}")
+            return False
+        
+        # 测试迁移为已有的用量汇总回填下载次数和类型分布
+        import sqlalchemy as sa
+        from app.models import ConversionResult, UserStorageUsage, UserVariables
+        from app.models.migrations import upgrade_database
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = sa.create_engine(f"sqlite:///{os.path.join(tmp, 'migrate.db')}")
+            for table in (ConversionResult.__table__, StoredFile.__table__, UserVariables.__table__):
+                table.create(engine)
+            with engine.begin() as connection:
+                connection.execute(sa.text(
+                    'CREATE TABLE user_storage_usage (user_id INTEGER PRIMARY KEY, file_count INTEGER NOT NULL, '
+                    'total_size BIGINT NOT NULL, updated_at DATETIME)'
+                ))
+                connection.execute(sa.text('INSERT INTO user_storage_usage VALUES (1, 3, 30, NULL), (2, 0, 0, NULL)'))
+                connection.execute(StoredFile.__table__.insert(), [
+                    {'user_id': 1, 'original_filename': name, 'stored_filename': name, 'file_path': name,
+                     'file_size': 10, 'file_type': file_type, 'download_count': downloads}
+                    for name, file_type, downloads in (('a.txt', 'text/plain', 2), ('b.csv', 'text/csv', 0),
+                                                       ('c.png', 'image/png', 5))
+                ])
+            upgrade_database(engine, explicit=True)
+            with engine.connect() as connection:
+                table = UserStorageUsage.__table__
+                backfilled = {row.user_id: (row.total_downloads, row.type_counts) for row in connection.execute(
+                    sa.select(table.c.user_id, table.c.total_downloads, table.c.type_counts))}
+            engine.dispose()
+        if backfilled == {1: (7, {'text': 2, 'image': 1}), 2: (0, {})}:
+            print("✓ 用量汇总回填下载次数和类型分布成功")
+        else:
+            print(f"✗ 用量汇总回填错误: {backfilled}")
+            return False
+        
+        # 测试把用户目录中的早期文件和旧布局的blob迁移到新的目录分层布局
+        storage_service.upload_file(FileStorage(stream=io.BytesIO(b'same'), filename='new.txt'), user)
+        legacy_folder = os.path.join(upload_folder, str(user.id))
+        os.makedirs(legacy_folder)
+        for name, data in (('old.txt', b'same'), ('other.txt', b'other')):
+            with open(os.path.join(legacy_folder, name), 'wb') as f:
+                f.write(data)
+            db.session.add(StoredFile(user_id=user.id, original_filename=name, stored_filename=name,
+                                      file_path=os.path.join(legacy_folder, name), file_size=len(data),
+                                      file_type='text/plain'))
+        db.session.commit()
+        
+        layout_service = StorageService(upload_folder=upload_folder, fanout_levels=1, fanout_width=3)
+        migrated = layout_service.migrate_storage_layout()
+        files = StoredFile.query.filter_by(user_id=user.id).all()
+        if (migrated['legacy_files'] == 2 and migrated['deduplicated'] == 1 and migrated['relocated_blobs'] == 1
+                and not os.path.exists(legacy_folder) and len({f.file_path for f in files}) == 2
+                and all(f.file_path == layout_service._blob_path(f.content_hash) and os.path.exists(f.file_path)
+                        for f in files)):
+            print("✓ 存储布局迁移成功")
+        else:
+            print(f"✗ 存储布局迁移结果错误: {migrated}")
+            return False
+        
+        for stored_file in files:
+            layout_service.delete_file(stored_file.id, user)
+        if any(names for _, _, names in os.walk(os.path.join(upload_folder, 'blobs'))):
+            print("✗ 迁移后删除文件未清理blob")
+            return False
+        
+        # 测试本地文件的条件下载：Range返回206/416，If-None-Match和If-Modified-Since返回304，
+        # 304和不从文件开头开始的Range不计下载次数
+        local_content = os.urandom(1000)
+        local_id = storage_service.upload_file(FileStorage(stream=io.BytesIO(local_content), filename='range.txt'),
+                                               user)['file_id']
+        url = f'/api/files/{local_id}/download'
+        with mock.patch('app.routes.routes._get_storage_service', return_value=storage_service):
+            full = client_app.get(url, headers=auth)
+            head_range = client_app.get(url, headers={**auth, 'Range': 'bytes=0-99'})
+            tail_range = client_app.get(url, headers={**auth, 'Range': 'bytes=100-199'})
+            unsatisfiable = client_app.get(url, headers={**auth, 'Range': 'bytes=5000-'})
+            not_modified = [
+                client_app.get(url, headers={**auth, 'If-None-Match': full.headers['ETag']}),
+                client_app.get(url, headers={**auth, 'If-Modified-Since': full.headers['Last-Modified']})
+            ]
+        statuses = [response.status_code for response in (full, head_range, tail_range, unsatisfiable, *not_modified)]
+        if (statuses == [200, 206, 206, 416, 304, 304] and full.data == local_content
+                and head_range.headers['Content-Range'] == 'bytes 0-99/1000' and head_range.data == local_content[:100]
+                and tail_range.headers['Content-Range'] == 'bytes 100-199/1000'
+                and tail_range.data == local_content[100:200]
+                and storage_service.get_file_info(local_id, user)['download_count'] == 2):
+            print("✓ 本地文件条件下载和下载计数成功")
+        else:
+            print(f"✗ 本地文件条件下载错误: {statuses} "
+                  f"{storage_service.get_file_info(local_id, user)['download_count']}")
+            return False
+        storage_service.delete_file(local_id, user)
+        
+        # 测试交给前端代理发送文件：返回内部重定向头和空响应体
+        from werkzeug.test import Client
+        from werkzeug.wrappers import Response as WerkzeugResponse
+        from app.utils.accel import AccelRedirectEmulator
+        accel_service = StorageService(upload_folder=upload_folder, delivery_mode='x-accel-redirect')
+        sendfile_service = StorageService(upload_folder=upload_folder, delivery_mode='x-sendfile')
+        accel_result = accel_service.upload_file(FileStorage(stream=io.BytesIO(local_content), filename='accel.txt'), user)
+        accel_file = accel_service.get_file_by_id(accel_result['file_id'])
+        blob_key = f"blobs/{accel_result['content_hash'][:2]}/{accel_result['content_hash'][2:4]}/{accel_result['content_hash']}"
+        url = f"/api/files/{accel_result['file_id']}/download"
+        delivered = {}
+        for service in (accel_service, sendfile_service):
+            with mock.patch('app.routes.routes._get_storage_service', return_value=service):
+                delivered[service.delivery_mode] = client_app.get(url, headers=auth)
+        accel_response, sendfile_response = delivered['x-accel-redirect'], delivered['x-sendfile']
+        if (accel_service.get_delivery_headers(accel_file) == {'X-Accel-Redirect': f'/protected-uploads/{blob_key}'}
+                and accel_response.status_code == 200 and accel_response.data == b''
+                and accel_response.headers['X-Accel-Redirect'] == f'/protected-uploads/{blob_key}'
+                and 'accel.txt' in accel_response.headers['Content-Disposition']
+                and sendfile_response.status_code == 200 and sendfile_response.data == b''
+                and sendfile_response.headers['X-Sendfile'] == os.path.abspath(accel_file.file_path)):
+            print("✓ X-Accel-Redirect 和 X-Sendfile 交付成功")
+        else:
+            print(f"✗ 内部重定向交付错误: {dict(accel_response.headers)} {dict(sendfile_response.headers)}")
+            return False
+        
+        # 测试模拟 nginx 处理 X-Accel-Redirect：前缀内的文件由模拟层发送，前缀外的头原样返回，越界路径返回404
+        def accel_app(environ, start_response):
+            target = environ['PATH_INFO']
+            response = WerkzeugResponse(headers={'X-Accel-Redirect': target, 'Content-Disposition': 'attachment'})
+            return response(environ, start_response)
+        emulated = Client(AccelRedirectEmulator(accel_app, '/protected-uploads/', upload_folder))
+        served = emulated.get(f'/protected-uploads/{blob_key}')
+        ranged = emulated.get(f'/protected-uploads/{blob_key}', headers={'Range': 'bytes=10-19'})
+        outside = emulated.get('/other/file.txt')
+        escaped = emulated.get('/protected-uploads/../secret.txt')
+        if (served.status_code == 200 and served.data == local_content
+                and served.headers['Content-Disposition'] == 'attachment'
+                and ranged.status_code == 206 and ranged.data == local_content[10:20]
+                and outside.status_code == 200 and outside.data == b''
+                and outside.headers['X-Accel-Redirect'] == '/other/file.txt'
+                and escaped.status_code == 404):
+            print("✓ X-Accel-Redirect 模拟发送成功")
+        else:
+            print(f"✗ X-Accel-Redirect 模拟错误: {[served.status_code, ranged.status_code, outside.status_code, escaped.status_code]}")
+            return False
+        accel_service.delete_file(accel_result['file_id'], user)
+        
+        # 测试S3兼容对象存储(进程内模拟服务)
+        from app.services.storage_backends import S3StorageBackend
+        from app.utils.s3 import S3Client, S3Error
+        from tests.s3_emulator import S3Emulator
+        
+        emulator = S3Emulator(access_key='test', secret_key='test-secret', buckets=('uploads',))
+        endpoint_url = emulator.serve()
+        try:
+            client = S3Client(endpoint_url, 'uploads', 'test', 'test-secret')
+            s3_service = StorageService(upload_folder=upload_folder,
+                                        backend=S3StorageBackend(client, prefix='app'))
+            s3_content = os.urandom(150 * 1024)
+            first = s3_service.upload_file(FileStorage(stream=io.BytesIO(s3_content), filename='s3 文件.txt'), user)
+            second = s3_service.upload_file(FileStorage(stream=io.BytesIO(s3_content), filename='copy.txt'), user)
+            stored_file = s3_service.get_downloadable_file(first['file_id'], user)
+            keys = emulator.list_keys('uploads')
+            if (list(keys) == [f"app/blobs/{first['content_hash'][:2]}/{first['content_hash'][2:4]}/{first['content_hash']}"]
+                    and s3_service.get_local_path(stored_file) is None
+                    and b''.join(s3_service.stream_file(stored_file)) == s3_content):
+                print("✓ S3存储上传、去重和读取成功")
+            else:
+                print(f"✗ S3存储结果错误: {keys}")
+                return False
+            
+            # 测试S3文件的Range下载只从对象存储读取请求的部分
+            sent = []
+            original_open = s3_service.backend.open
+            def counting_open(key, start=0, stop=None):
+                stream = original_open(key, start, stop)
+                sent.append(int(stream.getheader('Content-Length')))
+                return stream
+            with mock.patch('app.routes.routes._get_storage_service', return_value=s3_service), \
+                    mock.patch.object(s3_service.backend, 'open', counting_open):
+                partial = client_app.get(f"/api/files/{first['file_id']}/download",
+                                         headers={**auth, 'Range': 'bytes=100-1099'})
+                full = client_app.get(f"/api/files/{first['file_id']}/download", headers=auth)
+            if (partial.status_code == 206 and partial.data == s3_content[100:1100]
+                    and partial.headers['Content-Range'] == f'bytes 100-1099/{len(s3_content)}'
+                    and full.status_code == 200 and full.data == s3_content and sent == [1000, len(s3_content)]):
+                print("✓ S3存储Range下载成功")
+            else:
+                print(f"✗ S3存储Range下载错误: {partial.status_code} {sent}")
+                return False
+            
+            s3_service.delete_file(first['file_id'], user)
+            s3_service.delete_file(second['file_id'], user)
+            if emulator.list_keys('uploads'):
+                print("✗ S3存储删除文件后对象仍存在")
+                return False
+            
+            # 错误的密钥应被拒绝
+            try:
+                S3Client(endpoint_url, 'uploads', 'test', 'wrong-secret').head_object('app/x')
+                print("✗ 错误的S3签名应该被拒绝")
+                return False
+            except S3Error:
+                print("✓ S3存储删除和签名校验成功")
+        finally:
+            emulator.shutdown()
+    
+    UserService.delete_user(user)
+    return True
+
+def test_curl_parser():
+    """测试curl命令解析"""
+    print("\n=== 测试 curl 解析 ===")
+    
+    from app.converter import parse_curl_command, tokenize
+    
+    # 测试引号、转义和续行
+    tokens = tokenize("curl 'https://a.com' \\\n  -H \"X-A: \\\"b\\\"\" $'c\\td'")
+    if tokens == ['curl', 'https://a.com', '-H', 'X-A: "b"', 'c\td']:
+        print("✓ 命令切分成功")
+    else:
+        print(f"✗ 命令切分失败: {tokens}")
+        return False
+    
+    # 测试粘贴进来的不换行空格等空白字符作为分隔符，以及超出范围的 Unicode 转义
+    tokens = tokenize("curl\xa0http://x\v-k")
+    try:
+        tokenize("curl $'\\UFFFFFFFF'")
+        invalid_escape_rejected = False
+    except ValueError:
+        invalid_escape_rejected = True
+    if tokens == ['curl', 'http://x', '-k'] and invalid_escape_rejected:
+        print("✓ 特殊空白和无效转义处理成功")
+    else:
+        print(f"✗ 特殊空白和无效转义处理失败: {tokens}")
+        return False
+    
+    # 测试选项解析
+    parsed = parse_curl_command(
+        "curl -sSL 'https://a.com/p?x=1' -XPUT -H 'Cookie: a=1; b=2' --data-raw 'k=v' -d 'k2=v2' -k"
+    )
+    if (parsed.resolve_method() == 'PUT' and parsed.data == 'k=v&k2=v2'
+            and parsed.cookies == {'a': '1', 'b': '2'} and not parsed.verify_ssl
+            and parsed.split_url() == ('https://a.com/p', [('x', '1')])):
+        print("✓ 选项解析成功")
+    else:
+        print("✗ 选项解析失败")
+        return False
+    
+    # 测试长请求体
+    body = '{"a": "' + 'x' * 200000 + '"}'
+    parsed = parse_curl_command(f"curl https://a.com --data-raw '{body}'")
+    if parsed.data == body:
+        print("✓ 长请求体解析成功")
+    else:
+        print("✗ 长请求体解析失败")
+        return False
+    
+    # 测试未闭合引号
+    try:
+        parse_curl_command("curl 'https://a.com")
+        print("✗ 未闭合引号应该解析失败")
+        return False
+    except ValueError:
+        print("✓ 未闭合引号解析失败（符合预期）")
+    
     return True
 
 def main():
@@ -167,14 +1080,20 @@ def main():
         # 测试各个service
         user_test = test_user_service()
         auth_test = test_auth_service()
+        variable_test = test_user_variable_service()
         converter_test = test_converter_service()
+        storage_test = test_storage_service()
+        parser_test = test_curl_parser()
         
         print("\n=== 测试结果 ===")
         print(f"UserService测试: {'✓ 通过' if user_test else '✗ 失败'}")
         print(f"AuthService测试: {'✓ 通过' if auth_test else '✗ 失败'}")
+        print(f"UserVariableService测试: {'✓ 通过' if variable_test else '✗ 失败'}")
         print(f"ConverterService测试: {'✓ 通过' if converter_test else '✗ 失败'}")
+        print(f"StorageService测试: {'✓ 通过' if storage_test else '✗ 失败'}")
+        print(f"curl解析测试: {'✓ 通过' if parser_test else '✗ 失败'}")
         
-        if user_test and auth_test and converter_test:
+        if user_test and auth_test and variable_test and converter_test and storage_test and parser_test:
             print("\n🎉 所有测试通过！Service层功能正常。")
             return True
         else:
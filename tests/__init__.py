@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""测试和本地开发用的外部服务替身(不随应用部署)"""
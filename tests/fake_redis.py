@@ -0,0 +1,112 @@
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class FakeRedis:
+    """
+    进程内的 Redis 替身(仅用于本地开发和测试)
+
+    只实现 token 黑名单和限流用到的字符串和有序集合命令，参数和返回值与 redis-py 一致(返回 bytes)。
+    """
+
+    def __init__(self):
+        self._values: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self._sorted_sets: Dict[str, Dict[bytes, float]] = {}
+        self._lock = threading.Lock()
+        self.commands = 0
+
+    def set(self, name: str, value, ex: Optional[int] = None) -> bool:
+        with self._lock:
+            self.commands += 1
+            expires_at = time.time() + ex if ex else None
+            self._values[name] = (_encode(value), expires_at)
+            return True
+
+    def get(self, name: str) -> Optional[bytes]:
+        with self._lock:
+            self.commands += 1
+            return self._get(name)
+
+    def mget(self, names: List[str]) -> List[Optional[bytes]]:
+        with self._lock:
+            self.commands += 1
+            return [self._get(name) for name in names]
+
+    def incr(self, name: str, amount: int = 1) -> int:
+        with self._lock:
+            self.commands += 1
+            current = self._get(name)
+            value = int(current or 0) + amount
+            expires_at = self._values[name][1] if current is not None else None
+            self._values[name] = (_encode(value), expires_at)
+            return value
+
+    def expire(self, name: str, seconds: int) -> bool:
+        with self._lock:
+            self.commands += 1
+            current = self._get(name)
+            if current is None:
+                return False
+            self._values[name] = (current, time.time() + seconds)
+            return True
+
+    def exists(self, *names: str) -> int:
+        with self._lock:
+            self.commands += 1
+            return sum(1 for name in names if self._get(name) is not None)
+
+    def delete(self, *names: str) -> int:
+        with self._lock:
+            self.commands += 1
+            deleted = 0
+            for name in names:
+                deleted += self._values.pop(name, None) is not None
+                deleted += self._sorted_sets.pop(name, None) is not None
+            return deleted
+
+    def zadd(self, name: str, mapping: Dict[str, float]) -> int:
+        with self._lock:
+            self.commands += 1
+            members = self._sorted_sets.setdefault(name, {})
+            added = 0
+            for member, score in mapping.items():
+                member = _encode(member)
+                added += member not in members
+                members[member] = float(score)
+            return added
+
+    def zrangebyscore(self, name: str, min, max) -> List[bytes]:
+        with self._lock:
+            self.commands += 1
+            low, high = float(min), float(max)
+            members = self._sorted_sets.get(name, {})
+            return [member for member, score in sorted(members.items(), key=lambda item: item[1])
+                    if low <= score <= high]
+
+    def zremrangebyscore(self, name: str, min, max) -> int:
+        with self._lock:
+            self.commands += 1
+            low, high = float(min), float(max)
+            members = self._sorted_sets.get(name, {})
+            removed = [member for member, score in members.items() if low <= score <= high]
+            for member in removed:
+                del members[member]
+            return len(removed)
+
+    def _get(self, name: str) -> Optional[bytes]:
+        entry = self._values.get(name)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self._values[name]
+            return None
+        return value
+
+
+def _encode(value) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode('utf-8')
+
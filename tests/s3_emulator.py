@@ -0,0 +1,154 @@
+import hashlib
+import hmac
+import re
+import threading
+from typing import Dict
+from urllib.parse import unquote
+from xml.sax.saxutils import escape
+from werkzeug.serving import WSGIRequestHandler, make_server
+from werkzeug.wrappers import Request, Response
+
+_AUTHORIZATION = re.compile(
+    r'AWS4-HMAC-SHA256 Credential=(?P<access_key>[^/]+)/(?P<scope>[^,]+), '
+    r'SignedHeaders=(?P<signed_headers>[^,]+), Signature=(?P<signature>[0-9a-f]+)'
+)
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+    """使用 HTTP/1.1 keep-alive 连接(与真实的 S3 一致)，不输出访问日志"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def send_header(self, keyword, value):
+        # Werkzeug 总是发送 Connection: close，会掩盖客户端在 keep-alive 连接上的问题
+        if keyword.lower() == 'connection' and value.lower() == 'close':
+            return
+        super().send_header(keyword, value)
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class S3Emulator:
+    """
+    进程内的 S3 兼容对象存储(仅用于本地开发和测试)
+
+    以 WSGI 应用实现路径风格寻址的 PUT/GET/HEAD/DELETE 和服务端复制，对象保存在内存中。
+    校验 Signature V4 签名，签名错误时返回 403，行为与 S3 一致。
+    """
+
+    def __init__(self, access_key: str = 'test', secret_key: str = 'test-secret', buckets=('uploads',)):
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.buckets = {bucket: {} for bucket in buckets}
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def serve(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """在后台线程中启动HTTP服务，返回服务地址"""
+        self._server = make_server(host, port, self, threaded=True, request_handler=_QuietRequestHandler)
+        self._thread = threading.Thread(target=self._server.serve_forever, name='s3-emulator', daemon=True)
+        self._thread.start()
+        return f'http://{host}:{self._server.server_port}'
+
+    def shutdown(self):
+        """停止HTTP服务"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __call__(self, environ, start_response):
+        request = Request(environ)
+        with self._lock:
+            self.requests += 1
+        response = self._dispatch(request)
+        return response(environ, start_response)
+
+    def _dispatch(self, request: Request) -> Response:
+        raw_path = request.environ.get('RAW_URI') or request.environ.get('REQUEST_URI') or request.path
+        raw_path = raw_path.split('?', 1)[0]
+        if not self._verify_signature(request, raw_path):
+            return self._error(403, 'SignatureDoesNotMatch', '签名校验失败')
+
+        bucket, _, key = unquote(raw_path).lstrip('/').partition('/')
+        objects = self.buckets.get(bucket)
+        if objects is None:
+            return self._error(404, 'NoSuchBucket', bucket)
+        if not key:
+            return self._error(400, 'InvalidRequest', '缺少对象键')
+
+        if request.method == 'PUT':
+            copy_source = request.headers.get('x-amz-copy-source')
+            if copy_source:
+                source_bucket, _, source_key = unquote(copy_source).lstrip('/').partition('/')
+                with self._lock:
+                    source = self.buckets.get(source_bucket, {}).get(source_key)
+                    if source is None:
+                        return self._error(404, 'NoSuchKey', source_key)
+                    objects[key] = source
+                return Response('<CopyObjectResult><ETag>"%s"</ETag></CopyObjectResult>' % source['etag'],
+                                mimetype='application/xml')
+            data = request.stream.read()
+            entry = {
+                'data': data,
+                'etag': hashlib.md5(data).hexdigest(),
+                'content_type': request.headers.get('Content-Type', 'application/octet-stream')
+            }
+            with self._lock:
+                objects[key] = entry
+            return Response(status=200, headers={'ETag': f'"{entry["etag"]}"'})
+
+        with self._lock:
+            entry = objects.get(key)
+
+        if request.method == 'DELETE':
+            with self._lock:
+                objects.pop(key, None)
+            return Response(status=204)
+
+        if request.method not in ('GET', 'HEAD'):
+            return self._error(405, 'MethodNotAllowed', request.method)
+        if entry is None:
+            return self._error(404, 'NoSuchKey', key, head=request.method == 'HEAD')
+
+        response = Response(entry['data'], mimetype=entry['content_type'])
+        response.set_etag(entry['etag'])
+        response.make_conditional(request, accept_ranges=True, complete_length=len(entry['data']))
+        return response
+
+    def _verify_signature(self, request: Request, raw_path: str) -> bool:
+        match = _AUTHORIZATION.match(request.headers.get('Authorization', ''))
+        if match is None or match.group('access_key') != self.access_key:
+            return False
+
+        scope = match.group('scope')
+        date, region, service, _ = scope.split('/')
+        signed_headers = match.group('signed_headers')
+        canonical_headers = ''.join(f"{name}:{(request.headers.get(name) or '').strip()}\n"
+                                    for name in signed_headers.split(';'))
+        canonical_request = '\n'.join([
+            request.method, raw_path, request.environ.get('QUERY_STRING', ''), canonical_headers,
+            signed_headers, request.headers.get('x-amz-content-sha256', '')
+        ])
+        string_to_sign = '\n'.join([
+            'AWS4-HMAC-SHA256', request.headers.get('x-amz-date', ''), scope,
+            hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()
+        ])
+        key = ('AWS4' + self.secret_key).encode('utf-8')
+        for part in (date, region, service, 'aws4_request'):
+            key = hmac.new(key, part.encode('utf-8'), hashlib.sha256).digest()
+        expected = hmac.new(key, string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, match.group('signature'))
+
+    def _error(self, status: int, code: str, message: str, head: bool = False) -> Response:
+        body = '' if head else (f'<?xml version="1.0" encoding="UTF-8"?>'
+                                f'<Error><Code>{code}</Code><Message>{escape(message)}</Message></Error>')
+        return Response(body, status=status, mimetype='application/xml')
+
+    def list_keys(self, bucket: str) -> Dict[str, int]:
+        """列出对象键和大小(测试时检查存储状态)"""
+        with self._lock:
+            return {key: len(entry['data']) for key, entry in self.buckets.get(bucket, {}).items()}